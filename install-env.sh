@@ -1,4 +1,15 @@
 #!/usr/bin/env bash
+# install-env.sh: provision an SDN lab VM (code-server, Ryu, Mininet, FlowManager, ttyd, Caddy)
+#
+# Usage: sudo ./install-env.sh [--reset] [--redo STEP]...
+#   --reset      forget every finished step and run them all again
+#   --redo STEP  run one step again even if it finished before (e.g. --redo ryu_venv)
+#
+# Every slow step leaves a checkpoint in /var/lib/sdn-env-install when it finishes (and is also skipped if what it
+# installs is already there), so after a failure just run the script again and it carries on where it stopped.
+#
+# Downloads are kept in /var/cache/sdn-env (or SDN_ENV_CACHE): pip wheels for the Ryu venv and git mirrors of
+# Mininet and FlowManager. Copy that folder onto a new VM (or share it) and repeat installs need no network for them.
 set -e
 
 # Ensure script is run as root
@@ -7,21 +18,216 @@ if [ "$EUID" -ne 0 ]; then
   exit 1
 fi
 
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+STATE_DIR=/var/lib/sdn-env-install
+CACHE_DIR="${SDN_ENV_CACHE:-/var/cache/sdn-env}"
+LOG_DIR="$STATE_DIR/logs"
+
+while [ $# -gt 0 ]; do
+  case "$1" in
+    --reset) rm -f "$STATE_DIR"/*.done; shift ;;
+    --redo)  rm -f "$STATE_DIR/$2.done"; shift 2 ;;
+    *) echo "Usage: $0 [--reset] [--redo STEP]..." >&2; exit 1 ;;
+  esac
+done
+
+mkdir -p "$STATE_DIR" "$LOG_DIR" "$CACHE_DIR/wheels" "$CACHE_DIR/git"
+
+# Runs step_NAME unless it already finished (checkpoint) or check_NAME says it's already installed
+run_step() {
+  local name=$1 start=$SECONDS
+  if [ -f "$STATE_DIR/$name.done" ]; then
+    echo "✓ $name (done on $(cat "$STATE_DIR/$name.done"), skipping)"
+    return 0
+  fi
+  if declare -F "check_$name" > /dev/null && "check_$name" > /dev/null 2>&1; then
+    echo "✓ $name (already installed, skipping)"
+    date -Is > "$STATE_DIR/$name.done"
+    return 0
+  fi
+  echo "==> $name"
+  "step_$name"
+  date -Is > "$STATE_DIR/$name.done"
+  echo "✓ $name ($((SECONDS - start))s)"
+}
+
+# Runs independent steps at the same time, each logging to its own file. Steps that finished keep their
+# checkpoint even if another one fails, so a re-run only repeats the failed ones.
+run_parallel() {
+  local name names=("$@") pids=() failed=()
+  for name in "${names[@]}"; do
+    ( set -e; run_step "$name" ) > "$LOG_DIR/$name.log" 2>&1 &
+    pids+=($!)
+  done
+  for i in "${!pids[@]}"; do
+    if wait "${pids[$i]}"; then
+      tail -n 1 "$LOG_DIR/${names[$i]}.log" 2>/dev/null || true
+    else
+      failed+=("${names[$i]}")
+    fi
+  done
+  if [ ${#failed[@]} -gt 0 ]; then
+    for name in "${failed[@]}"; do
+      echo "✗ $name failed, last lines of $LOG_DIR/$name.log:" >&2
+      tail -n 20 "$LOG_DIR/$name.log" >&2
+    done
+    echo "Fix the problem and run $0 again, finished steps won't be repeated." >&2
+    exit 1
+  fi
+}
+
+# Clones from a local mirror in the cache, refreshing the mirror first when the network allows
+cached_clone() {
+  local url=$1 dest=$2 mirror="$CACHE_DIR/git/$(basename "$1" .git).git"
+  if [ -d "$mirror" ]; then
+    git -C "$mirror" fetch --quiet --prune origin || echo "Couldn't refresh $mirror, using the cached copy"
+  else
+    git clone --quiet --mirror "$url" "$mirror"
+  fi
+  git clone --quiet "$mirror" "$dest"
+  git -C "$dest" remote set-url origin "$url"
+}
+
+# Every apt package the steps below need, installed up front in one go (apt can't run in parallel)
+APT_PACKAGES=(
+  software-properties-common git build-essential python3-pip python3-setuptools python3-dev
+  debian-keyring debian-archive-keyring curl gnupg apt-transport-https
+  ttyd cron nano iputils-ping
+)
+
 # 0) Pre-create environment directories
 echo "Creating workspace and template directories..."
-mkdir -p /opt/workspace /opt/templates /opt/utils /opt/workspace/ryu
+mkdir -p /opt/workspace /opt/templates /opt/utils /opt/workspace/ryu /opt/dep
 
 # Set ownership & permissions
 chown root:root /opt/templates
 chmod 755 /opt/templates
 chown student:student /opt/workspace /opt/workspace/ryu
 
-# 1) Install code-server and configure on port 8081
-# ------------------------------------------------
-echo "Installing code-server..."
-curl -fsSL https://code-server.dev/install.sh | sh
+# 1. System packages
+# ------------------
+check_apt_packages() {
+  dpkg -s "${APT_PACKAGES[@]}"
+}
+step_apt_packages() {
+  apt update
+  apt install -y "${APT_PACKAGES[@]}"
+}
+
+# 2. Add deadsnakes PPA & install Python 3.9 + distutils
+# ------------------------------------------------------
+check_python39() {
+  python3.9 -c 'import venv, distutils'
+}
+step_python39() {
+  add-apt-repository -y ppa:deadsnakes/ppa
+  apt update
+  apt install -y python3.9 python3.9-venv python3.9-distutils
+}
+
+# 3. Caddy
+# --------
+check_caddy() {
+  command -v caddy
+}
+step_caddy() {
+  echo "Installing Caddy…"
+  if [ ! -f /usr/share/keyrings/caddy-stable-archive-keyring.gpg ]; then
+    curl -1sLf https://dl.cloudsmith.io/public/caddy/stable/gpg.key | \
+      gpg --dearmor -o /usr/share/keyrings/caddy-stable-archive-keyring.gpg
+  fi
+  echo "deb [signed-by=/usr/share/keyrings/caddy-stable-archive-keyring.gpg] \
+https://dl.cloudsmith.io/public/caddy/stable/deb/debian any-version main" \
+    | tee /etc/apt/sources.list.d/caddy-stable.list >/dev/null
+
+  apt update
+  apt install -y caddy
+}
+
+# 4. code-server (its installer uses dpkg too, so it stays with the apt steps)
+# ---------------------------------------------------------------------------
+check_code_server() {
+  command -v code-server
+}
+step_code_server() {
+  echo "Installing code-server..."
+  curl -fsSL https://code-server.dev/install.sh | sh
+}
+
+# 5. Create a venv at /opt/dep/ryu39 with Eventlet + Ryu, from cached wheels when possible
+#    (NumPy is for the offline flow simulator, utils/ryu/ryu_flow_simulator.py)
+# ---------------------------------------------------------------------------------------
+RYU_PACKAGES=(eventlet==0.30.2 ryu numpy)
+check_ryu_venv() {
+  /opt/dep/ryu39/bin/ryu-manager --version && /opt/dep/ryu39/bin/python -c 'import numpy'
+}
+step_ryu_venv() {
+  local pip=/opt/dep/ryu39/bin/pip wheels="$CACHE_DIR/wheels"
+  mkdir -p /opt/dep/ryu39
+  python3.9 -m venv /opt/dep/ryu39
+
+  "$pip" install --no-index --find-links "$wheels" --upgrade pip setuptools==65.5.0 wheel 2>/dev/null || {
+    "$pip" download --dest "$wheels" pip setuptools==65.5.0 wheel
+    "$pip" install --no-index --find-links "$wheels" --upgrade pip setuptools==65.5.0 wheel
+  }
+  "$pip" uninstall -y eventlet || true
+  # Try the cache alone first; only go to PyPI (and fill the cache) if something is missing
+  "$pip" install --no-index --find-links "$wheels" "${RYU_PACKAGES[@]}" 2>/dev/null || {
+    "$pip" wheel --wheel-dir "$wheels" --find-links "$wheels" "${RYU_PACKAGES[@]}"
+    "$pip" install --no-index --find-links "$wheels" "${RYU_PACKAGES[@]}"
+  }
+  chown -R student:student /opt/dep/ryu39
+}
 
-# 1.1) Configure code-server password and workspace
+# 6. FlowManager into /opt/dep
+# ----------------------------
+check_flowmanager() {
+  [ -f /opt/dep/flowmanager/flowmanager.py ]
+}
+step_flowmanager() {
+  rm -rf /opt/dep/flowmanager
+  cached_clone https://github.com/martimy/flowmanager.git /opt/dep/flowmanager
+  chown -R student:student /opt/dep/flowmanager
+  echo "FlowManager installed at /opt/dep/flowmanager"
+}
+
+# 7. Mininet source (the build itself is step 8, it needs apt)
+# -----------------------------------------------------------
+check_mininet_source() {
+  [ -x /opt/dep/mininet/util/install.sh ]
+}
+step_mininet_source() {
+  rm -rf /opt/dep/mininet
+  cached_clone https://github.com/mininet/mininet /opt/dep/mininet
+}
+
+# 8. Install Mininet from source (full)
+# -------------------------------------
+check_mininet() {
+  command -v mn && command -v ovs-vsctl
+}
+step_mininet() {
+  # -a installs Mininet, Open vSwitch, POX, Wireshark, etc.
+  (cd /opt/dep/mininet && util/install.sh -a)
+
+  echo "Verifying Mininet installation..."
+  mn --test pingall
+
+  echo "Done! Mininet is installed."
+}
+
+# apt/dpkg steps one at a time, then the downloads and pip installs (which don't touch apt) together
+run_step apt_packages
+run_step python39
+run_step caddy
+run_step code_server
+run_parallel ryu_venv flowmanager mininet_source
+run_step mininet
+
+# The configuration below is quick and safe to repeat, so it runs every time (picking up any changes to it)
+
+# 9. Configure code-server on port 8081
+# -------------------------------------
 CONFIG_DIR="/home/student/.config/code-server"
 WORKSPACE_FILE="/home/student/SDN Dev Environment.code-workspace"
 
@@ -51,7 +257,7 @@ chown student:student "$WORKSPACE_FILE"
 # Disable default service
 systemctl disable --now code-server@student
 
-# Override systemd unit to launch code-server with our workspace\mkdir -p /etc/systemd/system/code-server@student.service.d
+# Override systemd unit to launch code-server with our workspace
 mkdir -p /etc/systemd/system/code-server@student.service.d
 cat <<EOF >/etc/systemd/system/code-server@student.service.d/override.conf
 [Service]
@@ -66,70 +272,20 @@ systemctl enable --now code-server@student
 
 echo "Code-server is running at http://<host-ip>:8081 using workspace 'SDN Dev Environment'"
 
-# 2. Add deadsnakes PPA & install Python 3.9 + distutils
-# ------------------------------------------------------
-apt update
-apt install -y software-properties-common
-add-apt-repository -y ppa:deadsnakes/ppa
-apt update
-apt install -y python3.9 python3.9-venv python3.9-distutils
-
-# 3. Create a venv at /opt/dep/ryu39
+# 10. Register ryu-manager globally
 # --------------------------------
-mkdir -p /opt/dep/ryu39
-python3.9 -m venv /opt/dep/ryu39
-chown -R student:student /opt/dep/ryu39
-
-# 4. Activate venv & install Eventlet + Ryu
-# ----------------------------------------
-source /opt/dep/ryu39/bin/activate
-pip install --upgrade pip setuptools==65.5.0 wheel
-pip uninstall -y eventlet || true
-pip install eventlet==0.30.2 ryu
-deactivate
-
-# 5. Register ryu-manager globally
-# -------------------------------
 update-alternatives --install /usr/bin/ryu-manager ryu-manager \
   /opt/dep/ryu39/bin/ryu-manager 100
 
-# 6. Verify installation
-# ----------------------
+# 10.1 Verify installation
+# ------------------------
 echo -n "ryu-manager location: "; which ryu-manager
 echo -n "ryu-manager version:  "; ryu-manager --version
 
 echo "\nSetup complete!"
 echo "- Code-server: http://<host-ip>:8081 (pwd in ~/.config/code-server/config.yaml)"
 
-# 7. Install Mininet from source (full)
-# -------------------------------------
-apt update
-apt install -y git build-essential python3-pip python3-setuptools python3-dev
-mkdir -p /opt/dep
-cd /opt/dep
-if [ ! -d mininet ]; then
-  git clone https://github.com/mininet/mininet
-fi
-cd mininet
-# -a installs Mininet, Open vSwitch, POX, Wireshark, etc.
-util/install.sh -a
-
-echo "Verifying Mininet installation..."
-mn --test pingall
-
-echo "Done! Mininet is installed."
-
-# 8. Install FlowManager into /opt/dep
-# -------------------------------------
-mkdir -p /opt/dep
-cd /opt/dep
-git clone https://github.com/martimy/flowmanager.git flowmanager
-chown -R student:student /opt/dep/flowmanager
-
-echo "FlowManager installed at /opt/dep/flowmanager"
-
-# 8.1 Install ttyd and Override to run as student directly into bash
-sudo apt install ttyd
+# 11. Override ttyd to run as student directly into bash
 echo "Configuring ttyd to launch as 'student'..."
 mkdir -p /etc/systemd/system/ttyd.service.d
 cat <<EOF >/etc/systemd/system/ttyd.service.d/override.conf
@@ -149,20 +305,7 @@ systemctl restart ttyd
 echo "ttyd now runs as 'student' on port 7681 (proxied via Caddy)."
 
 
-# 9. Caddy reverse-proxy  (port 81)
-echo "Installing Caddy…"
-apt install -y debian-keyring debian-archive-keyring curl gnupg apt-transport-https
-if [ ! -f /usr/share/keyrings/caddy-stable-archive-keyring.gpg ]; then
-  curl -1sLf https://dl.cloudsmith.io/public/caddy/stable/gpg.key | \
-    gpg --dearmor -o /usr/share/keyrings/caddy-stable-archive-keyring.gpg
-fi
-echo "deb [signed-by=/usr/share/keyrings/caddy-stable-archive-keyring.gpg] \
-https://dl.cloudsmith.io/public/caddy/stable/deb/debian any-version main" \
-  | tee /etc/apt/sources.list.d/caddy-stable.list >/dev/null
-
-apt update
-apt install -y caddy
-
+# 12. Caddy reverse-proxy  (port 81)
 echo "Writing Caddyfile…"
 cat > /etc/caddy/Caddyfile <<'EOF'
 :81 {
@@ -213,14 +356,11 @@ setcap 'cap_net_bind_service=+ep' /usr/bin/caddy
 systemctl restart caddy
 echo "Caddy reverse-proxy live on http://<host-ip>:81"
 
-# 10. Install extras
-sudo apt install cron nano iputils-ping
-
-# 11. Install update-env script for future updates
+# 13. Install update-env script for future updates
 # -----------------------------------------------
-if [ -f "$(dirname "$0")/bin/update-env" ]; then
+if [ -f "$SCRIPT_DIR/bin/update-env" ]; then
   echo "Installing update-env..."
-  sudo install -m 755 "$(dirname "$0")/bin/update-env" /usr/local/bin/update-env
+  sudo install -m 755 "$SCRIPT_DIR/bin/update-env" /usr/local/bin/update-env
   echo "You can now run 'update-env' to pull templates, bins, and utils."
 
   # Ask to schedule on startup
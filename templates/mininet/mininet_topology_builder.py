@@ -1,4 +1,8 @@
+import os
+
 from mininet_helpers import createInitialNetwork, safeMininetStartupAndExit
+from mininet_topology_loader import registerTopologyFiles
+from mininet_qos import configureQueues
 
 # ╔══════════════════════════════════════════════╗
 # ║              TOPOLOGY DEFINITIONS            ║
@@ -107,6 +111,82 @@ def threeSwitchThreeHost():
     net.start()
     safeMininetStartupAndExit(net)
 
+def week13AdvancedSdnManipulation():
+    """
+    The leaf-spine-leaf topology used by tutorial_advanced_sdn_manipulation in week_13_lecture_controller.py.
+
+    [h1] --> [leaf1] --> [spine] ==(fast lane, no delay)==> [leaf2] --> [h2] / [h3]
+                                 ==(slow lane, delayed)===>
+
+    The controller sends traffic out of specific port numbers, so every port is set explicitly here:
+    - leaf1 (DPID 1): port 1 = h1, port 2 = spine
+    - spine (DPID 2): port 1 = leaf1, port 2 = fast lane, port 3 = slow lane
+    - leaf2 (DPID 3): port 1 = slow lane, port 2 = fast lane, port 3 = h2, port 4 = h3
+
+    To measure the difference between the lanes, launch it with the lane comparison workload:
+        MN_WORKLOAD=mininet_benchmark:laneComparisonWorkload
+    """
+    net = createInitialNetwork()
+
+    h1 = net.addHost('h1', ip='10.0.0.1/24', mac='00:00:00:00:00:01')
+    h2 = net.addHost('h2', ip='10.0.0.2/24', mac='00:00:00:00:00:02')
+    h3 = net.addHost('h3', ip='10.0.0.3/24', mac='00:00:00:00:00:03')
+
+    # The controller tells the switches apart by DPID, so these have to match it
+    leaf1 = net.addSwitch('leaf1', dpid='1')
+    spine = net.addSwitch('spine', dpid='2')
+    leaf2 = net.addSwitch('leaf2', dpid='3')
+
+    net.addLink(h1, leaf1, port2=1)
+    net.addLink(leaf1, spine, port1=2, port2=1)
+    net.addLink(spine, leaf2, port1=2, port2=2, bw=100)               # Fast lane
+    net.addLink(spine, leaf2, port1=3, port2=1, bw=10, delay='50ms')  # Slow lane
+    net.addLink(h2, leaf2, port2=3)
+    net.addLink(h3, leaf2, port2=4)
+
+    net.start()
+
+    safeMininetStartupAndExit(net)
+
+def week13QosPrioritisation():
+    """
+    The topology used by tutorial_qos_prioritisation in week_13_lecture_controller.py: the same switches as week13Advanced,
+    but with a single link between the spine and leaf2, whose spine side has two queues.
+
+    [h1] --> [leaf1] --> [spine] ==(10 Mbit/s, queue 0 = best effort, queue 1 = priority)==> [leaf2] --> [h2] / [h3]
+
+    - leaf1 (DPID 1): port 1 = h1, port 2 = spine
+    - spine (DPID 2): port 1 = leaf1, port 2 = leaf2
+    - leaf2 (DPID 3): port 2 = spine, port 3 = h2, port 4 = h3
+
+    To compare its tail latency under load with the VLAN lanes of week13Advanced, launch both with:
+        MN_WORKLOAD=mininet_benchmark:tailLatencyWorkload
+    """
+    net = createInitialNetwork()
+
+    h1 = net.addHost('h1', ip='10.0.0.1/24', mac='00:00:00:00:00:01')
+    h2 = net.addHost('h2', ip='10.0.0.2/24', mac='00:00:00:00:00:02')
+    h3 = net.addHost('h3', ip='10.0.0.3/24', mac='00:00:00:00:00:03')
+
+    leaf1 = net.addSwitch('leaf1', dpid='1')
+    spine = net.addSwitch('spine', dpid='2')
+    leaf2 = net.addSwitch('leaf2', dpid='3')
+
+    net.addLink(h1, leaf1, port2=1)
+    net.addLink(leaf1, spine, port1=2, port2=1)
+    net.addLink(spine, leaf2, port1=2, port2=2)  # No bw here: the queues below do the rate limiting
+    net.addLink(h2, leaf2, port2=3)
+    net.addLink(h3, leaf2, port2=4)
+
+    net.start()
+
+    configureQueues(net, 'spine', 2, maxRate=10e6, queues=[
+        {'minRate': 1e6, 'priority': 1},  # Queue 0: best effort
+        {'minRate': 8e6, 'priority': 0},  # Queue 1: priority
+    ])
+
+    safeMininetStartupAndExit(net)
+
 def templateTopology():
     """
     This one’s a blank slate.
@@ -143,11 +223,38 @@ def templateTopology():
 #
 # Left side = the name you type after --topo
 # Right side = the function that sets up the network (wrapped in lambda)
+#
+# You can also run this file directly, which lets you skip every prompt (handy for scripted runs):
+#   sudo python3 mininet_topology_builder.py --topo basicExample --controller-mode remote --workload my_test.py
+# See getLaunchOptions() in mininet_helpers.py for all the flags and their environment variable equivalents.
 
 topos = {
     'basicExample': (lambda: basicExampleTopology()),
     'advancedExample': (lambda: advancedExampleTopology()),
     '1Switch3Host': (lambda: oneSwitchThreeHost()),
-    '3Switch3Host': (lambda: threeSwitchThreeHost())
+    '3Switch3Host': (lambda: threeSwitchThreeHost()),
+    'week13Advanced': (lambda: week13AdvancedSdnManipulation()),
+    'week13Qos': (lambda: week13QosPrioritisation())
     # Add your own as needed
-}
\ No newline at end of file
+}
+
+# Topologies written as JSON/YAML files in the 'topologies' folder next to this file are registered automatically,
+# named after the file. E.g. topologies/treeExample.json can be launched with --topo treeExample.
+# See mininet_topology_loader.py for the file format.
+# ('sudo mn --custom' doesn't set __file__, so the folder is worked out from where this code was compiled from.)
+registerTopologyFiles(topos, os.path.join(os.path.dirname(os.path.abspath((lambda: 0).__code__.co_filename)), 'topologies'))
+
+
+if __name__ == '__main__':
+    import argparse
+    from mininet.log import setLogLevel
+
+    parser = argparse.ArgumentParser(
+        description="Launch a registered topology directly. Controller and workload flags are handled by mininet_helpers.getLaunchOptions().",
+        allow_abbrev=False
+    )
+    parser.add_argument('--topo', required=True, choices=sorted(topos), help="Name of the topology in the 'topos' dictionary")
+    args, _helperArgs = parser.parse_known_args()
+
+    setLogLevel('info')
+    topos[args.topo]()
@@ -3,9 +3,10 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import MAIN_DISPATCHER, CONFIG_DISPATCHER, set_ev_cls
 from ryu.ofproto import ofproto_v1_3, inet
 from ryu.lib.packet import packet, ethernet, ipv4, udp, arp, ether_types, vlan, tcp, icmp
+from ryu_template_base import TemplateBaseApp  # install_flow() and send_packet_out() live here (utils/ryu)
 
 
-class TemplateRyuApp(app_manager.RyuApp):
+class TemplateRyuApp(TemplateBaseApp):
     """
     A minimal Ryu app that logs packet-in events and installs a table-miss flow.
     """
@@ -17,50 +18,6 @@ class TemplateRyuApp(app_manager.RyuApp):
         """
         super(TemplateRyuApp, self).__init__(*args, **kwargs)
 
-    def install_flow(self, datapath, priority, match, actions=[], table_id=0, goto_table=None, idle_timeout=0, hard_timeout=0):
-        """
-        Use to install a flow on a switch.
-
-        datapath: The datapath of the switch
-        priority: Higher priority will appear higher on flow table, and more likely to be matched.
-        match: The OFPMatch object that will be used.
-        actions: A list of match options
-        table_id: The table id that will be used, only necessary if you have multiple tables.
-        goto_table: If you want to continue processing after finishing your actions, you can go to another table. This will specify the table id.
-        idle_timeout: (seconds) how long until the network device deletes the flow
-        hard_timeout: (seconds) how long period until the flow is deleted, regardless of how long it is being used.
-
-        """
-        parser = datapath.ofproto_parser
-        ofproto = datapath.ofproto
-
-        # Create a list of instructions
-        instructions = []
-
-        # If actions are found (i.e., the actions list is not blank), wrap them as instructions
-        # This creates a list of instructions that effectively says to 'apply' the action
-        if actions:
-            instructions.append(parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions))
-
-        # If the goto_table variable set, apply the Goto Table
-        if goto_table is not None:
-            instructions.append(parser.OFPInstructionGotoTable(goto_table))
-
-        # Create the flow mod message
-        mod = parser.OFPFlowMod(
-            datapath=datapath,
-            priority=priority,
-            match=match,
-            instructions=instructions,
-            table_id=table_id,
-            idle_timeout=idle_timeout,
-            hard_timeout=hard_timeout
-        )
-
-        # Send the flow mod message to the switch
-        datapath.send_msg(mod)
-
-
     def match_template_showcase(self, datapath):
         """
         This method is NOT meant to be used directly.
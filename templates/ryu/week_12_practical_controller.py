@@ -4,8 +4,19 @@ from ryu.controller.handler import MAIN_DISPATCHER, CONFIG_DISPATCHER, set_ev_cl
 from ryu.ofproto import ofproto_v1_3, inet
 from ryu.lib.packet import packet, ethernet, ipv4, udp, arp, ether_types
 from ryu_maze import Maze
+from ryu_offload import PacketInOffloader, packet_in_key
+from ryu_template_base import TemplateBaseApp  # install_flow() and send_packet_out() live here (utils/ryu)
 
-class TemplateRyuApp(app_manager.RyuApp):
+
+def parse_ipv4(data):
+    """
+    Parses a packet's raw data and returns its IPv4 header (or None if it isn't IPv4).
+    Runs in a worker thread (see packet_in_handler), so it mustn't touch datapaths or self.
+    """
+    return packet.Packet(data).get_protocol(ipv4.ipv4)
+
+
+class TemplateRyuApp(TemplateBaseApp):
     """
     A minimal Ryu app that logs packet-in events and installs a table-miss flow.
     """
@@ -15,56 +26,14 @@ class TemplateRyuApp(app_manager.RyuApp):
         """
         Initialize the Ryu app and any necessary variables.
         """
-        # As "TemplateRyuApp" is inheriting from "app_manager.RyuApp", this is effectively 'creating' the data structure inherited from "app_manager.RyuApp"
+        # As "TemplateRyuApp" is inheriting from "TemplateBaseApp" (itself an "app_manager.RyuApp"), this is effectively 'creating' the data structure inherited from it
         # This will make some sense if you have done Object Oriented Programming. If not, don't worry! It's not a necessity to completely understand this :)
         super(TemplateRyuApp, self).__init__(*args, **kwargs)
         self.maze = Maze()
         # self.maze.start()
 
-    def install_flow(self, datapath, priority, match, actions=[], table_id=0, goto_table=None, idle_timeout=0, hard_timeout=0):
-        """
-        Use to install a flow on a switch.
-
-        datapath: The datapath of the switch
-        priority: Higher priority will appear higher on flow table, and more likely to be matched.
-        match: The OFPMatch object that will be used.
-        actions: A list of match options
-        table_id: The table id that will be used, only necessary if you have multiple tables.
-        goto_table: If you want to continue processing after finishing your actions, you can go to another table. This will specify the table id.
-        idle_timeout: (seconds) how long until the network device deletes the flow
-        hard_timeout: (seconds) how long period until the flow is deleted, regardless of how long it is being used.
-
-        Note: For the most part, you will only need to worry about providing the datapath, priority, match (most important) and actions (most important). Only modify the others if need be.
-        This is a template function, you should not be modifying this.
-        """
-        parser = datapath.ofproto_parser
-        ofproto = datapath.ofproto
-
-        # Create a list of instructions
-        instructions = []
-
-        # If actions are found (i.e., the actions list is not blank), wrap them as instructions
-        # This creates a list of instructions that effectively says to 'apply' the action
-        if actions:
-            instructions.append(parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions))
-
-        # If the goto_table variable set, apply the Goto Table
-        if goto_table is not None:
-            instructions.append(parser.OFPInstructionGotoTable(goto_table))
-
-        # Create the flow mod message
-        mod = parser.OFPFlowMod(
-            datapath=datapath,
-            priority=priority,
-            match=match,
-            instructions=instructions,
-            table_id=table_id,
-            idle_timeout=idle_timeout,
-            hard_timeout=hard_timeout
-        )
-
-        # Send the flow mod message to the switch
-        datapath.send_msg(mod)
+        # Runs the slow part of each packet-in (parsing it) in worker threads, so the controller keeps answering switches meanwhile
+        self.offload = PacketInOffloader(self, workers=4)
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -91,19 +60,27 @@ class TemplateRyuApp(app_manager.RyuApp):
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def packet_in_handler(self, ev):
         """
-        Handles packets sent to the controller and prints basic info.
+        Handles packets sent to the controller.
+
+        Parsing a packet is slow (for a controller), and while this method runs Ryu can't do anything else, not even answer
+        the switches. So instead of parsing here, the raw data is handed to parse_ipv4 in a worker thread, and once
+        that's done, packet_in_logic is called with the result. Packets of the same flow are still handled in order.
         """
         msg = ev.msg
-        datapath = msg.datapath
+        self.offload.submit(packet_in_key(msg), parse_ipv4, msg.data,
+                            done=lambda ip_pkt: self.packet_in_logic(msg, ip_pkt))
 
-        # Parses the RAW Data into readable Packet Data
-        pkt = packet.Packet(msg.data)
+    def packet_in_logic(self, msg, ip_pkt):
+        """
+        Called with each packet-in message and its IPv4 data, once parse_ipv4 has finished with it.
+        This runs back in the controller (not a worker thread), so sending flows and packets from here is fine.
+        """
+        datapath = msg.datapath
 
-        # Gets the IPv4 Data from the Packet
-        # This will only work if it is an IPv4 Packet.
-        # If the event receives an ARP Request instead, as an example, this variable will return None
+        # ip_pkt is the IPv4 Data from the Packet
+        # This will only be set if it is an IPv4 Packet.
+        # If the event receives an ARP Request instead, as an example, it will be None
         # Refer to basic_ipv4_vlan_and_arp_variables.py under Week 12 > Practical for additional examples of what you can get from these variables.
-        ip_pkt = pkt.get_protocol(ipv4.ipv4)
 
         # If it's an IPv4 Packet
         if ip_pkt:
@@ -114,7 +91,3 @@ class TemplateRyuApp(app_manager.RyuApp):
             destination_ip = ip_pkt.dst
             
             # ADD CUSTOM LOGIC HERE #
-            
-
-
-
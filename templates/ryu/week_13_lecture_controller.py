@@ -3,8 +3,11 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import MAIN_DISPATCHER, CONFIG_DISPATCHER, set_ev_cls
 from ryu.ofproto import ofproto_v1_3, inet
 from ryu.lib.packet import packet, ethernet, ipv4, udp, arp, ether_types
+from ryu_fast_failover import FastFailoverManager
+from ryu_qos import QosManager
+from ryu_template_base import TemplateBaseApp  # install_flow() and send_packet_out() live here (utils/ryu)
 
-class TemplateRyuApp(app_manager.RyuApp):
+class TemplateRyuApp(TemplateBaseApp):
     """
     A minimal Ryu app that logs packet-in events and installs a table-miss flow.
     """
@@ -14,11 +17,19 @@ class TemplateRyuApp(app_manager.RyuApp):
         """
         Initialize the Ryu app and any necessary variables.
         """
-        # As "TemplateRyuApp" is inheriting from "app_manager.RyuApp", this is effectively 'creating' the data structure inherited from "app_manager.RyuApp"
+        # As "TemplateRyuApp" is inheriting from "TemplateBaseApp" (itself an "app_manager.RyuApp"), this is effectively 'creating' the data structure inherited from it
         # This will make some sense if you have done Object Oriented Programming. If not, don't worry! It's not a necessity to completely understand this :)
         super(TemplateRyuApp, self).__init__(*args, **kwargs)
         self.preferred_port = 1
 
+        # Fast-failover groups, used by tutorial_advanced_sdn_manipulation so traffic survives a lane going down
+        self.fast_failover = FastFailoverManager(self)
+
+        # Which failover group each VLAN lane uses on the spine (tutorial_swap_vlan_lanes flips them)
+        self.vlan_lanes = {100: 1, 200: 2}
+
+        # Queues and meters, used by tutorial_qos_prioritisation
+        self.qos = QosManager(self)
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -28,6 +39,8 @@ class TemplateRyuApp(app_manager.RyuApp):
 
         self.logger.info("Switch connected... loading flows....")
 
+        self.switch_config.configure(ev.msg)
+
         # Add appropriate tutorial methods here
 
 
@@ -47,6 +60,14 @@ class TemplateRyuApp(app_manager.RyuApp):
 
         # Add appropriate tutorial methods here
 
+    @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+    def port_status_handler(self, ev):
+        """
+        A switch tells us whenever one of its ports changes (e.g. a link goes down).
+        The switch already moves traffic onto the backup port by itself, this just keeps the failover groups up to date.
+        """
+        self.fast_failover.port_status(ev)
+
     def tutorial_match_arp_and_icmp_normal(self, ev):
         """
         Custom method used to showcase matching of ICMP + ARP, and applying the "NORMAL" and OUTPUT: CONTROLLER methods
@@ -137,7 +158,7 @@ class TemplateRyuApp(app_manager.RyuApp):
                                     /               \
                                 [h2]            [h3]
 
-        This mininet topology is found in week_13_advanced_sdn_manipulation_topology.py
+        This mininet topology is 'week13Advanced' in mininet_topology_builder.py (see week13AdvancedSdnManipulation for the port numbers).
 
         To make this work, we will also be showcasing the usage of packet in alongside of this. This is NOT a requirement to set it up, it's just used as an example.
 
@@ -176,30 +197,47 @@ class TemplateRyuApp(app_manager.RyuApp):
             # We are going to make a match for VLAN traffic. Dependent on what vlan (100 or 200), it will send it towards different ports.
             # One port will have a delay, the other will not.
 
+            # But what if one of the lanes goes down? If we just said "output to port 2", that traffic would be lost until
+            # someone changed the code. Instead, we use 'fast-failover groups': a list of ports in order of preference,
+            # where the switch itself uses the first one that's still up. If the fast lane fails, VLAN 100 moves to
+            # the slow lane within milliseconds (and back again once the fast lane recovers).
+            # The groups have to be installed before the flows that use them.
+            self.fast_failover.install_group(datapath, 1, [2, 3])  # Group 1: fast lane (port 2), backup slow lane (port 3)
+            self.fast_failover.install_group(datapath, 2, [3, 2])  # Group 2: slow lane (port 3), backup fast lane (port 2)
+
             match = parser.OFPMatch(
                 vlan_vid=(100 | 0x1000 ) # Matching VLAN 100
             )
             
-            # We will now set the actions to remove the VLAN (as they have served their process), and forward to the optimal port (2).
+            # We will now set the actions to remove the VLAN (as they have served their process), and forward to the optimal port (2) through group 1.
             actions = [
                 parser.OFPActionPopVlan(), # Removes VLAN Header
-                parser.OFPActionOutput(2)  # Sends out to Port 2
+                self.fast_failover.group_action(datapath, self.vlan_lanes[100])  # Group 1: sends out to Port 2 (or Port 3 if Port 2 is down)
             ]
 
-            self.install_flow(datapath, 1, match, actions)
+            # feature='vlan_lanes' tags both VLAN flows, so tutorial_swap_vlan_lanes can replace exactly these two later
+            self.install_flow(datapath, 1, match, actions, feature='vlan_lanes')
 
             # We now need to do for VLAN 200! It will be slightly different.
 
             match = parser.OFPMatch(
-                vlan_vid=(200 | 0x1000 ) # Matching VLAN 100
+                vlan_vid=(200 | 0x1000 ) # Matching VLAN 200
             )
 
             actions = [
                 parser.OFPActionPopVlan(), # Removes VLAN Header
-                parser.OFPActionOutput(3)  # Sends out to Port 2
+                self.fast_failover.group_action(datapath, self.vlan_lanes[200])  # Group 2: sends out to Port 3 (or Port 2 if Port 3 is down)
             ]
 
-            self.install_flow(datapath, 1, match, actions)
+            self.install_flow(datapath, 1, match, actions, feature='vlan_lanes')
+
+            # Traffic coming back from Leaf Switch 2 (on either lane) always goes straight back towards Leaf Switch 1 (port 1).
+            # If we left this to NORMAL, the spine would flood it down the other lane, Leaf Switch 2 would send it straight back up,
+            # and it would loop between the two lanes forever.
+            for lane_port in (2, 3):
+                match = parser.OFPMatch(in_port=lane_port)
+                actions = [parser.OFPActionOutput(1)]
+                self.install_flow(datapath, 1, match, actions)
 
             # We also have to add a basic flow that matches everything else and does normal output.
             
@@ -251,7 +289,9 @@ class TemplateRyuApp(app_manager.RyuApp):
             self.install_flow(datapath, priority=1, match=match_ip, actions=actions)
             self.install_flow(datapath, priority=1, match=match_arp, actions=actions)
 
-            # And the same for 10.0.0.1
+            # And the same for 10.0.0.1. This one goes back up to the spine, so it can use either lane:
+            # group 3 prefers the fast lane (port 2) and falls back to the slow lane (port 1).
+            self.fast_failover.install_group(datapath, 3, [2, 1])
 
             match_ip = parser.OFPMatch(
             eth_type=ether_types.ETH_TYPE_IP, # IPv4
@@ -263,10 +303,77 @@ class TemplateRyuApp(app_manager.RyuApp):
                 arp_tpa='10.0.0.1'                           # ARP Target Protocol Address (destination IP)
             )
 
-            actions = [parser.OFPActionOutput(2)]
+            actions = [self.fast_failover.group_action(datapath, 3)]
             self.install_flow(datapath, priority=1, match=match_ip, actions=actions)
             self.install_flow(datapath, priority=1, match=match_arp, actions=actions)
 
+    def tutorial_swap_vlan_lanes(self, datapath):
+        """
+        Swaps the spine's VLAN lanes while traffic is flowing: VLAN 100 takes the slow lane and VLAN 200 the fast one (and back
+        again the next time it's called). Call it with the spine's datapath, e.g. on a timer from tutorial_advanced_sdn_manipulation:
+            hub.spawn_after(30, self.tutorial_swap_vlan_lanes, datapath)   (with 'from ryu.lib import hub')
+
+        Changing a policy the simple way (delete the old flows, then add the new ones) leaves a moment where the spine has
+        no VLAN flows at all. Any VLAN packet arriving then hits the NORMAL catch-all instead of its lane.
+        Inside self.transaction(...), nothing is sent until the block ends, and then both new flows replace both old
+        ones in one go (as an OpenFlow bundle, see ryu_flow_transaction.py in utils/ryu).
+        """
+        parser = datapath.ofproto_parser
+        self.vlan_lanes = {100: self.vlan_lanes[200], 200: self.vlan_lanes[100]}
+
+        with self.transaction(datapath, 'vlan_lanes'):
+            for vlan_id, group_id in self.vlan_lanes.items():
+                match = parser.OFPMatch(vlan_vid=(vlan_id | 0x1000))
+                actions = [
+                    parser.OFPActionPopVlan(),
+                    self.fast_failover.group_action(datapath, group_id)
+                ]
+                self.install_flow(datapath, 1, match, actions)
+
+        self.logger.info("VLAN lanes swapped: VLAN 100 -> group %s, VLAN 200 -> group %s",
+                         self.vlan_lanes[100], self.vlan_lanes[200])
+
+    def tutorial_qos_prioritisation(self, ev):
+        """
+        Another way to prioritise traffic: instead of sending the important traffic down a different path (like the VLAN lanes
+        in tutorial_advanced_sdn_manipulation), all traffic shares one link, but the important traffic goes into a
+        priority queue on it.
+
+        [h1] --> [Leaf Switch 1] --> [Spine Switch] ==(one link, with queues)==> [Leaf Switch 2] --> [h2] / [h3]
+
+        This mininet topology is 'week13Qos' in mininet_topology_builder.py. It creates two queues on the spine's port 2:
+        - Queue 0: best effort (the default for anything not put in a queue)
+        - Queue 1: priority, served first and guaranteed most of the link
+
+        Everything here is installed when the switch connects, so unlike the VLAN version not a single packet has to
+        go to the controller first. Use this in switch_features_handler.
+        """
+
+        datapath = ev.msg.datapath
+
+        parser = datapath.ofproto_parser
+        ofproto = datapath.ofproto
+
+        if datapath.id == 2:
+            self.logger.info("Spine Switch connected, installing QoS flows")
+
+            # A meter is like a speed limit: anything above the rate is dropped.
+            # We'll use it to stop the best effort traffic from ever taking up the whole link.
+            self.qos.install_meter(datapath, 1, rate_kbps=8000)  # Meter 1: 8 Mbit/s
+
+            # Traffic for 10.0.0.2 is our important traffic: it goes in the priority queue (1)
+            match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst='10.0.0.2')
+            self.qos.install_class_flow(datapath, 1, match, queue_id=1, actions=[parser.OFPActionOutput(2)])
+
+            # Traffic for 10.0.0.3 is bulk traffic: it goes in the best effort queue (0), and through the meter first
+            match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst='10.0.0.3')
+            self.qos.install_class_flow(datapath, 1, match, queue_id=0, actions=[parser.OFPActionOutput(2)], meter_id=1)
+
+        # There's only one path through this topology, so everything else (ARP, replies, ...) can just be switched normally
+        match = parser.OFPMatch()
+        actions = [parser.OFPActionOutput(ofproto.OFPP_NORMAL)]
+        self.install_flow(datapath, 0, match, actions)
+
     def tutorial_advanced_sdn_manipulation_packet_in(self, ev):
         """
         The Packet In portion of the advanced sdn manipulation tutorial.
@@ -319,66 +426,27 @@ class TemplateRyuApp(app_manager.RyuApp):
                 parser.OFPActionOutput(ofproto.OFPP_NORMAL) # Just normal switch output if no VLAN created, this will allow for traffic coming back from H2/H3
             ]
 
-        self.send_packet_out(ev, actions)
-
-
-
-    def install_flow(self, datapath, priority, match, actions=[], table_id=0, goto_table=None, idle_timeout=0, hard_timeout=0):
-        """
-        Use to install a flow on a switch.
-
-        datapath: The datapath of the switch
-        priority: Higher priority will appear higher on flow table, and more likely to be matched.
-        match: The OFPMatch object that will be used.
-        actions: A list of match options
-        table_id: The table id that will be used, only necessary if you have multiple tables.
-        goto_table: If you want to continue processing after finishing your actions, you can go to another table. This will specify the table id.
-        idle_timeout: (seconds) how long until the network device deletes the flow
-        hard_timeout: (seconds) how long period until the flow is deleted, regardless of how long it is being used.
-        """
-        parser = datapath.ofproto_parser
-        ofproto = datapath.ofproto
-
-        # Create a list of instructions
-        instructions = []
-
-        # If actions are found (i.e., the actions list is not blank), wrap them as instructions
-        # This creates a list of instructions that effectively says to 'apply' the action
-        if actions:
-            instructions.append(parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions))
-
-        # If the goto_table variable set, apply the Goto Table
-        if goto_table is not None:
-            instructions.append(parser.OFPInstructionGotoTable(goto_table))
-
-        # Create the flow mod message
-        mod = parser.OFPFlowMod(
-            datapath=datapath,
-            priority=priority,
-            match=match,
-            instructions=instructions,
-            table_id=table_id,
-            idle_timeout=idle_timeout,
-            hard_timeout=hard_timeout
-        )
-
-        # Send the flow mod message to the switch
-        datapath.send_msg(mod)
+        if not vlan_id:
+            self.send_packet_out(ev, actions)
+            return
 
-    def send_packet_out(self, ev, actions):
-        """
-        Sends a packet out. Used when you have modified a packet for during a PacketIn event.
-        """
-        datapath = ev.msg.datapath
-        parser = datapath.ofproto_parser
+        # We also install a flow on Leaf Switch 1 for this destination, so the rest of the packets get tagged by the switch itself
+        # instead of every single one coming to the controller.
+        if ip_pkt:
+            match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst=ip_pkt.dst)
+        else:
+            match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_ARP, arp_tpa=arp_pkt.dst_ip)
 
-        out = parser.OFPPacketOut(
-            datapath=datapath,
-            buffer_id=ev.msg.buffer_id,
-            in_port=ev.msg.match['in_port'],
-            actions=actions,
-            data=ev.msg.data
-        )
+        # wait=True gives us back a 'handle' that tells us when the switch has actually applied the flow.
+        # If we sent the packet straight away, the packets right behind it could still reach the switch before the flow
+        # is active, and come to the controller as more packet-ins.
+        handle = self.install_flow(datapath, 1, match, actions, wait=True)
 
-        datapath.send_msg(out)
+        # We can't just wait here (the switch's reply is handled by this same app, one event at a time),
+        # so instead we give the handle a function to call once the flow is active.
+        def flow_ready(handle):
+            if not handle.succeeded:
+                self.logger.warning(f"Flow for VLAN {vlan_id} wasn't installed ({handle.error}), forwarding this packet anyway")
+            self.send_packet_out(ev, actions)
 
+        handle.add_done_callback(flow_ready)
@@ -3,8 +3,9 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import MAIN_DISPATCHER, CONFIG_DISPATCHER, set_ev_cls
 from ryu.ofproto import ofproto_v1_3, inet
 from ryu.lib.packet import packet, ethernet, ipv4, udp, arp, ether_types
+from ryu_template_base import TemplateBaseApp  # install_flow() and send_packet_out() live here (utils/ryu)
 
-class TemplateRyuApp(app_manager.RyuApp):
+class TemplateRyuApp(TemplateBaseApp):
     """
     A minimal Ryu app that logs packet-in events and installs a table-miss flow.
     """
@@ -14,11 +15,11 @@ class TemplateRyuApp(app_manager.RyuApp):
         """
         Initialize the Ryu app and any necessary variables.
         """
-        # As "TemplateRyuApp" is inheriting from "app_manager.RyuApp", this is effectively 'creating' the data structure inherited from "app_manager.RyuApp"
+        # As "TemplateRyuApp" is inheriting from "TemplateBaseApp" (itself an "app_manager.RyuApp"), this is effectively 'creating' the data structure inherited from it
         # This will make some sense if you have done Object Oriented Programming. If not, don't worry! It's not a necessity to completely understand this :)
         super(TemplateRyuApp, self).__init__(*args, **kwargs)
         
-        # The two potential round-robin options, used alongside self.get_port_option()
+        # The two potential backend options, used alongside self.get_port_option()
         self.port_options = [
             {'port': 2, 'ip_address': '10.0.0.101'}, 
             {'port': 3, 'ip_address': '10.0.0.102'}
@@ -26,14 +27,60 @@ class TemplateRyuApp(app_manager.RyuApp):
 
         self.current_port = 0
 
-    def get_port_option(self):
+        # How many clients are currently using each backend (by IP)
+        self.backend_load = {option['ip_address']: 0 for option in self.port_options}
+
+        # Every client currently being load balanced, so the same client always sticks to the same backend:
+        # (switch_id, client_ip) -> {'port', 'ip_address', 'cookie'}
+        self.sessions = {}
+        self.sessions_by_cookie = {}  # cookie -> (switch_id, client_ip), to find the session again when its flow is removed
+        self.next_cookie = 1
+
+    def get_port_option(self, switch_id, client_ip):
         """
-        Provides the current option from self.port_options, then toggles self.current_port
-        between 0 and 1 for the next call.
+        Picks the backend for a client and returns it as a dictionary: {'port': 2, 'ip_address': '10.0.0.101', 'cookie': 1}
+
+        - A client that already has a session keeps its backend.
+        - A new client gets the backend with the fewest clients (taking turns between them when it's a tie).
+
+        The 'cookie' is a number that gets stored on the client's flow, so when the switch tells us the flow was
+        removed (see flow_removed_handler) we know which session has ended.
         """
+        session = self.sessions.get((switch_id, client_ip))
+        if session:
+            return session
+
+        least_load = min(self.backend_load.values())
+        while self.backend_load[self.port_options[self.current_port]['ip_address']] != least_load:
+            self.current_port = (self.current_port + 1) % len(self.port_options)
         option = self.port_options[self.current_port]
-        self.current_port = 1 - self.current_port
-        return option
+        self.current_port = (self.current_port + 1) % len(self.port_options)
+
+        session = dict(option, cookie=self.next_cookie)
+        self.next_cookie += 1
+        self.sessions[(switch_id, client_ip)] = session
+        self.sessions_by_cookie[session['cookie']] = (switch_id, client_ip)
+        self.backend_load[option['ip_address']] += 1
+        return session
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    def flow_removed_handler(self, ev):
+        """
+        The switch tells us when a flow installed with the OFPFF_SEND_FLOW_REM flag is removed,
+        e.g. because nothing matched it for idle_timeout seconds. That means the client has gone quiet,
+        so its session ends and its backend has one less client.
+        """
+        msg = ev.msg
+        key = self.sessions_by_cookie.pop(msg.cookie, None)
+        if key is None:
+            return  # Not one of our load balancing flows
+
+        session = self.sessions.pop(key)
+        self.backend_load[session['ip_address']] -= 1
+        self.logger.info(
+            f"Session ended for client {key[1]} on switch {key[0]} (backend {session['ip_address']}, "
+            f"{msg.packet_count} packets, {msg.duration_sec}s). Backend load is now: {self.backend_load}"
+        )
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -110,19 +157,24 @@ class TemplateRyuApp(app_manager.RyuApp):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
 
+        ip_pkt = pkt.get_protocol(ipv4.ipv4)
+        if ip_pkt is None:
+            return
+        client_ip = ip_pkt.src  # Each client gets its own flow (and so its own backend)
+
 
         self.logger.info(
         f"PACKET-IN HANDLER TRIGGERED BY SWITCH ID: {switch_id}:\n" # NOTE: Remember, you can use the switch_id in if statements if you want to have different flows for different switches
         "  Received a packet targeting 10.0.0.100\n"
-        "  Round robin will decide which backend host to forward to"
+        "  The least loaded backend host will be picked for this client"
     )
 
-        # ROUND ROBIN TARGET SELECTION
-        # TODO: Call self.get_port_option() to get the next backend IP + port
-        selected = None  #NOTE If you call self.get_port_option() it'll give a dictionary with a structure that looks like this: {'port': 2, 'ip_address': '10.0.0.101'}
+        # BACKEND SELECTION
+        # TODO: Call self.get_port_option(switch_id, client_ip) to get this client's backend IP + port
+        selected = None  #NOTE If you call self.get_port_option(switch_id, client_ip) it'll give a dictionary with a structure that looks like this: {'port': 2, 'ip_address': '10.0.0.101', 'cookie': 1}
 
         # BUILD MATCH
-        # TODO: Match IP traffic with dst IP = 10.0.0.100
+        # TODO: Match IP traffic with src IP = client_ip and dst IP = 10.0.0.100
         match = parser.OFPMatch()
 
         # BUILD ACTIONS
@@ -134,57 +186,14 @@ class TemplateRyuApp(app_manager.RyuApp):
 
         # INSTALL FLOW
         self.logger.info(
-            "INSTALLING TEMPORARY FLOW:\n"
+            f"INSTALLING FLOW FOR CLIENT {client_ip}:\n"
             f"  -> dst IP becomes {selected['ip_address']}\n"
             f"  -> forwarding out port {selected['port']}\n"
-            "  -> hard_timeout = 10 seconds\n"
+            "  -> idle_timeout = 10 seconds (removed once the client has been quiet for 10 seconds)\n"
             "  -> priority = higher than base flows"
         )
 
         # TODO: Install the flow using self.install_flow()
-        #       Set hard_timeout=10, priority=3
-
-
-
-    def install_flow(self, datapath, priority, match, actions=[], table_id=0, goto_table=None, idle_timeout=0, hard_timeout=0):
-        """
-        Use to install a flow on a switch.
-
-        datapath: The datapath of the switch
-        priority: Higher priority will appear higher on flow table, and more likely to be matched.
-        match: The OFPMatch object that will be used.
-        actions: A list of match options
-        table_id: The table id that will be used, only necessary if you have multiple tables.
-        goto_table: If you want to continue processing after finishing your actions, you can go to another table. This will specify the table id.
-        idle_timeout: (seconds) how long until the network device deletes the flow
-        hard_timeout: (seconds) how long period until the flow is deleted, regardless of how long it is being used.
-        """
-        parser = datapath.ofproto_parser
-        ofproto = datapath.ofproto
-
-        # Create a list of instructions
-        instructions = []
-
-        # If actions are found (i.e., the actions list is not blank), wrap them as instructions
-        # This creates a list of instructions that effectively says to 'apply' the action
-        if actions:
-            instructions.append(parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions))
-
-        # If the goto_table variable set, apply the Goto Table
-        if goto_table is not None:
-            instructions.append(parser.OFPInstructionGotoTable(goto_table))
-
-        # Create the flow mod message
-        mod = parser.OFPFlowMod(
-            datapath=datapath,
-            priority=priority,
-            match=match,
-            instructions=instructions,
-            table_id=table_id,
-            idle_timeout=idle_timeout,
-            hard_timeout=hard_timeout
-        )
-
-        # Send the flow mod message to the switch
-        datapath.send_msg(mod)
-
+        #       Set idle_timeout=10, priority=3, cookie=selected['cookie'] and flags=ofproto.OFPFF_SEND_FLOW_REM
+        #       (the flag asks the switch to tell us when the flow is removed, see flow_removed_handler)
+        #       Unlike a hard_timeout, an idle_timeout never interrupts a client that's still sending traffic.
@@ -0,0 +1,419 @@
+import datetime
+import itertools
+import json
+import os
+import re
+import statistics
+import time
+
+# ╔══════════════════════════════════════════════╗
+# ║             TRAFFIC BENCHMARK SUITE          ║
+# ╚══════════════════════════════════════════════╝
+# Runs ping latency, iperf throughput and flow-setup-time tests across host pairs of any topology,
+# with every host's command started at the same time, and writes the results out as JSON.
+#
+# The easiest way to use it is as a workload (see runWorkload() in mininet_helpers.py):
+#   sudo MN_CONTROLLER_MODE=remote MN_WORKLOAD=mininet_benchmark:benchmarkWorkload \
+#        python3 mininet_topology_builder.py --topo 3Switch3Host
+#
+# Or call runBenchmarkSuite(net) yourself after net.start() in a topology method.
+
+PING_RTT = re.compile(r'time[=<]([\d.]+) ms')
+
+DEFAULT_TESTS = ('flowSetup', 'ping', 'iperfTcp', 'iperfUdp')
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile (0-100) of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarise(values):
+    """Count, min/max/mean and p50/p90/p99 of a list of samples."""
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'min': min(values),
+        'max': max(values),
+        'mean': statistics.mean(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+    }
+
+
+def hostPairs(net, hosts=None, pairs=None):
+    """Works out which (source, destination) host pairs to test.
+
+    pairs: explicit list of (source name, destination name) tuples, e.g. [('h1', 'h2'), ('h1', 'h3')]
+    hosts: list of host names to test every pair between
+    With neither, every pair of hosts in the network is tested.
+    """
+    if pairs:
+        return [(net.get(src), net.get(dst)) for src, dst in pairs]
+    nodes = [net.get(name) for name in hosts] if hosts else list(net.hosts)
+    return list(itertools.combinations(nodes, 2))
+
+
+def pairName(src, dst):
+    return f"{src.name}->{dst.name}"
+
+
+def _decode(output):
+    if isinstance(output, bytes):
+        return output.decode('utf-8', 'replace')
+    return output or ''
+
+
+def fanOut(jobs, timeout=None):
+    """Starts every (host, argv) job at once inside its host's namespace, then collects the output of each.
+
+    Returns a list of (returncode, stdout) in the same order as 'jobs'.
+    """
+    processes = [host.popen(argv) for host, argv in jobs]
+    results = []
+    for process in processes:
+        try:
+            out, _err = process.communicate(timeout=timeout)
+        except Exception:
+            process.kill()
+            out, _err = process.communicate()
+        results.append((process.returncode, _decode(out)))
+    return results
+
+
+def parsePingRtts(output):
+    """Round trip times (ms) of every reply in a ping output, in the order they arrived."""
+    return [float(rtt) for rtt in PING_RTT.findall(output)]
+
+
+def runPingTest(net, pairs, count=20, interval=0.2):
+    """Pings every pair at the same time and reports RTT percentiles (ms) per pair and across all pairs."""
+    jobs = [(src, ['ping', '-n', '-c', str(count), '-i', str(interval), dst.IP()]) for src, dst in pairs]
+    results = fanOut(jobs, timeout=count * interval + 10)
+
+    perPair = {}
+    allRtts = []
+    for (src, dst), (_code, output) in zip(pairs, results):
+        rtts = parsePingRtts(output)
+        allRtts.extend(rtts)
+        summary = summarise(rtts)
+        summary['lossPct'] = 100.0 * (count - len(rtts)) / count
+        perPair[pairName(src, dst)] = summary
+
+    return {'unit': 'ms', 'perPair': perPair, 'overall': summarise(allRtts)}
+
+
+def runFlowSetupTest(net, pairs, count=5, interval=0.2):
+    """Estimates flow setup time: how much longer the first packet of a new flow takes than the ones after it.
+
+    Run this before anything else has sent traffic, otherwise the flows (and ARP entries) are already in place.
+    """
+    jobs = [(src, ['ping', '-n', '-c', str(count), '-i', str(interval), dst.IP()]) for src, dst in pairs]
+    results = fanOut(jobs, timeout=count * interval + 10)
+
+    perPair = {}
+    setupTimes = []
+    for (src, dst), (_code, output) in zip(pairs, results):
+        rtts = parsePingRtts(output)
+        if len(rtts) < 2:
+            perPair[pairName(src, dst)] = {'firstRtt': rtts[0] if rtts else None, 'setupTime': None}
+            continue
+        steady = statistics.median(rtts[1:])
+        setupTime = max(rtts[0] - steady, 0.0)
+        setupTimes.append(setupTime)
+        perPair[pairName(src, dst)] = {'firstRtt': rtts[0], 'steadyRtt': steady, 'setupTime': setupTime}
+
+    return {'unit': 'ms', 'perPair': perPair, 'overall': summarise(setupTimes)}
+
+
+def parseIperfCsv(output):
+    """Pulls throughput (and UDP jitter/loss from the server report) out of 'iperf -y C' output."""
+    result = {}
+    for line in output.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 9:
+            continue
+        try:
+            result['bitsPerSecond'] = float(fields[8])
+            if len(fields) >= 14:
+                result['jitterMs'] = float(fields[9])
+                result['lossPct'] = float(fields[12])
+        except ValueError:
+            continue
+    return result
+
+
+def runIperfTest(net, pairs, udp=False, duration=5, udpBandwidth='10M', basePort=5001):
+    """Runs iperf between every pair at the same time. Each pair gets its own server port, so pairs sharing a
+    destination host don't get in each other's way. Throughput is reported in Mbit/s.
+    """
+    servers = []
+    for index, (_src, dst) in enumerate(pairs):
+        argv = ['iperf', '-s', '-p', str(basePort + index)]
+        if udp:
+            argv.append('-u')
+        servers.append(dst.popen(argv))
+
+    # Give the servers a moment to start listening before the clients connect
+    time.sleep(0.5)
+
+    jobs = []
+    for index, (src, dst) in enumerate(pairs):
+        argv = ['iperf', '-c', dst.IP(), '-p', str(basePort + index), '-t', str(duration), '-y', 'C']
+        if udp:
+            argv += ['-u', '-b', udpBandwidth]
+        jobs.append((src, argv))
+
+    try:
+        results = fanOut(jobs, timeout=duration + 15)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    perPair = {}
+    throughputs = []
+    for (src, dst), (_code, output) in zip(pairs, results):
+        parsed = parseIperfCsv(output)
+        if 'bitsPerSecond' in parsed:
+            parsed['mbps'] = parsed.pop('bitsPerSecond') / 1e6
+            throughputs.append(parsed['mbps'])
+        perPair[pairName(src, dst)] = parsed
+
+    return {'unit': 'Mbit/s', 'protocol': 'udp' if udp else 'tcp', 'perPair': perPair, 'overall': summarise(throughputs)}
+
+
+def runBenchmarkSuite(net, tests=DEFAULT_TESTS, hosts=None, pairs=None, output=None, label=None,
+                      pingCount=20, iperfDuration=5, udpBandwidth='10M'):
+    """Runs the chosen tests (in order) across the chosen host pairs and optionally writes the results to a JSON file.
+
+    tests: any of 'flowSetup', 'ping', 'iperfTcp', 'iperfUdp'. Keep 'flowSetup' first so it sees fresh flows.
+    """
+    selected = hostPairs(net, hosts=hosts, pairs=pairs)
+    results = {
+        'label': label,
+        'started': datetime.datetime.now().isoformat(timespec='seconds'),
+        'hosts': len(net.hosts),
+        'switches': len(net.switches),
+        'pairs': [pairName(src, dst) for src, dst in selected],
+        'tests': {},
+    }
+
+    for test in tests:
+        began = time.monotonic()
+        if test == 'flowSetup':
+            results['tests'][test] = runFlowSetupTest(net, selected)
+        elif test == 'ping':
+            results['tests'][test] = runPingTest(net, selected, count=pingCount)
+        elif test == 'iperfTcp':
+            results['tests'][test] = runIperfTest(net, selected, duration=iperfDuration)
+        elif test == 'iperfUdp':
+            results['tests'][test] = runIperfTest(net, selected, udp=True, duration=iperfDuration, udpBandwidth=udpBandwidth)
+        else:
+            raise ValueError(f"Unknown benchmark test '{test}'")
+        results['tests'][test]['elapsedSeconds'] = time.monotonic() - began
+        print(f"Benchmark '{test}' finished: {results['tests'][test]['overall']}")
+
+    if output:
+        writeResults(results, output)
+    return results
+
+
+def runLaneComparison(net, source='h1', fastHost='h2', slowHost='h3', pingCount=20, iperfDuration=5,
+                      expectedGapMs=None, output=None):
+    """Compares the fast and slow lanes of the week 13 advanced topology (week13Advanced in mininet_topology_builder.py).
+
+    Traffic to 10.0.0.2 (fastHost) is tagged VLAN 100 and traffic to 10.0.0.3 (slowHost) VLAN 200 by the lecture controller,
+    and the spine sends each VLAN down a different lane. This pings and iperfs both destinations and reports the difference.
+    The lanes are measured one after the other, so they never compete for h1's link.
+
+    expectedGapMs: if given, the slow lane's median RTT must be at least this much higher, otherwise 'passed' is False.
+    """
+    src = net.get(source)
+    lanes = {'fast': (src, net.get(fastHost)), 'slow': (src, net.get(slowHost))}
+
+    # Warm up both paths first, so flow setup and ARP don't end up in the latency numbers
+    fanOut([(a, ['ping', '-n', '-c', '2', b.IP()]) for a, b in lanes.values()], timeout=15)
+
+    results = {'lanes': {}}
+    for lane, pair in lanes.items():
+        ping = runPingTest(net, [pair], count=pingCount)['overall']
+        tcp = runIperfTest(net, [pair], duration=iperfDuration)['overall']
+        results['lanes'][lane] = {'pair': pairName(*pair), 'latencyMs': ping, 'throughputMbps': tcp.get('mean')}
+
+    fast, slow = results['lanes']['fast'], results['lanes']['slow']
+    if fast['latencyMs']['count'] and slow['latencyMs']['count']:
+        results['latencyGapMs'] = {stat: slow['latencyMs'][stat] - fast['latencyMs'][stat] for stat in ('p50', 'p90', 'p99')}
+    else:
+        results['latencyGapMs'] = None
+    if fast['throughputMbps'] and slow['throughputMbps']:
+        results['throughputRatio'] = fast['throughputMbps'] / slow['throughputMbps']
+    else:
+        results['throughputRatio'] = None
+
+    if expectedGapMs is not None:
+        results['expectedGapMs'] = expectedGapMs
+        results['passed'] = bool(results['latencyGapMs']) and results['latencyGapMs']['p50'] >= expectedGapMs
+
+    for lane in ('fast', 'slow'):
+        entry = results['lanes'][lane]
+        print(f"{lane.title()} lane ({entry['pair']}): p50 {entry['latencyMs'].get('p50')} ms, "
+              f"p99 {entry['latencyMs'].get('p99')} ms, {entry['throughputMbps']} Mbit/s")
+    print(f"Latency gap (slow - fast): {results['latencyGapMs']}, throughput ratio (fast / slow): {results['throughputRatio']}")
+
+    if output:
+        writeResults(results, output)
+    return results
+
+
+def runTailLatencyUnderLoad(net, source='h1', priorityHost='h2', bulkHost='h3', load='20M', duration=10,
+                            pingInterval=0.05, label=None, output=None):
+    """Measures how traffic prioritisation holds up under congestion: floods bulkHost with UDP at 'load' while pinging
+    both priorityHost and bulkHost, and reports the ping RTT percentiles of each.
+
+    Run it on week13Advanced (VLAN lanes) and on week13Qos (queues + meters) with the matching lecture tutorial,
+    then compare the two result files with compareTailLatency(). A good prioritisation keeps the priority p99 close to
+    its p50, however much the bulk traffic suffers.
+    """
+    src, priority, bulk = net.get(source), net.get(priorityHost), net.get(bulkHost)
+
+    # Warm up both paths first, so flow setup and ARP don't end up in the latency numbers
+    fanOut([(src, ['ping', '-n', '-c', '2', host.IP()]) for host in (priority, bulk)], timeout=15)
+
+    server = bulk.popen(['iperf', '-s', '-u', '-p', '5001'])
+    time.sleep(0.5)
+    flood = src.popen(['iperf', '-c', bulk.IP(), '-u', '-b', load, '-p', '5001', '-t', str(duration), '-y', 'C'])
+    try:
+        # Let the queue build up before measuring, and stop before the flood does
+        time.sleep(1)
+        count = max(int((duration - 2) / pingInterval), 1)
+        pings = fanOut([(src, ['ping', '-n', '-c', str(count), '-i', str(pingInterval), host.IP()])
+                        for host in (priority, bulk)], timeout=duration + 10)
+        floodOut, _err = flood.communicate(timeout=duration + 15)
+    finally:
+        if flood.poll() is None:
+            flood.kill()
+        server.terminate()
+        server.wait()
+
+    results = {'label': label, 'load': load, 'durationSeconds': duration, 'classes': {}}
+    for name, host, (_code, pingOutput) in zip(('priority', 'bulk'), (priority, bulk), pings):
+        rtts = parsePingRtts(pingOutput)
+        summary = summarise(rtts)
+        summary['lossPct'] = 100.0 * (count - len(rtts)) / count
+        results['classes'][name] = {'pair': pairName(src, host), 'latencyMs': summary}
+    bulkStats = parseIperfCsv(_decode(floodOut))
+    results['bulkThroughputMbps'] = bulkStats['bitsPerSecond'] / 1e6 if 'bitsPerSecond' in bulkStats else None
+
+    for name, entry in results['classes'].items():
+        latency = entry['latencyMs']
+        print(f"{name.title()} ({entry['pair']}) under {load} of bulk UDP: p50 {latency.get('p50')} ms, "
+              f"p99 {latency.get('p99')} ms, {latency['lossPct']:.1f}% loss")
+
+    if output:
+        writeResults(results, output)
+    return results
+
+
+def compareTailLatency(*paths):
+    """Prints the results of several runTailLatencyUnderLoad() runs side by side (one row per run and traffic class)."""
+    print(f"{'run':<24} {'class':<9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'loss %':>7}")
+    for path in paths:
+        with open(path) as f:
+            results = json.load(f)
+        run = results.get('label') or os.path.basename(path)
+        for name, entry in results['classes'].items():
+            latency = entry['latencyMs']
+            cells = [f"{latency[stat]:.2f}" if latency.get(stat) is not None else '-' for stat in ('p50', 'p90', 'p99')]
+            print(f"{run:<24} {name:<9} {cells[0]:>8} {cells[1]:>8} {cells[2]:>8} {latency['lossPct']:>7.1f}")
+
+
+def writeResults(results, path):
+    """Writes benchmark results as JSON (via a temporary file, so a half-written file is never left behind)."""
+    tmpPath = f"{path}.tmp"
+    with open(tmpPath, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    os.replace(tmpPath, path)
+    print(f"Benchmark results written to {path}")
+
+
+def _splitList(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+def benchmarkWorkload(net):
+    """Workload entry point for MN_WORKLOAD=mininet_benchmark:benchmarkWorkload, configured through environment variables:
+
+        MN_BENCH_TESTS       comma separated tests (default: flowSetup,ping,iperfTcp,iperfUdp)
+        MN_BENCH_HOSTS       comma separated host names to test all pairs between (default: every host)
+        MN_BENCH_PAIRS       explicit pairs instead, e.g. h1-h2,h1-h3
+        MN_BENCH_OUTPUT      JSON file to write (default: benchmark-results.json)
+        MN_BENCH_LABEL       free text stored with the results, e.g. the controller version under test
+        MN_BENCH_PING_COUNT, MN_BENCH_IPERF_TIME, MN_BENCH_UDP_BW
+    """
+    env = os.environ
+    pairs = _splitList(env.get('MN_BENCH_PAIRS'))
+    return runBenchmarkSuite(
+        net,
+        tests=_splitList(env.get('MN_BENCH_TESTS')) or DEFAULT_TESTS,
+        hosts=_splitList(env.get('MN_BENCH_HOSTS')),
+        pairs=[tuple(pair.split('-', 1)) for pair in pairs] if pairs else None,
+        output=env.get('MN_BENCH_OUTPUT', 'benchmark-results.json'),
+        label=env.get('MN_BENCH_LABEL'),
+        pingCount=int(env.get('MN_BENCH_PING_COUNT', 20)),
+        iperfDuration=int(env.get('MN_BENCH_IPERF_TIME', 5)),
+        udpBandwidth=env.get('MN_BENCH_UDP_BW', '10M'),
+    )
+
+
+def laneComparisonWorkload(net):
+    """Workload entry point for MN_WORKLOAD=mininet_benchmark:laneComparisonWorkload.
+
+    Writes to MN_BENCH_OUTPUT (default: lane-comparison.json). If MN_LANE_EXPECTED_GAP_MS is set and the slow lane
+    isn't at least that much slower, the workload fails, so the launch exits non-zero.
+    """
+    env = os.environ
+    expectedGap = env.get('MN_LANE_EXPECTED_GAP_MS')
+    results = runLaneComparison(
+        net,
+        pingCount=int(env.get('MN_BENCH_PING_COUNT', 20)),
+        iperfDuration=int(env.get('MN_BENCH_IPERF_TIME', 5)),
+        expectedGapMs=float(expectedGap) if expectedGap else None,
+        output=env.get('MN_BENCH_OUTPUT', 'lane-comparison.json'),
+    )
+    if results.get('passed') is False:
+        raise RuntimeError(f"Slow lane is only {results['latencyGapMs']} ms slower than the fast lane, expected at least {expectedGap} ms")
+    return results
+
+
+def tailLatencyWorkload(net):
+    """Workload entry point for MN_WORKLOAD=mininet_benchmark:tailLatencyWorkload.
+
+    Writes to MN_BENCH_OUTPUT (default: tail-latency.json), labelled with MN_BENCH_LABEL (e.g. 'vlan' or 'qos').
+    MN_QOS_LOAD sets the bulk UDP rate (default 20M) and MN_BENCH_IPERF_TIME how long it runs (default 10).
+    """
+    env = os.environ
+    return runTailLatencyUnderLoad(
+        net,
+        load=env.get('MN_QOS_LOAD', '20M'),
+        duration=int(env.get('MN_BENCH_IPERF_TIME', 10)),
+        label=env.get('MN_BENCH_LABEL'),
+        output=env.get('MN_BENCH_OUTPUT', 'tail-latency.json'),
+    )
+
+
+if __name__ == '__main__':
+    # Compare saved tail latency runs: python3 mininet_benchmark.py vlan.json qos.json
+    import sys
+
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python3 mininet_benchmark.py RESULTS.json [RESULTS.json...]")
+    compareTailLatency(*sys.argv[1:])
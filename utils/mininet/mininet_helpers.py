@@ -5,9 +5,16 @@ from mininet.cli import CLI
 from mininet.log import setLogLevel
 from mininet.term import makeTerm
 import mininet.clean
+import argparse
+import importlib
+import os
+import runpy
 import subprocess
 import socket
+import struct
 import sys
+import time
+import traceback
 
 # ╔══════════════════════════════════════════════╗
 # ║                HELPER FUNCTIONS              ║
@@ -28,6 +35,165 @@ def controllerReachableCheck(ip, port):
     except (socket.timeout, ConnectionRefusedError, OSError):
         return False
 
+# OpenFlow header: version, type, length, xid
+OFP_HEADER = struct.Struct('!BBHI')
+OFP_VERSION_1_3 = 0x04
+OFPT_HELLO = 0
+OFPT_ECHO_REQUEST = 2
+OFPT_ECHO_REPLY = 3
+OFPT_FEATURES_REQUEST = 5
+
+# How long createInitialNetwork() waits for ryu-manager to finish loading its apps (seconds).
+CONTROLLER_READY_TIMEOUT = 15.0
+
+def controllerHandshakeCheck(ip, port, timeout=1.0):
+    """Pretends to be a switch for a moment to check the controller is actually serving OpenFlow.
+
+    A bare TCP connect succeeds as soon as ryu-manager opens its socket, even if the apps are still loading.
+    Here we send an OpenFlow HELLO and wait until the controller answers with its own HELLO and then a
+    FEATURES_REQUEST, which Ryu only sends once its OpenFlow handler is running. We hang up before replying,
+    so no apps ever see a 'switch' connect.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        with socket.create_connection((ip, port), timeout=timeout) as sock:
+            sock.sendall(OFP_HEADER.pack(OFP_VERSION_1_3, OFPT_HELLO, OFP_HEADER.size, 1))
+            gotHello = False
+            buf = b''
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                sock.settimeout(remaining)
+                chunk = sock.recv(4096)
+                if not chunk:
+                    return False
+                buf += chunk
+
+                # Walk through every complete OpenFlow message we've received so far
+                while len(buf) >= OFP_HEADER.size:
+                    version, msgType, length, xid = OFP_HEADER.unpack_from(buf)
+                    if length < OFP_HEADER.size:
+                        return False
+                    if len(buf) < length:
+                        break
+                    body, buf = buf[OFP_HEADER.size:length], buf[length:]
+
+                    if msgType == OFPT_HELLO:
+                        gotHello = True
+                    elif msgType == OFPT_ECHO_REQUEST:
+                        sock.sendall(OFP_HEADER.pack(version, OFPT_ECHO_REPLY, length, xid) + body)
+                    elif msgType == OFPT_FEATURES_REQUEST:
+                        return gotHello
+    except (socket.timeout, ConnectionRefusedError, OSError):
+        return False
+
+def waitForController(ip, port, timeout=CONTROLLER_READY_TIMEOUT, handshake=True):
+    """Keeps checking the controller until it is ready, backing off a little more after each failed attempt.
+
+    Returns how many seconds it took for the controller to become ready, or None if it never did within 'timeout'.
+    The backoff schedule is fixed (50ms, 100ms, 200ms, ... capped at 1s), so scripted launches behave the same every run.
+    """
+    check = controllerHandshakeCheck if handshake else (lambda ip, port, timeout: controllerReachableCheck(ip, port))
+    start = time.monotonic()
+    delay = 0.05
+
+    while True:
+        remaining = timeout - (time.monotonic() - start)
+        if check(ip, port, timeout=max(min(1.0, remaining), 0.05)):
+            return time.monotonic() - start
+
+        remaining = timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 1.0)
+
+# Filled in the first time getLaunchOptions() is called, so every helper sees the same settings.
+_launchOptions = None
+
+CONTROLLER_MODES = ('ask', 'remote', 'default')
+
+def getLaunchOptions(argv=None):
+    """Works out how this launch should behave, so topologies can run without anyone answering prompts.
+
+    Every setting can come from a command line flag or an environment variable (flags win):
+
+        --controller-mode / MN_CONTROLLER_MODE        ask (default, prompts you), remote (Ryu) or default (Mininet's own)
+        --controller-ip / MN_CONTROLLER_IP            defaults to 127.0.0.1
+        --controller-port / MN_CONTROLLER_PORT        defaults to 6633
+        --controller-count / MN_CONTROLLER_COUNT      number of ryu-manager workers (on consecutive ports), see 'ryuctl --workers'
+        --controller-timeout / MN_CONTROLLER_TIMEOUT  seconds to wait for the controller to be ready
+        --workload / MN_WORKLOAD                      run this instead of the interactive CLI, then exit (see runWorkload)
+
+    Unknown flags are ignored, so this still works when launched through 'sudo mn --custom ...'.
+    """
+    global _launchOptions
+    if _launchOptions is not None and argv is None:
+        return _launchOptions
+
+    env = os.environ
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument('--controller-mode', dest='controllerMode', default=env.get('MN_CONTROLLER_MODE', 'ask'))
+    parser.add_argument('--controller-ip', dest='controllerIp', default=env.get('MN_CONTROLLER_IP', '127.0.0.1'))
+    parser.add_argument('--controller-port', dest='controllerPort', type=int, default=int(env.get('MN_CONTROLLER_PORT', 6633)))
+    parser.add_argument('--controller-count', dest='controllerCount', type=int, default=int(env.get('MN_CONTROLLER_COUNT', 1)))
+    parser.add_argument('--controller-timeout', dest='controllerTimeout', type=float,
+                        default=float(env.get('MN_CONTROLLER_TIMEOUT', CONTROLLER_READY_TIMEOUT)))
+    parser.add_argument('--workload', dest='workload', default=env.get('MN_WORKLOAD'))
+    options, _unknown = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+
+    options.controllerMode = options.controllerMode.strip().lower()
+    if options.controllerMode not in CONTROLLER_MODES:
+        parser.error(f"controller mode must be one of {', '.join(CONTROLLER_MODES)}, not '{options.controllerMode}'")
+    if options.controllerCount < 1:
+        parser.error("controller count must be at least 1")
+
+    if argv is None:
+        _launchOptions = options
+    return options
+
+def runWorkload(net, workload):
+    """Runs a workload against a started network instead of dropping into the Mininet CLI.
+
+    A workload can be:
+    - a function (or anything callable), which gets called as workload(net)
+    - 'module:function', e.g. 'mininet_benchmark:benchmarkWorkload', which is imported and called as function(net)
+    - a path to a .py file, which is run with 'net' already defined as a variable
+    - a path to any other file, which is treated as a list of Mininet CLI commands (like 'h1 ping -c1 h2')
+    """
+    if callable(workload):
+        return workload(net)
+
+    if workload.endswith('.py'):
+        runpy.run_path(workload, init_globals={'net': net}, run_name='__main__')
+        return None
+
+    if ':' in workload and not os.path.exists(workload):
+        moduleName, functionName = workload.split(':', 1)
+        return getattr(importlib.import_module(moduleName), functionName)(net)
+
+    CLI(net, script=workload)
+    return None
+
+def controllerIndexForDpid(dpid, count):
+    """Which of 'count' controllers a switch belongs to. The DPID (a hex string, like Mininet uses) is hashed by taking it
+    modulo the number of controllers, so s1, s2, s3... are spread evenly and always land on the same controller.
+    """
+    return int(dpid, 16) % count
+
+class ShardedOVSSwitch(OVSSwitch):
+    """An OVSSwitch that connects to just one of the remote controllers, picked by controllerIndexForDpid().
+
+    With several ryu-manager workers running, this spreads the switches (and their packet-ins) across all of them,
+    instead of every switch talking to every controller.
+    """
+    def start(self, controllers):
+        remotes = [c for c in controllers if isinstance(c, RemoteController)]
+        if len(remotes) > 1:
+            controllers = [remotes[controllerIndexForDpid(self.dpid, len(remotes))]]
+        super().start(controllers)
+
 def createInitialNetwork():
     """
     Sets up the base Mininet network object and optionally connects to an SDN controller.
@@ -37,37 +203,128 @@ def createInitialNetwork():
     sys.stdout.write('\033]0;Mininet Controller\007')
     sys.stdout.flush()
 
-    net = Mininet(link=TCLink, switch=OVSSwitch, controller=None)
+    options = getLaunchOptions()
+    count = options.controllerCount
+    net = Mininet(link=TCLink, switch=ShardedOVSSwitch if count > 1 else OVSSwitch, controller=None)
+
+    mode = options.controllerMode
+    if mode == 'ask':
+        mode = 'remote' if input("Do you want to connect to an SDN Controller? Y/N: ").strip().lower() == 'y' else 'default'
 
-    if input("Do you want to connect to an SDN Controller? Y/N: ").strip().lower() == 'y':
-        ip = '127.0.0.1'
-        port = 6633
+    if mode == 'remote':
+        ip = options.controllerIp
+        # One controller per ryu-manager worker, on consecutive ports (6633, 6634, ...)
+        ports = [options.controllerPort + index for index in range(count)]
 
-        if controllerReachableCheck(ip, port):
-            print("Controller is reachable, adding it now.")
-            net.addController(RemoteController('c0', ip=ip, port=port))
+        print(f"Waiting up to {options.controllerTimeout:g}s for {count} controller(s) at {ip}:{ports[0]}...")
+        # All the workers share one deadline, they start up at the same time anyway
+        started = time.monotonic()
+        missing = []
+        for port in ports:
+            remaining = max(options.controllerTimeout - (time.monotonic() - started), 0.05)
+            if waitForController(ip, port, timeout=remaining) is None:
+                missing.append(str(port))
+        readyAfter = time.monotonic() - started
+
+        if not missing:
+            print(f"Controller is ready (OpenFlow handshake OK after {readyAfter:.2f}s), adding it now.")
+            for index, port in enumerate(ports):
+                net.addController(RemoteController(f'c{index}', ip=ip, port=port))
         else:
             net.stop()
             mininet.clean.cleanup()
-            print("Controller couldn’t be reached. Is ryu-manager running?")
+            missing = ', '.join(missing)
+            print(f"Controller couldn’t be reached on port(s) {missing}. Is ryu-manager running?")
             print("Network shutdown. Try again when it’s online.")
-            quit()
+            sys.exit(1)
     else:
         net.addController(DefaultController('c0'))
 
     return net
 
 
-def safeMininetStartupAndExit(net):
+# Where mn-host looks up a host's PID, instead of searching the whole process table for it
+DEFAULT_HOST_INDEX_DIR = '/tmp/mininet-hosts'
+
+def _hostIndexDir():
+    return os.environ.get('MN_HOST_INDEX_DIR', DEFAULT_HOST_INDEX_DIR)
+
+def writeHostIndex(net):
+    """Writes one small file per host (named after the host, containing its PID) so mn-host can find it instantly.
+    Anything left over from a previous run that didn't shut down cleanly is cleared first.
+    """
+    directory = _hostIndexDir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for fileName in os.listdir(directory):
+            os.remove(os.path.join(directory, fileName))
+        for host in net.hosts:
+            tmpPath = os.path.join(directory, f".{host.name}.tmp")
+            with open(tmpPath, 'w') as f:
+                f.write(f"{host.pid}\n")
+            os.replace(tmpPath, os.path.join(directory, host.name))
+    except OSError as error:
+        # mn-host still works without the index, it just falls back to searching for the host
+        print(f"Couldn't write the host index in {directory}: {error}")
+
+def removeHostIndex(net):
+    """Removes the files written by writeHostIndex(), once the hosts are gone."""
+    directory = _hostIndexDir()
+    for host in net.hosts:
+        try:
+            os.remove(os.path.join(directory, host.name))
+        except OSError:
+            pass
+
+def systemExitCode(exit):
+    """The exit code a SystemExit would have given: sys.exit() is 0, sys.exit(3) is 3, sys.exit("message") is 1."""
+    if exit.code is None:
+        return 0
+    if isinstance(exit.code, int):
+        return exit.code
+    print(exit.code, file=sys.stderr)
+    return 1
+
+def safeMininetStartupAndExit(net, workload=None):
     """
     Starts Mininet with the CLI and shuts everything down cleanly when you’re done.
 
     Always put this at the bottom of your topology method.
 
     Example usage: safeMininetStartupAndExit(net)
+
+    If a workload is given here (or with --workload / MN_WORKLOAD), it runs instead of the CLI and Mininet exits
+    straight after, with a non-zero exit code if the workload failed. See runWorkload() for what a workload can be.
+
+    While the network is up, every host's PID is listed in MN_HOST_INDEX_DIR (default /tmp/mininet-hosts) for mn-host.
     """
-    CLI(net)
-    net.stop()
-    mininet.clean.cleanup()
-    print("Mininet shutdown complete. If ryu-manager was running, make sure to restart it before re-launching mininet.")
-    sys.exit()
\ No newline at end of file
+    if workload is None:
+        workload = getLaunchOptions().workload
+
+    writeHostIndex(net)
+    exitCode = 0
+    try:
+        if workload:
+            try:
+                runWorkload(net, workload)
+            except SystemExit as exit:
+                # e.g. a workload script calling sys.exit(), or its own argparse rejecting the arguments
+                exitCode = systemExitCode(exit)
+            except Exception:
+                traceback.print_exc()
+                exitCode = 1
+        else:
+            CLI(net)
+    except KeyboardInterrupt:
+        exitCode = 130  # What a shell reports for Ctrl-C
+    finally:
+        # Whatever happened above, don't leave switches, links and host namespaces behind
+        try:
+            removeHostIndex(net)
+            net.stop()
+        finally:
+            mininet.clean.cleanup()
+
+    print("Mininet shutdown complete. ryu-manager can keep running (the templates reconcile flows when switches connect);"
+          " only restart it if your app keeps its own state about the old network.")
+    sys.exit(exitCode)
@@ -0,0 +1,100 @@
+import atexit
+import re
+import subprocess
+
+# ╔══════════════════════════════════════════════╗
+# ║              OVS QUEUES (QoS)                ║
+# ╚══════════════════════════════════════════════╝
+# Sets up queues on an Open vSwitch port, so a controller can put traffic classes into them with
+# OFPActionSetQueue (see ryu_qos.py in utils/ryu) instead of steering them down different paths.
+#
+# Each queue gets a guaranteed minimum rate, a maximum rate and a priority (0 = served first). When the link is
+# congested, a high priority queue with a guaranteed rate keeps its latency low while bulk traffic waits.
+#
+# Don't give a link that has queues a 'bw' (or delay/loss) in addLink: TCLink would configure the same interface
+# with tc, and the two would fight over it. Let the queues' max rate do the limiting instead.
+#
+# QoS and Queue rows live in the OVS database on their own, not as part of the port: removing the port (or
+# net.stop()) leaves them behind. clearQueues() destroys a port's rows, and anything configureQueues() created that is
+# still there when Python exits is destroyed automatically, so repeated runs don't pile them up.
+
+UUID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+# interface -> (QoS row uuid, [Queue row uuids]) for everything configureQueues() created
+createdRows = {}
+
+
+def portInterface(net, switchName, port):
+    """The interface name of a switch port number, e.g. ('spine', 2) -> 'spine-eth2'."""
+    return net.get(switchName).intfs[port].name
+
+
+def configureQueues(net, switchName, port, maxRate, queues):
+    """
+    Creates a linux-htb QoS with queues on one switch port. Queue numbers are the positions in the list, and
+    traffic that isn't put in a queue by a flow goes to queue 0.
+
+    maxRate: The whole port's rate limit, in bits per second (e.g. 10e6 for 10 Mbit/s)
+    queues: One dictionary per queue, any of 'minRate', 'maxRate' (bits per second) and 'priority' (lower = served first)
+
+    Example usage (after net.start()):
+        configureQueues(net, 'spine', 2, maxRate=10e6, queues=[
+            {'minRate': 1e6, 'priority': 1},   # Queue 0: best effort
+            {'minRate': 8e6, 'priority': 0},   # Queue 1: priority
+        ])
+    """
+    interface = portInterface(net, switchName, port)
+    clearQueues(net, switchName, port)  # Replacing the port's QoS would otherwise leave the old rows behind
+
+    command = ['ovs-vsctl', '--', 'set', 'port', interface, 'qos=@qos',
+               '--', '--id=@qos', 'create', 'qos', 'type=linux-htb', f"other-config:max-rate={int(maxRate)}"]
+    command += [f"queues:{queueId}=@q{queueId}" for queueId in range(len(queues))]
+
+    for queueId, queue in enumerate(queues):
+        command += ['--', f"--id=@q{queueId}", 'create', 'queue',
+                    f"other-config:max-rate={int(queue.get('maxRate', maxRate))}"]
+        if 'minRate' in queue:
+            command.append(f"other-config:min-rate={int(queue['minRate'])}")
+        if 'priority' in queue:
+            command.append(f"other-config:priority={int(queue['priority'])}")
+
+    # ovs-vsctl prints the uuid of every row it created, in order: the QoS, then the queues
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    uuids = UUID.findall(output)
+    if uuids:
+        if not createdRows:
+            atexit.register(destroyCreatedQueues)
+        createdRows[interface] = (uuids[0], uuids[1:])
+    print(f"Configured {len(queues)} queue(s) on {interface} (max {maxRate / 1e6:g} Mbit/s)")
+
+
+def clearQueues(net, switchName, port):
+    """Removes the queues from a switch port again (e.g. to compare with and without them in one run)."""
+    interface = portInterface(net, switchName, port)
+    qos = UUID.findall(subprocess.run(['ovs-vsctl', 'get', 'port', interface, 'qos'],
+                                      check=True, stdout=subprocess.PIPE, text=True).stdout)
+    command = ['ovs-vsctl', '--', 'clear', 'port', interface, 'qos']
+    if qos:
+        queues = UUID.findall(subprocess.run(['ovs-vsctl', 'get', 'qos', qos[0], 'queues'],
+                                             check=True, stdout=subprocess.PIPE, text=True).stdout)
+        command += ['--', 'destroy', 'qos', qos[0]]
+        if queues:
+            command += ['--', 'destroy', 'queue'] + queues
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    createdRows.pop(interface, None)
+
+
+def destroyCreatedQueues():
+    """
+    Destroys every QoS/Queue row configureQueues() created that is still in the database (runs by itself when Python
+    exits, after net.stop() has removed the ports).
+    """
+    for interface, (qos, queues) in list(createdRows.items()):
+        # The port may still exist (and point at the QoS), or may be gone already: either way is fine
+        subprocess.run(['ovs-vsctl', '--if-exists', 'clear', 'port', interface, 'qos'],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        command = ['ovs-vsctl', '--', '--if-exists', 'destroy', 'qos', qos]
+        if queues:
+            command += ['--', '--if-exists', 'destroy', 'queue'] + queues
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        del createdRows[interface]
@@ -0,0 +1,305 @@
+import collections
+import hashlib
+import json
+import os
+import re
+
+try:
+    import yaml
+except ImportError:  # YAML topology files just won't load without PyYAML, JSON always works
+    yaml = None
+
+# ╔══════════════════════════════════════════════╗
+# ║             TOPOLOGY FILE LOADER             ║
+# ╚══════════════════════════════════════════════╝
+# Lets you describe a topology in a JSON (or YAML) file instead of writing addHost/addSwitch/addLink by hand.
+#
+# {
+#   "hosts":    [{"name": "h1", "ip": "10.0.0.1/24"}, {"name": "h2"}],
+#   "switches": [{"name": "s1"}, {"name": "spine", "dpid": 4}],
+#   "links":    [{"src": "h1", "dst": "s1"}, {"src": "s1", "dst": "spine", "delay": "10ms", "bw": 10}]
+# }
+#
+# - Hosts without an ip/mac get one from their position in the list (10.0.0.1, 00:00:00:00:00:01, ...)
+# - Switches named like s1/s2 get their DPID from the number, anything else needs a "dpid" (a number, or a hex string like Mininet uses)
+# - Links can set src_port/dst_port, plus any TCLink option: bw, delay, jitter, loss, max_queue_size, use_htb
+# - Hosts can list "commands" to run once the network has started (e.g. static ARP entries)
+#
+# This file doesn't need Mininet itself, so the Ryu side can read the same topology file as a host/port inventory
+# (see ryu_topology_inventory.py in utils/ryu).
+
+# Bump this whenever the normalised format changes, so old cache entries are ignored
+CACHE_FORMAT = 1
+
+LINK_OPTIONS = ('bw', 'delay', 'jitter', 'loss', 'max_queue_size', 'use_htb')
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sdn-env', 'topologies')
+
+# content hash -> normalised topology, so loading the same file again in one process is just a dictionary lookup
+_memoryCache = {}
+_inventoryCache = {}
+
+
+class TopologyError(ValueError):
+    """Raised when a topology file doesn't describe a valid network."""
+
+
+def _cacheDir():
+    return os.environ.get('MN_TOPOLOGY_CACHE', DEFAULT_CACHE_DIR)
+
+
+def _parseDpid(value, switchName):
+    if isinstance(value, bool):
+        raise TopologyError(f"Switch '{switchName}' has an invalid dpid {value!r}")
+    if isinstance(value, int):
+        dpid = value
+    else:
+        try:
+            dpid = int(str(value).replace(':', ''), 16)
+        except ValueError:
+            raise TopologyError(f"Switch '{switchName}' has an invalid dpid {value!r}")
+    if not 0 < dpid < 2 ** 64:
+        raise TopologyError(f"Switch '{switchName}' has an out of range dpid {value!r}")
+    return dpid
+
+
+def _parseRaw(raw, path):
+    if path.endswith(('.yaml', '.yml')):
+        if yaml is None:
+            raise TopologyError(f"{path} is a YAML file, but PyYAML isn't installed (pip install pyyaml)")
+        return yaml.safe_load(raw)
+    return json.loads(raw)
+
+
+def normaliseTopology(data):
+    """Checks a parsed topology and fills in everything that was left to defaults (IPs, MACs, DPIDs, port numbers).
+
+    The result is plain JSON-friendly data, which is what gets cached.
+    """
+    if not isinstance(data, dict):
+        raise TopologyError("A topology must be an object with 'hosts', 'switches' and 'links'")
+
+    names = set()
+    hosts = []
+    for index, entry in enumerate(data.get('hosts', [])):
+        entry = {'name': entry} if isinstance(entry, str) else dict(entry)
+        name = entry.get('name')
+        if not name or name in names:
+            raise TopologyError(f"Host #{index + 1} has a missing or duplicate name {name!r}")
+        names.add(name)
+        number = index + 1
+        hosts.append({
+            'name': name,
+            'ip': entry.get('ip', f"10.{(number >> 16) & 0xff}.{(number >> 8) & 0xff}.{number & 0xff}/8"),
+            'mac': entry.get('mac', ':'.join(f"{(number >> shift) & 0xff:02x}" for shift in range(40, -8, -8))),
+            'commands': list(entry.get('commands', [])),
+        })
+
+    switches = []
+    dpids = {}
+    for index, entry in enumerate(data.get('switches', [])):
+        entry = {'name': entry} if isinstance(entry, str) else dict(entry)
+        name = entry.get('name')
+        if not name or name in names:
+            raise TopologyError(f"Switch #{index + 1} has a missing or duplicate name {name!r}")
+        names.add(name)
+
+        if 'dpid' in entry:
+            dpid = _parseDpid(entry['dpid'], name)
+        else:
+            # Same rule Mininet uses: the number at the end of the name
+            match = re.search(r'\d+$', name)
+            if not match:
+                raise TopologyError(f"Switch '{name}' needs a 'dpid' (its name doesn't end in a number)")
+            dpid = int(match.group())
+        if dpid in dpids:
+            raise TopologyError(f"Switches '{dpids[dpid]}' and '{name}' both have dpid {dpid}")
+        dpids[dpid] = name
+        switches.append({'name': name, 'dpid': dpid})
+
+    hostNames = {host['name'] for host in hosts}
+    usedPorts = collections.defaultdict(set)
+    links = []
+    rawLinks = [dict(entry) for entry in data.get('links', [])]
+
+    # Explicit port numbers are claimed first so automatically numbered ports never collide with them
+    for entry in rawLinks:
+        for end in ('src', 'dst'):
+            if entry.get(end) not in names:
+                raise TopologyError(f"Link {entry} refers to unknown node {entry.get(end)!r}")
+            port = entry.get(f"{end}_port")
+            if port is not None:
+                if port in usedPorts[entry[end]]:
+                    raise TopologyError(f"Port {port} on '{entry[end]}' is used by more than one link")
+                usedPorts[entry[end]].add(port)
+
+    for entry in rawLinks:
+        link = {'src': entry['src'], 'dst': entry['dst']}
+        for end in ('src', 'dst'):
+            port = entry.get(f"{end}_port")
+            if port is None:
+                # Mininet numbers host interfaces from 0 (h1-eth0) and switch ports from 1
+                port = 0 if entry[end] in hostNames else 1
+                while port in usedPorts[entry[end]]:
+                    port += 1
+                usedPorts[entry[end]].add(port)
+            link[f"{end}_port"] = port
+
+        unknown = set(entry) - {'src', 'dst', 'src_port', 'dst_port'} - set(LINK_OPTIONS)
+        if unknown:
+            raise TopologyError(f"Link {entry['src']}<->{entry['dst']} has unknown options: {', '.join(sorted(unknown))}")
+        link['options'] = {key: entry[key] for key in LINK_OPTIONS if key in entry}
+        links.append(link)
+
+    return {
+        'format': CACHE_FORMAT,
+        'name': data.get('name'),
+        'hosts': hosts,
+        'switches': switches,
+        'links': links,
+    }
+
+
+def loadTopology(path):
+    """Loads, checks and normalises a topology file, caching the result by a hash of the file's contents.
+
+    A file that hasn't changed is never parsed or validated twice: the first load in a process is served from
+    the on-disk cache (MN_TOPOLOGY_CACHE, default ~/.cache/sdn-env/topologies) and later ones from memory.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    topology = _memoryCache.get(digest)
+    if topology is not None:
+        return topology
+
+    cachePath = os.path.join(_cacheDir(), f"{digest}.json")
+    try:
+        with open(cachePath) as f:
+            topology = json.load(f)
+        if topology.get('format') != CACHE_FORMAT:
+            topology = None
+    except (OSError, ValueError):
+        topology = None
+
+    if topology is None:
+        topology = normaliseTopology(_parseRaw(raw, path))
+        if not topology['name']:
+            topology['name'] = os.path.splitext(os.path.basename(path))[0]
+        try:
+            os.makedirs(os.path.dirname(cachePath), exist_ok=True)
+            tmpPath = f"{cachePath}.{os.getpid()}.tmp"
+            with open(tmpPath, 'w') as f:
+                json.dump(topology, f, separators=(',', ':'))
+            os.replace(tmpPath, cachePath)
+        except OSError:
+            pass  # The cache is only a speed-up, a read-only home directory shouldn't stop the topology loading
+
+    topology['hash'] = digest
+    _memoryCache[digest] = topology
+    return topology
+
+
+def buildInventory(topology):
+    """Turns a loaded topology into what a controller wants to know about it:
+
+    - 'switches': dpid -> {'name', 'ports': {port: (peer name, peer port)}}
+    - 'hosts':    name -> {'ip', 'mac', 'dpid', 'port'} (ip without the /prefix)
+    - 'routes':   dpid -> {host ip: output port}, following the shortest path (in hops) to every host
+    """
+    digest = topology.get('hash')
+    if digest in _inventoryCache:
+        return _inventoryCache[digest]
+
+    dpidByName = {switch['name']: switch['dpid'] for switch in topology['switches']}
+    switches = {switch['dpid']: {'name': switch['name'], 'ports': {}} for switch in topology['switches']}
+    hosts = {host['name']: {'ip': host['ip'].split('/')[0], 'mac': host['mac'], 'dpid': None, 'port': None}
+             for host in topology['hosts']}
+    neighbours = collections.defaultdict(list)  # dpid -> [(neighbour dpid, neighbour's port back to us)]
+
+    for link in topology['links']:
+        ends = ((link['src'], link['src_port']), (link['dst'], link['dst_port']))
+        for (name, port), (peer, peerPort) in (ends, ends[::-1]):
+            if name in dpidByName:
+                switches[dpidByName[name]]['ports'][port] = (peer, peerPort)
+                if peer in dpidByName:
+                    neighbours[dpidByName[name]].append((dpidByName[peer], peerPort))
+                elif peer in hosts:
+                    hosts[peer]['dpid'] = dpidByName[name]
+                    hosts[peer]['port'] = port
+
+    # Breadth first search outwards from each switch that has hosts on it, remembering which port leads back
+    routes = {dpid: {} for dpid in switches}
+    hostsBySwitch = collections.defaultdict(list)
+    for host in hosts.values():
+        if host['dpid'] is not None:
+            hostsBySwitch[host['dpid']].append(host)
+
+    for edgeDpid, attached in hostsBySwitch.items():
+        towardsEdge = {edgeDpid: None}
+        queue = collections.deque([edgeDpid])
+        while queue:
+            current = queue.popleft()
+            for neighbour, neighbourPort in neighbours[current]:
+                if neighbour not in towardsEdge:
+                    towardsEdge[neighbour] = neighbourPort
+                    queue.append(neighbour)
+        for dpid, port in towardsEdge.items():
+            if port is None:
+                routes[dpid].update((host['ip'], host['port']) for host in attached)
+            else:
+                routes[dpid].update((host['ip'], port) for host in attached)
+
+    inventory = {'name': topology['name'], 'switches': switches, 'hosts': hosts, 'routes': routes}
+    if digest:
+        _inventoryCache[digest] = inventory
+    return inventory
+
+
+def buildNetwork(topology, net=None):
+    """Adds every host, switch and link of a loaded topology to a Mininet network.
+
+    If no network is given, one is created with createInitialNetwork() (so the usual controller prompt/flags apply).
+    Port numbers are passed to addLink explicitly, so they always match what buildInventory() reports.
+    """
+    if net is None:
+        from mininet_helpers import createInitialNetwork
+        net = createInitialNetwork()
+
+    for host in topology['hosts']:
+        net.addHost(host['name'], ip=host['ip'], mac=host['mac'])
+    for switch in topology['switches']:
+        net.addSwitch(switch['name'], dpid=f"{switch['dpid']:x}")
+    for link in topology['links']:
+        net.addLink(link['src'], link['dst'], port1=link['src_port'], port2=link['dst_port'], **link['options'])
+    return net
+
+
+def launchTopologyFile(path):
+    """Loads a topology file, starts it, runs any host commands and then hands over to safeMininetStartupAndExit()."""
+    from mininet_helpers import safeMininetStartupAndExit
+
+    topology = loadTopology(path)
+    net = buildNetwork(topology)
+    net.start()
+
+    for host in topology['hosts']:
+        for command in host['commands']:
+            net.get(host['name']).cmd(command)
+
+    safeMininetStartupAndExit(net)
+
+
+def registerTopologyFiles(topos, directory):
+    """Adds every .json/.yaml/.yml file in 'directory' to a topos dictionary, named after the file (without extension).
+
+    Files are only read when their topology is launched, so registering a big folder of them costs nothing.
+    """
+    if not os.path.isdir(directory):
+        return topos
+    for fileName in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(fileName)
+        if extension in ('.json', '.yaml', '.yml') and name not in topos:
+            topos[name] = (lambda path=os.path.join(directory, fileName): launchTopologyFile(path))
+    return topos
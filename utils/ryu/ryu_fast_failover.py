@@ -0,0 +1,109 @@
+class FastFailoverManager:
+    """
+    Fast-failover groups: "send out of port A, but if A is down use port B instead", decided by the switch itself.
+
+    Each group is a list of ports in order of preference. The switch watches every one of them and always uses the first
+    one that's up, so when a link fails traffic moves to the backup port within milliseconds, without waiting for the
+    controller. When the preferred port comes back up, traffic moves back to it.
+
+    The controller keeps track of which groups use which port, so when a switch reports a port change (EventOFPPortStatus),
+    only the groups using that port are looked at and re-sent.
+
+    Example usage (in __init__):
+        self.fast_failover = FastFailoverManager(self)
+    In switch_features_handler (install the group before any flow that uses it):
+        self.fast_failover.install_group(datapath, 1, [2, 3])  # Group 1: port 2, or port 3 if port 2 is down
+        actions = [self.fast_failover.group_action(datapath, 1)]
+    And pass port changes on:
+        @set_ev_cls(ofp_event.EventOFPPortStatus, MAIN_DISPATCHER)
+        def port_status_handler(self, ev):
+            self.fast_failover.port_status(ev)
+    """
+
+    def __init__(self, app):
+        """
+        app: The Ryu app, used for its logger.
+        """
+        self.app = app
+        self.groups = {}  # (dpid, group_id) -> {'ports': [...], 'actions': [...]}
+        self.groups_by_port = {}  # (dpid, port) -> set of group ids that use that port
+        self.down_ports = set()  # (dpid, port) for every port a switch has told us is down
+
+    def install_group(self, datapath, group_id, ports, actions=None):
+        """
+        Installs (or replaces) a fast-failover group.
+
+        group_id: Any number, unique on this switch.
+        ports: Output ports in order of preference, e.g. [2, 3] = port 2, falling back to port 3.
+        actions: Optional actions to apply before the output, in every bucket (e.g. setting a field).
+        """
+        dpid = datapath.id
+        old = self.groups.get((dpid, group_id))
+        if old:
+            for port in old['ports']:
+                self.groups_by_port.get((dpid, port), set()).discard(group_id)
+
+        self.groups[(dpid, group_id)] = {'ports': list(ports), 'actions': list(actions or [])}
+        for port in ports:
+            self.groups_by_port.setdefault((dpid, port), set()).add(group_id)
+
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+
+        # Delete first, so a switch that reconnects (and still has the group from last time) doesn't reject the ADD.
+        # Deleting a group also deletes the flows using it, which is why groups go in before their flows.
+        datapath.send_msg(parser.OFPGroupMod(datapath, ofproto.OFPGC_DELETE, ofproto.OFPGT_FF, group_id))
+        datapath.send_msg(parser.OFPGroupMod(datapath, ofproto.OFPGC_ADD, ofproto.OFPGT_FF, group_id,
+                                             self._buckets(datapath, group_id)))
+
+    def group_action(self, datapath, group_id):
+        """The action that sends a packet to a group, to use in a flow's actions instead of OFPActionOutput."""
+        return datapath.ofproto_parser.OFPActionGroup(group_id)
+
+    def active_port(self, dpid, group_id):
+        """The port the switch will be using for a group right now (as far as the controller knows), or None if all are down."""
+        for port in self.groups[(dpid, group_id)]['ports']:
+            if (dpid, port) not in self.down_ports:
+                return port
+        return None
+
+    def _buckets(self, datapath, group_id):
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        group = self.groups[(datapath.id, group_id)]
+        # One bucket per port, each only usable while its port is up (watch_port)
+        return [parser.OFPBucket(watch_port=port, watch_group=ofproto.OFPG_ANY,
+                                 actions=group['actions'] + [parser.OFPActionOutput(port)])
+                for port in group['ports']]
+
+    def port_status(self, ev):
+        """Call from an EventOFPPortStatus handler. Updates only the groups that use the port that changed."""
+        msg = ev.msg
+        datapath = msg.datapath
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        port = msg.desc.port_no
+        key = (datapath.id, port)
+
+        down = (msg.reason == ofproto.OFPPR_DELETE
+                or bool(msg.desc.state & ofproto.OFPPS_LINK_DOWN)
+                or bool(msg.desc.config & ofproto.OFPPC_PORT_DOWN))
+        was_down = key in self.down_ports
+        if down:
+            self.down_ports.add(key)
+        else:
+            self.down_ports.discard(key)
+
+        group_ids = self.groups_by_port.get(key)
+        if not group_ids or down == was_down and msg.reason != ofproto.OFPPR_ADD:
+            return
+
+        self.app.logger.info("Switch %s port %s is %s", datapath.id, port, 'down' if down else 'up')
+        for group_id in sorted(group_ids):
+            active = self.active_port(datapath.id, group_id)
+            self.app.logger.info("  group %s now sends out of %s", group_id,
+                                 f"port {active}" if active is not None else "no port (every port in it is down)")
+            # The switch already failed over by itself; this just makes sure the group it has matches ours
+            # (e.g. after a port was deleted and added back)
+            datapath.send_msg(parser.OFPGroupMod(datapath, ofproto.OFPGC_MODIFY, ofproto.OFPGT_FF, group_id,
+                                                 self._buckets(datapath, group_id)))
@@ -0,0 +1,159 @@
+import functools
+import struct
+import time
+
+# Messages that only configure a switch (nothing comes back, and no other code waits on their xid), so sending the same
+# bytes again has the same effect. Anything else (barriers, stats requests...) makes a connection's messages uncacheable.
+_REPLAYABLE = ('OFPFlowMod', 'OFPGroupMod', 'OFPMeterMod', 'OFPSetConfig')
+
+
+class FlowModCache:
+    """
+    Remembers the exact bytes a switch_features_handler sent to each switch, and sends them again when that switch reconnects.
+
+    Normally every reconnect rebuilds every OFPMatch, action and OFPFlowMod and serialises them again. After a controller
+    restart or a network blip, all switches reconnect at once and that adds up. With the cache, the handler isn't run
+    and nothing is serialised again: the saved bytes are sent, with fresh xids written in.
+    With a flow reconciler (see ryu_flow_reconcile.py, every template has one) a reconnect costs one stats round trip:
+    the switch is asked what it still has, then the saved bytes of whatever is missing go out in one socket write
+    (groups/meters it still has are modified instead, which are new messages). Without one, everything is sent at once.
+
+    The saved bytes are only reused while nothing they were built from has changed:
+    - the app's class (a hot reload replaces it), and what the switch reported about itself (buffers, tables)
+    - self.flow_cache.invalidate(), which you should call whenever you change something your switch_features_handler
+      reads (e.g. self.preferred_port), so switches that reconnect after that get the new flows.
+    A handler that sends anything besides flows, groups, meters and switch config (e.g. install_flow(..., wait=True),
+    which needs the barrier reply) is simply run every time.
+
+    TemplateBaseApp (ryu_template_base.py) sets this up for every template, as self.flow_cache.
+    """
+
+    def __init__(self, app):
+        """
+        app: The Ryu app, used for its logger.
+        """
+        self.app = app
+        self.entries = {}  # dpid -> (key, [bytes of each message], the messages themselves)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, dpid=None):
+        """Forgets the saved messages of one switch, or of all of them (the default)."""
+        if dpid is None:
+            self.generation += 1
+            self.entries.clear()
+        else:
+            self.entries.pop(dpid, None)
+
+    def _key(self, features):
+        return (type(self.app), self.generation, features.n_buffers, features.n_tables)
+
+    def replay(self, features, reconciler=None):
+        """
+        Sends the saved messages for this switch, if they're still valid. Returns whether it did.
+        reconciler: If given (a FlowReconciler), the saved messages and their bytes go through it instead of straight to
+                    the switch.
+        """
+        datapath = features.datapath
+        entry = self.entries.get(datapath.id)
+        if entry is None or entry[0] != self._key(features) or (reconciler is None and not hasattr(datapath, 'send')):
+            self.misses += 1
+            return False
+
+        started = time.monotonic()
+        _key, blobs, messages = entry
+        self.hits += 1
+
+        if reconciler is not None:
+            # Sending them exactly as recorded would delete and re-add groups (taking every flow that uses them down
+            # too) and never remove stale flows, so they're compared with what the switch has, like on a first connect.
+            # The reconciler only reads the messages, and sends the saved bytes of the ones the switch is missing.
+            reconciler.apply(datapath, messages, blobs)
+            self.app.logger.info("Switch %s reconnected: reconciling %d saved message(s)", datapath.id, len(messages))
+            return True
+
+        buf = bytearray(b''.join(blobs))
+        offset = 0
+        while offset < len(buf):
+            # Every OpenFlow message starts with version (1 byte), type (1), length (2) and xid (4)
+            length = struct.unpack_from('!H', buf, offset + 2)[0]
+            datapath.xid = (datapath.xid + 1) & datapath.ofproto.MAX_XID
+            struct.pack_into('!I', buf, offset + 4, datapath.xid)
+            offset += length
+        datapath.send(bytes(buf))
+
+        self.app.logger.info("Switch %s reconnected: replayed %d saved message(s) in %.2f ms",
+                             datapath.id, len(messages), (time.monotonic() - started) * 1000)
+        return True
+
+    def record(self, features, messages):
+        """Saves what a switch_features_handler sent, if it can be replayed."""
+        datapath = features.datapath
+        if not messages or any(type(msg).__name__ not in _REPLAYABLE for msg in messages):
+            self.entries.pop(datapath.id, None)
+            return
+
+        blobs = []
+        for msg in messages:
+            if msg.buf is None:
+                # Not sent yet (the reconciler may still be waiting for the switch), so serialise it here
+                if msg.xid is None:
+                    datapath.set_xid(msg)
+                msg.serialize()
+            blobs.append(bytes(msg.buf))
+        self.entries[datapath.id] = (self._key(features), blobs, list(messages))
+
+
+def cached_switch_features(handler):
+    """
+    Wraps a switch_features_handler so that its messages are recorded the first time a switch connects, and replayed
+    from self.flow_cache afterwards. TemplateBaseApp applies this to every template's handler automatically.
+
+    Both on a first connect and on a replay, the messages are passed to self.flow_reconciler (if the app has one, see
+    ryu_flow_reconcile.py) instead of straight to the switch.
+
+    The original handler stays available as handler.__wrapped__ (the hot reloader uses it to see what a handler
+    *would* send, which the replay would skip).
+    """
+
+    @functools.wraps(handler)
+    def wrapper(self, ev):
+        cache = getattr(self, 'flow_cache', None)
+        if cache is None:
+            return handler(self, ev)
+
+        features = ev.msg
+        reconciler = getattr(self, 'flow_reconciler', None)
+        if cache.replay(features, reconciler):
+            return None
+
+        # Hold back everything the handler sends to this switch, so the reconciler (if there is one) can send only
+        # what the switch is missing
+        datapath = features.datapath
+        sent = []
+
+        def holding_send_msg(msg, *args, **kwargs):
+            sent.append(msg)
+            return True
+
+        own_send_msg = vars(datapath).get('send_msg')  # In case something else already replaced it on this datapath
+        datapath.send_msg = holding_send_msg
+        try:
+            result = handler(self, ev)
+        finally:
+            if own_send_msg is None:
+                del datapath.send_msg  # Back to the class's own send_msg
+            else:
+                datapath.send_msg = own_send_msg
+
+        if reconciler is not None:
+            reconciler.apply(datapath, sent)
+        else:
+            for msg in sent:
+                datapath.send_msg(msg)
+        cache.record(features, sent)
+        return result
+
+    wrapper.flow_cache_wrapped = True
+    return wrapper
@@ -0,0 +1,175 @@
+import hashlib
+import json
+
+# A flow's 64-bit cookie, as laid out by FlowCookies:
+#
+#   | app (16 bits) | feature (16 bits) | generation (8 bits) | content hash (24 bits) |
+#
+# - app: which Ryu app installed the flow (a hash of its name)
+# - feature: which part of the app did (a hash of a name, by default the method that called install_flow)
+# - generation: bumped with next_generation() when rolling out a new version of a policy
+# - content hash: a hash of the flow itself, so the same flow always gets the same cookie (see ryu_flow_reconcile.py).
+#   Working it out takes far longer than building the FlowMod, so install_flow() leaves it at 0 and only the flows the
+#   reconciler compares (the ones switch_features_handler sends) get it, with with_content().
+#
+# A switch can delete or modify every flow whose cookie matches a value under a mask in a single FlowMod, so
+# "all flows of this feature", or "all flows of generation 3 of this feature", is one message per switch.
+APP_SHIFT, APP_BITS = 48, 16
+FEATURE_SHIFT, FEATURE_BITS = 32, 16
+GENERATION_SHIFT, GENERATION_BITS = 24, 8
+HASH_SHIFT, HASH_BITS = 0, 24
+
+
+def _field_mask(shift, bits):
+    return ((1 << bits) - 1) << shift
+
+
+def content_hash(mod):
+    """A 64-bit hash of everything about a flow except its cookie (table, priority, match, instructions, timeouts, flags)."""
+    body = json.dumps([mod.table_id, mod.priority, mod.match.to_jsondict(), [i.to_jsondict() for i in mod.instructions],
+                       mod.idle_timeout, mod.hard_timeout, mod.flags], sort_keys=True, default=str)
+    return int.from_bytes(hashlib.blake2b(body.encode(), digest_size=8).digest(), 'big')
+
+
+def name_id(name, bits=16):
+    """A stable number for a name (the same every run, unlike Python's hash()). Never 0, so tagged cookies are never 0."""
+    value = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=4).digest(), 'big') % ((1 << bits) - 1)
+    return value + 1
+
+
+class FlowCookies:
+    """
+    Gives every flow an app's install_flow() sends a structured cookie (see the layout above), so the app can later
+    delete or change whole groups of its flows with one message, instead of wiping the table or going flow by flow.
+
+    Example usage (in __init__):
+        self.flow_cookies = FlowCookies(self.name)
+    Tagging a FlowMod before sending it:
+        mod.cookie = self.flow_cookies.tag(mod, 'tutorial_advanced_sdn_manipulation')
+    Removing everything one feature installed on a switch:
+        self.flow_cookies.delete_flows(datapath, feature='tutorial_advanced_sdn_manipulation')
+    Rolling out a new version of a policy, then removing the old one:
+        old = self.flow_cookies.next_generation()
+        ... install the new flows ...
+        self.flow_cookies.delete_flows(datapath, feature='routing', generation=old)
+
+    TemplateBaseApp (ryu_template_base.py) sets this up for every template, as self.flow_cookies, and its install_flow()
+    tags flows with the name of the method that called it (unless you pass feature=... or your own cookie=...).
+    """
+
+    def __init__(self, app_name):
+        """
+        app_name: The app's name (self.name), hashed into the app part of every cookie.
+        """
+        self.app_name = app_name
+        self.app_id = name_id(app_name, APP_BITS)
+        self.generation = 0
+        self.feature_names = {}  # feature id -> name, for describe()
+        self._feature_ids = {}  # name -> feature id (install_flow() asks for every flow, so only hash each name once)
+
+    def feature_id(self, feature):
+        """The number a feature name gets in cookies (features can also be given as numbers directly)."""
+        if isinstance(feature, int):
+            return feature & ((1 << FEATURE_BITS) - 1)
+        feature_id = self._feature_ids.get(feature)
+        if feature_id is None:
+            feature_id = self._feature_ids[feature] = name_id(feature, FEATURE_BITS)
+            self.feature_names[feature_id] = feature
+        return feature_id
+
+    def is_ours(self, cookie):
+        """Whether a cookie was made by this FlowCookies (i.e. by this app)."""
+        return (cookie >> APP_SHIFT) & ((1 << APP_BITS) - 1) == self.app_id
+
+    @staticmethod
+    def feature_of(cookie):
+        """The feature id part of a cookie."""
+        return (cookie >> FEATURE_SHIFT) & ((1 << FEATURE_BITS) - 1)
+
+    def next_generation(self):
+        """Starts a new generation for flows tagged from now on, and returns the previous one (to delete it later)."""
+        previous = self.generation
+        self.generation = (self.generation + 1) % (1 << GENERATION_BITS)
+        return previous
+
+    def cookie(self, feature, generation=None, content=0):
+        """The cookie for a feature (and generation, by default the current one), with content as the hash part."""
+        generation = self.generation if generation is None else generation
+        return ((self.app_id << APP_SHIFT)
+                | (self.feature_id(feature) << FEATURE_SHIFT)
+                | ((generation % (1 << GENERATION_BITS)) << GENERATION_SHIFT)
+                | (content & _field_mask(HASH_SHIFT, HASH_BITS)))
+
+    def tag(self, mod, feature):
+        """The cookie for a FlowMod: its feature, the current generation and a hash of the flow's contents."""
+        return self.cookie(feature, content=content_hash(mod))
+
+    def with_content(self, mod):
+        """mod's cookie with the content hash filled in, if it's one of ours without one yet (see the layout above)."""
+        cookie = mod.cookie
+        if self.is_ours(cookie) and not cookie & _field_mask(HASH_SHIFT, HASH_BITS):
+            cookie |= content_hash(mod) & _field_mask(HASH_SHIFT, HASH_BITS)
+        return cookie
+
+    def select(self, feature=None, generation=None):
+        """
+        (cookie, cookie_mask) selecting this app's flows, optionally only one feature's and/or one generation's.
+        Use them in any FlowMod or flow stats request that takes cookie/cookie_mask.
+        """
+        cookie = self.app_id << APP_SHIFT
+        mask = _field_mask(APP_SHIFT, APP_BITS)
+        if feature is not None:
+            cookie |= self.feature_id(feature) << FEATURE_SHIFT
+            mask |= _field_mask(FEATURE_SHIFT, FEATURE_BITS)
+        if generation is not None:
+            cookie |= (generation % (1 << GENERATION_BITS)) << GENERATION_SHIFT
+            mask |= _field_mask(GENERATION_SHIFT, GENERATION_BITS)
+        return cookie, mask
+
+    def describe(self, cookie):
+        """Splits a cookie back into its parts, e.g. for logging a FlowRemoved or a flow stats entry."""
+        feature_id = (cookie >> FEATURE_SHIFT) & ((1 << FEATURE_BITS) - 1)
+        app_id = (cookie >> APP_SHIFT) & ((1 << APP_BITS) - 1)
+        return {
+            'app': self.app_name if app_id == self.app_id else app_id,
+            'feature': self.feature_names.get(feature_id, feature_id),
+            'generation': (cookie >> GENERATION_SHIFT) & ((1 << GENERATION_BITS) - 1),
+            'hash': cookie & _field_mask(HASH_SHIFT, HASH_BITS),
+        }
+
+    def delete_flows(self, datapath, feature=None, generation=None, table_id=None):
+        """
+        Deletes every flow of this app on a switch (optionally only one feature's and/or generation's) with one FlowMod.
+        table_id: Only this table (default: every table).
+        """
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        cookie, mask = self.select(feature, generation)
+        datapath.send_msg(parser.OFPFlowMod(
+            datapath=datapath,
+            table_id=ofproto.OFPTT_ALL if table_id is None else table_id,
+            command=ofproto.OFPFC_DELETE,
+            cookie=cookie,
+            cookie_mask=mask,
+            out_port=ofproto.OFPP_ANY,
+            out_group=ofproto.OFPG_ANY,
+            match=parser.OFPMatch()
+        ))
+
+    def modify_flows(self, datapath, actions, feature=None, generation=None, table_id=0):
+        """
+        Replaces the actions of every flow of this app in a table (optionally only one feature's and/or generation's)
+        with one FlowMod. The flows keep their match, priority, counters and cookie.
+        """
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        cookie, mask = self.select(feature, generation)
+        datapath.send_msg(parser.OFPFlowMod(
+            datapath=datapath,
+            table_id=table_id,
+            command=ofproto.OFPFC_MODIFY,
+            cookie=cookie,
+            cookie_mask=mask,
+            match=parser.OFPMatch(),
+            instructions=[parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
+        ))
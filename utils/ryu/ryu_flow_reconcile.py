@@ -0,0 +1,273 @@
+import struct
+
+from ryu.controller.controller import Datapath
+from ryu.lib import hub
+
+from ryu_flow_cookies import content_hash
+
+# Flows the reconciler had to give a cookie itself (because the app had no FlowCookies) have this bit set, with a hash of
+# the flow's contents in the other 63 bits
+CONTENT_COOKIE_BIT = 1 << 63
+
+# Messages the reconciler knows how to compare with what a switch already has
+_RECONCILABLE = ('OFPFlowMod', 'OFPGroupMod', 'OFPMeterMod', 'OFPSetConfig')
+
+
+def content_cookie(mod):
+    """
+    A cookie made from everything about a flow (table, priority, match, instructions, timeouts, flags).
+    Two flows get the same cookie exactly when they are the same flow, so comparing cookies is enough to tell whether a
+    switch already has a flow, even after the controller restarted and forgot everything.
+    """
+    return CONTENT_COOKIE_BIT | (content_hash(mod) & (CONTENT_COOKIE_BIT - 1))
+
+
+class _Batch:
+    """
+    What the reconciler sends to one switch. Messages that were already serialised (saved by FlowModCache) are sent as
+    those bytes, with fresh xids written in, in as few socket writes as possible, instead of being serialised again.
+    """
+
+    def __init__(self, datapath, blobs=None):
+        self.datapath = datapath
+        # Only real connections can take raw bytes
+        self.blobs = blobs if blobs is not None and hasattr(datapath, 'send') else None
+        self.buf = bytearray()
+
+    def add(self, index, msg):
+        """Sends messages[index] (as saved bytes if there are any), or msg if it was replaced by something else."""
+        if self.blobs is None or index is None:
+            self.flush()
+            if index is not None:
+                # (it may have been serialised for another connection already, e.g. by FlowModCache)
+                msg.datapath, msg.xid, msg.buf = self.datapath, None, None
+            self.datapath.send_msg(msg)
+            return
+        # Every OpenFlow message starts with version (1 byte), type (1), length (2) and xid (4)
+        datapath = self.datapath
+        datapath.xid = (datapath.xid + 1) & datapath.ofproto.MAX_XID
+        offset = len(self.buf)
+        self.buf += self.blobs[index]
+        struct.pack_into('!I', self.buf, offset + 4, datapath.xid)
+
+    def flush(self):
+        if self.buf:
+            self.datapath.send(bytes(self.buf))
+            self.buf = bytearray()
+
+
+class _Reconciliation:
+    """One switch's reconciliation in progress: what the app wants, and what the switch has said it has so far."""
+
+    def __init__(self, datapath, messages, blobs=None):
+        self.datapath = datapath
+        self.messages = messages
+        self.blobs = blobs
+        self.waiting = set()  # xids of stats requests without a (final) reply yet
+        self.flows = []
+        self.group_ids = set()
+        self.meter_ids = set()
+        self.timer = None
+
+
+class FlowReconciler:
+    """
+    Installs only what a switch is missing when it connects, instead of everything on top of whatever it already has.
+
+    When ryu-manager restarts, the switches keep their flows. Reinstalling every flow on top of them leaves old flows
+    that the new code no longer wants, and re-adding groups/meters briefly removes the flows using them. Instead:
+    1. switch_features_handler runs as usual, but what it sends is held back.
+    2. The switch is asked for its flows, groups and meters (stats requests).
+    3. Only the differences are sent: missing flows are added, groups/meters that exist are modified in place, and flows
+       the app no longer installs are deleted. Flows that are already right aren't touched, so traffic keeps flowing.
+
+    Only the app's own flows are asked for (by cookie), and a flow is only deleted if it belongs to one of the features
+    the handler sent flows for (e.g. an older version of them). Anything else on the switch is left alone: flows the app
+    installs later from packet-ins (a different feature: the method that installed them), flows added by hand and
+    other apps' flows.
+
+    Flows are compared by cookie, which includes a hash of the flow's contents (see ryu_flow_cookies.py): any flow sent
+    with cookie=0 is tagged first, and install_flow()'s cookies get their content hash filled in.
+    Flows with an idle or hard timeout are never deleted (they go away on their own, and may belong to a live
+    session the app set up from a packet-in).
+    If the switch doesn't answer within 'timeout' seconds, or the handler sends something that can't be compared
+    (e.g. install_flow(..., wait=True)), everything is sent as it was, like before.
+
+    TemplateBaseApp (ryu_template_base.py) sets this up for every template, as self.flow_reconciler.
+    """
+
+    def __init__(self, app, timeout=5.0):
+        """
+        app: The Ryu app, used for its logger.
+        timeout: (seconds) how long to wait for a switch's stats replies before installing everything regardless.
+        """
+        self.app = app
+        self.timeout = timeout
+        self.pending = {}  # dpid -> _Reconciliation
+        self.by_xid = {}  # (dpid, stats request xid) -> _Reconciliation
+
+    def apply(self, datapath, messages, blobs=None):
+        """
+        Gets the switch to match what messages (held back from switch_features_handler) would have installed.
+        blobs: The same messages already serialised, one bytes object each (FlowModCache passes its saved ones on a
+               reconnect). Whatever is sent unchanged is then sent as those bytes instead of being serialised again.
+        """
+        # Flows are compared by cookie, so every flow needs one that includes a hash of its contents: flows sent without
+        # a cookie (e.g. straight with datapath.send_msg) get a whole one, and install_flow()'s get the hash filled in
+        cookies = getattr(self.app, 'flow_cookies', None)
+        for msg in messages:
+            if type(msg).__name__ == 'OFPFlowMod' and msg.command == datapath.ofproto.OFPFC_ADD:
+                cookie = msg.cookie
+                if not cookie:
+                    msg.cookie = cookies.tag(msg, 'untagged') if cookies is not None else content_cookie(msg)
+                elif cookies is not None:
+                    msg.cookie = cookies.with_content(msg)
+                if msg.cookie != cookie:
+                    blobs = None  # The saved bytes have the old cookie
+
+        # Only real switches can answer stats requests (not e.g. the flow simulator's pretend ones)
+        if not isinstance(datapath, Datapath) or any(type(msg).__name__ not in _RECONCILABLE for msg in messages):
+            self._send_all(datapath, messages, blobs)
+            return
+
+        previous = self.pending.pop(datapath.id, None)
+        if previous is not None:
+            self._forget(previous)
+
+        state = self.pending[datapath.id] = _Reconciliation(datapath, messages, blobs)
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        # Only the flows this app's cookies (or the reconciler's own content cookies) could have come from
+        cookie, cookie_mask = cookies.select() if cookies is not None else (CONTENT_COOKIE_BIT, CONTENT_COOKIE_BIT)
+        for request in (parser.OFPFlowStatsRequest(datapath, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                                                   cookie, cookie_mask),
+                        parser.OFPGroupDescStatsRequest(datapath, 0),
+                        parser.OFPMeterConfigStatsRequest(datapath, 0, ofproto.OFPM_ALL)):
+            xid = datapath.set_xid(request)
+            state.waiting.add(xid)
+            self.by_xid[(datapath.id, xid)] = state
+            datapath.send_msg(request)
+        state.timer = hub.spawn_after(self.timeout, self._timed_out, state)
+
+    def stats_reply(self, ev):
+        """Call from the EventOFPFlowStatsReply, EventOFPGroupDescStatsReply and EventOFPMeterConfigStatsReply handlers."""
+        msg = ev.msg
+        state = self.by_xid.get((msg.datapath.id, msg.xid))
+        if state is None:
+            return  # Someone else's request
+
+        for entry in msg.body:
+            if hasattr(entry, 'instructions'):
+                state.flows.append(entry)
+            elif hasattr(entry, 'buckets'):
+                state.group_ids.add(entry.group_id)
+            else:
+                state.meter_ids.add(entry.meter_id)
+
+        # Big replies come in several parts, the last one without the "more" flag
+        if not msg.flags & msg.datapath.ofproto.OFPMPF_REPLY_MORE:
+            self._answered(state, msg.xid)
+
+    def error(self, ev):
+        """
+        Call from an EventOFPErrorMsg handler. A rejected request (e.g. a switch without meters) counts as 'none'.
+        Returns whether the error was about one of the reconciler's requests.
+        """
+        msg = ev.msg
+        state = self.by_xid.get((msg.datapath.id, msg.xid))
+        if state is None:
+            return False
+        self._answered(state, msg.xid)
+        return True
+
+    def _answered(self, state, xid):
+        del self.by_xid[(state.datapath.id, xid)]
+        state.waiting.discard(xid)
+        if not state.waiting:
+            self._forget(state)
+            self._reconcile(state)
+
+    def _forget(self, state):
+        if self.pending.get(state.datapath.id) is state:
+            del self.pending[state.datapath.id]
+        for xid in state.waiting:
+            self.by_xid.pop((state.datapath.id, xid), None)
+        if state.timer is not None:
+            hub.kill(state.timer)
+            state.timer = None
+
+    def _timed_out(self, state):
+        state.timer = None
+        self._forget(state)
+        self.app.logger.warning("Switch %s didn't answer the flow stats request, installing all its flows", state.datapath.id)
+        self._send_all(state.datapath, state.messages, state.blobs)
+
+    @staticmethod
+    def _send_all(datapath, messages, blobs=None):
+        batch = _Batch(datapath, blobs)
+        for index, msg in enumerate(messages):
+            batch.add(index, msg)
+        batch.flush()
+
+    def _reconcile(self, state):
+        datapath = state.datapath
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        cookies = getattr(self.app, 'flow_cookies', None)
+        existing_cookies = {flow.cookie for flow in state.flows}
+        wanted_cookies = set()
+        added = kept = 0
+
+        # Groups/meters that get deleted and re-added (the usual way to 'install or replace' one) are modified in place
+        # instead when the switch already has them, because deleting one also deletes every flow using it
+        re_added_groups = {m.group_id for m in state.messages
+                           if type(m).__name__ == 'OFPGroupMod' and m.command == ofproto.OFPGC_ADD}
+        re_added_meters = {m.meter_id for m in state.messages
+                           if type(m).__name__ == 'OFPMeterMod' and m.command == ofproto.OFPMC_ADD}
+
+        batch = _Batch(datapath, state.blobs)
+        for index, msg in enumerate(state.messages):
+            kind = type(msg).__name__
+            if kind == 'OFPGroupMod':
+                if msg.command == ofproto.OFPGC_DELETE and msg.group_id in re_added_groups:
+                    continue
+                if msg.command == ofproto.OFPGC_ADD and msg.group_id in state.group_ids:
+                    msg, index = parser.OFPGroupMod(datapath, ofproto.OFPGC_MODIFY, msg.type, msg.group_id, msg.buckets), None
+            elif kind == 'OFPMeterMod':
+                if msg.command == ofproto.OFPMC_DELETE and msg.meter_id in re_added_meters:
+                    continue
+                if msg.command == ofproto.OFPMC_ADD and msg.meter_id in state.meter_ids:
+                    msg, index = parser.OFPMeterMod(datapath, ofproto.OFPMC_MODIFY, msg.flags, msg.meter_id, msg.bands), None
+            elif kind == 'OFPFlowMod' and msg.command == ofproto.OFPFC_ADD:
+                wanted_cookies.add(msg.cookie)
+                if msg.cookie in existing_cookies:
+                    kept += 1
+                    continue
+                added += 1
+            batch.add(index, msg)
+
+        # Make sure the new flows are in before the old ones go, so there's never a gap
+        batch.add(None, parser.OFPBarrierRequest(datapath))
+
+        # Stale flows can only be from features the handler sent flows for: everything else isn't the handler's business
+        if cookies is not None:
+            features = {cookies.feature_of(c) for c in wanted_cookies if cookies.is_ours(c)}
+            stale = [flow for flow in state.flows
+                     if cookies.is_ours(flow.cookie) and cookies.feature_of(flow.cookie) in features]
+        else:
+            stale = [flow for flow in state.flows if flow.cookie & CONTENT_COOKIE_BIT]
+
+        removed = 0
+        for flow in stale:
+            if flow.cookie in wanted_cookies or flow.idle_timeout or flow.hard_timeout:
+                continue
+            # The exact flow (table, priority, match) and only if it still has the stale cookie: if a new flow with the
+            # same match replaced it just now, that one has a different cookie and stays
+            datapath.send_msg(parser.OFPFlowMod(
+                datapath=datapath, table_id=flow.table_id, command=ofproto.OFPFC_DELETE_STRICT, priority=flow.priority,
+                match=flow.match, cookie=flow.cookie, cookie_mask=0xFFFFFFFFFFFFFFFF,
+                out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY))
+            removed += 1
+
+        self.app.logger.info("Switch %s reconciled: %d flow(s) already there, %d added, %d stale removed",
+                             datapath.id, kept, added, removed)
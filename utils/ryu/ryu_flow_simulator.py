@@ -0,0 +1,604 @@
+import argparse
+import importlib.util
+import inspect
+import ipaddress
+import json
+import logging
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from ryu.base import app_manager
+from ryu.controller import ofp_event
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser, ether, inet
+
+# ╔══════════════════════════════════════════════╗
+# ║          OFFLINE FLOW TABLE SIMULATOR        ║
+# ╚══════════════════════════════════════════════╝
+# Checks what an app's flows do without Mininet, Open vSwitch or root:
+# 1. The app's switch_features_handler is run against a pretend switch, and every FlowMod it sends is captured.
+# 2. Batches of packets (made up, or read from a .pcap) are matched against those flows the way a switch would:
+#    highest priority first, following goto_table, applying set_field/push_vlan/pop_vlan on the way.
+# 3. You get how many packets hit each flow, and what happened to every packet (output port, controller, drop...).
+#
+# The matching works on whole columns of packets at once with NumPy, so millions of packets take seconds.
+#
+# It simulates one switch at a time (it doesn't know how the switches are cabled), and only the flows installed when the
+# switch connects: anything an app adds later from a packet-in isn't there.
+#
+# From the command line:
+#   python3 ryu_flow_simulator.py basic_ipv4_arp_and_vlan_usage.py --dpid 1 --synthetic 1000000
+# (an app whose switch_features_handler installs nothing, like week_13_lecture_controller.py until you add a tutorial
+# method to it, just shows every packet as 'drop (table miss)')
+#   python3 ryu_flow_simulator.py my_app.py --dpid 1 --pcap capture.pcap --in-port 1
+# Or from Python (e.g. a CI check):
+#   simulator = FlowSimulator.from_file('my_app.py', dpids=[1])
+#   assert simulator.lookup(1, in_port=1, eth_type=0x0800, ipv4_dst='10.0.0.2') == 'output:2'
+
+# Every packet field the simulator knows about. Flows matching on anything else are rejected with a ValueError.
+PACKET_FIELDS = (
+    'in_port', 'eth_dst', 'eth_src', 'eth_type', 'vlan_vid', 'vlan_pcp', 'ip_dscp', 'ip_proto',
+    'ipv4_src', 'ipv4_dst', 'tcp_src', 'tcp_dst', 'udp_src', 'udp_dst', 'icmpv4_type', 'icmpv4_code',
+    'arp_op', 'arp_spa', 'arp_tpa', 'arp_sha', 'arp_tha',
+)
+_MAC_FIELDS = {'eth_dst', 'eth_src', 'arp_sha', 'arp_tha'}
+_IPV4_FIELDS = {'ipv4_src', 'ipv4_dst', 'arp_spa', 'arp_tpa'}
+
+_PORT_NAMES = {
+    ofproto_v1_3.OFPP_CONTROLLER: 'CONTROLLER',
+    ofproto_v1_3.OFPP_NORMAL: 'NORMAL',
+    ofproto_v1_3.OFPP_FLOOD: 'FLOOD',
+    ofproto_v1_3.OFPP_ALL: 'ALL',
+    ofproto_v1_3.OFPP_IN_PORT: 'IN_PORT',
+    ofproto_v1_3.OFPP_LOCAL: 'LOCAL',
+    ofproto_v1_3.OFPP_TABLE: 'TABLE',
+}
+
+_DONE = -1  # "Table" a packet is in once it has finished the pipeline
+
+
+def _field_int(field, value):
+    """A match/set_field value as a plain number (MACs and IPv4 addresses come as strings from Ryu)."""
+    if isinstance(value, int):
+        return value
+    if field in _MAC_FIELDS:
+        return int(value.replace(':', ''), 16)
+    if field in _IPV4_FIELDS:
+        return int(ipaddress.IPv4Address(value))
+    raise ValueError(f"Can't read the value {value!r} of {field}")
+
+
+def _condition(field, value):
+    """(value, mask) as integers for one match field, whether or not it was given with a mask."""
+    if field not in PACKET_FIELDS:
+        raise ValueError(f"The simulator doesn't support matching on {field}")
+    if isinstance(value, tuple):
+        value, mask = value
+    elif isinstance(value, str) and '/' in value and field in _IPV4_FIELDS:
+        network = ipaddress.IPv4Network(value, strict=False)
+        value, mask = str(network.network_address), str(network.netmask)
+    else:
+        mask = None
+    value = _field_int(field, value)
+    mask = _field_int(field, mask) if mask is not None else (1 << 64) - 1
+    return field, np.uint64(value & mask), np.uint64(mask)
+
+
+class PacketBatch:
+    """
+    A batch of packets, stored as one NumPy array per header field (see PACKET_FIELDS) rather than one object per packet.
+
+    Fields a packet doesn't have (e.g. tcp_dst on an ARP) are 0, and vlan_vid is 0x1000 | VLAN ID for tagged packets,
+    the same way OpenFlow 1.3 matches them.
+    """
+
+    def __init__(self, fields):
+        """fields: Dictionary of field name -> array (or list) of values, all the same length. Missing fields are 0."""
+        lengths = {len(values) for values in fields.values()}
+        if len(lengths) > 1:
+            raise ValueError("Every field of a PacketBatch needs the same number of values")
+        count = lengths.pop() if lengths else 0
+
+        self.fields = {}
+        for field in PACKET_FIELDS:
+            values = fields.get(field)
+            if values is None:
+                values = np.zeros(count, dtype=np.uint64)
+            elif not isinstance(values, np.ndarray):
+                values = [_field_int(field, value) for value in values]
+            self.fields[field] = np.asarray(values, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.fields['in_port'])
+
+    @classmethod
+    def single(cls, **fields):
+        """A batch of one packet, e.g. PacketBatch.single(in_port=1, eth_type=0x0800, ipv4_dst='10.0.0.2')."""
+        return cls({field: [value] for field, value in fields.items()})
+
+    def packet(self, index):
+        """One packet's non-zero fields, as a dictionary (handy when looking at why a packet got an outcome)."""
+        return {field: int(values[index]) for field, values in self.fields.items() if values[index]}
+
+
+def synthetic_packets(count, hosts=('10.0.0.1', '10.0.0.2', '10.0.0.3', '10.0.0.4'), in_ports=(1,),
+                      arp_share=0.05, icmp_share=0.15, tcp_share=0.5, vlans=(), seed=0):
+    """
+    Makes up a PacketBatch of traffic between hosts: ARP requests, pings, and TCP/UDP to common and random ports.
+
+    hosts: Host IPs to send between. Each host's MAC is its IP's last bytes, like the Mininet topologies here (10.0.0.2 -> 00:00:00:00:00:02).
+    in_ports: Switch ports the packets arrive on, picked at random.
+    vlans: If given, half of the IP packets are tagged with one of these VLAN IDs.
+    The rest of the traffic (after ARP, ICMP and TCP) is UDP.
+    """
+    rng = np.random.default_rng(seed)
+    ips = np.array([int(ipaddress.IPv4Address(ip)) for ip in hosts], dtype=np.uint64)
+    macs = ips & np.uint64(0xFFFFFF)
+
+    src = rng.integers(0, len(ips), count)
+    dst = (src + rng.integers(1, len(ips), count)) % len(ips)  # Never send to yourself
+
+    kind = rng.choice(4, count, p=[arp_share, icmp_share, tcp_share, 1 - arp_share - icmp_share - tcp_share])
+    is_arp, is_icmp, is_tcp, is_udp = (kind == 0), (kind == 1), (kind == 2), (kind == 3)
+    is_ip = ~is_arp
+
+    def where(mask, values):
+        return np.where(mask, values, 0).astype(np.uint64)
+
+    ports = np.array([22, 80, 443, 5001], dtype=np.uint64)
+    service = np.where(rng.random(count) < 0.7, ports[rng.integers(0, len(ports), count)],
+                       rng.integers(1024, 65536, count))
+    ephemeral = rng.integers(32768, 61000, count)
+
+    fields = {
+        'in_port': np.asarray(in_ports, dtype=np.uint64)[rng.integers(0, len(in_ports), count)],
+        'eth_src': macs[src],
+        'eth_dst': np.where(is_arp, np.uint64(0xFFFFFFFFFFFF), macs[dst]).astype(np.uint64),
+        'eth_type': np.where(is_arp, ether.ETH_TYPE_ARP, ether.ETH_TYPE_IP).astype(np.uint64),
+        'ip_proto': where(is_icmp, inet.IPPROTO_ICMP) | where(is_tcp, inet.IPPROTO_TCP) | where(is_udp, inet.IPPROTO_UDP),
+        'ipv4_src': where(is_ip, ips[src]),
+        'ipv4_dst': where(is_ip, ips[dst]),
+        'tcp_src': where(is_tcp, ephemeral),
+        'tcp_dst': where(is_tcp, service),
+        'udp_src': where(is_udp, ephemeral),
+        'udp_dst': where(is_udp, service),
+        'icmpv4_type': where(is_icmp, 8),  # Echo request
+        'arp_op': where(is_arp, 1),  # Request
+        'arp_spa': where(is_arp, ips[src]),
+        'arp_tpa': where(is_arp, ips[dst]),
+        'arp_sha': where(is_arp, macs[src]),
+    }
+    if vlans:
+        tagged = is_ip & (rng.random(count) < 0.5)
+        vids = np.asarray(vlans, dtype=np.uint64)[rng.integers(0, len(vlans), count)]
+        fields['vlan_vid'] = where(tagged, vids | np.uint64(ofproto_v1_3.OFPVID_PRESENT))
+    return PacketBatch(fields)
+
+
+def pcap_packets(path, in_port=1):
+    """
+    Reads an Ethernet .pcap file (e.g. from 'tcpdump -w' or Wireshark, saved as pcap rather than pcapng) into a PacketBatch.
+
+    A capture doesn't say which switch port a packet arrived on, so they all get in_port.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    magic = data[:4]
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+        endian = '<'
+    elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+        endian = '>'
+    else:
+        raise ValueError(f"{path} isn't a pcap file (pcapng isn't supported, save it as pcap)")
+    if struct.unpack(endian + 'I', data[20:24])[0] != 1:
+        raise ValueError(f"{path} isn't an Ethernet capture")
+
+    columns = {field: [] for field in PACKET_FIELDS}
+    record_header = struct.Struct(endian + 'IIII')
+    offset = 24
+    while offset + record_header.size <= len(data):
+        _sec, _usec, captured, _length = record_header.unpack_from(data, offset)
+        offset += record_header.size
+        packet = _parse_frame(data[offset:offset + captured])
+        offset += captured
+        packet['in_port'] = in_port
+        for field in PACKET_FIELDS:
+            columns[field].append(packet.get(field, 0))
+
+    return PacketBatch({field: np.asarray(values, dtype=np.uint64) for field, values in columns.items()})
+
+
+def _parse_frame(frame):
+    """The header fields of one Ethernet frame, as a dictionary of field name -> number."""
+    fields = {}
+    if len(frame) < 14:
+        return fields
+    fields['eth_dst'] = int.from_bytes(frame[0:6], 'big')
+    fields['eth_src'] = int.from_bytes(frame[6:12], 'big')
+    eth_type = int.from_bytes(frame[12:14], 'big')
+    offset = 14
+    if eth_type == ether.ETH_TYPE_8021Q and len(frame) >= 18:
+        tci = int.from_bytes(frame[14:16], 'big')
+        fields['vlan_vid'] = (tci & 0x0FFF) | ofproto_v1_3.OFPVID_PRESENT
+        fields['vlan_pcp'] = tci >> 13
+        eth_type = int.from_bytes(frame[16:18], 'big')
+        offset = 18
+    fields['eth_type'] = eth_type
+
+    if eth_type == ether.ETH_TYPE_ARP and len(frame) >= offset + 28:
+        fields['arp_op'] = int.from_bytes(frame[offset + 6:offset + 8], 'big')
+        fields['arp_sha'] = int.from_bytes(frame[offset + 8:offset + 14], 'big')
+        fields['arp_spa'] = int.from_bytes(frame[offset + 14:offset + 18], 'big')
+        fields['arp_tha'] = int.from_bytes(frame[offset + 18:offset + 24], 'big')
+        fields['arp_tpa'] = int.from_bytes(frame[offset + 24:offset + 28], 'big')
+    elif eth_type == ether.ETH_TYPE_IP and len(frame) >= offset + 20:
+        header_length = (frame[offset] & 0x0F) * 4
+        fields['ip_dscp'] = frame[offset + 1] >> 2
+        ip_proto = frame[offset + 9]
+        fields['ip_proto'] = ip_proto
+        fields['ipv4_src'] = int.from_bytes(frame[offset + 12:offset + 16], 'big')
+        fields['ipv4_dst'] = int.from_bytes(frame[offset + 16:offset + 20], 'big')
+        l4 = offset + header_length
+        if ip_proto in (inet.IPPROTO_TCP, inet.IPPROTO_UDP) and len(frame) >= l4 + 4:
+            prefix = 'tcp' if ip_proto == inet.IPPROTO_TCP else 'udp'
+            fields[prefix + '_src'] = int.from_bytes(frame[l4:l4 + 2], 'big')
+            fields[prefix + '_dst'] = int.from_bytes(frame[l4 + 2:l4 + 4], 'big')
+        elif ip_proto == inet.IPPROTO_ICMP and len(frame) >= l4 + 2:
+            fields['icmpv4_type'] = frame[l4]
+            fields['icmpv4_code'] = frame[l4 + 1]
+    return fields
+
+
+class SimulatedDatapath(object):
+    """A pretend OpenFlow 1.3 switch: it has everything a switch_features_handler uses, and keeps every message sent to it."""
+
+    def __init__(self, dpid, n_buffers=0):
+        self.id = dpid
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.address = ('simulator', dpid)
+        self.n_buffers = n_buffers
+        self.is_active = True
+        self.sent = []
+        self.xid = 0
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+        return self.xid
+
+    def send_msg(self, msg, close_socket=False):
+        if msg.xid is None:
+            self.set_xid(msg)
+        self.sent.append(msg)
+        return True
+
+    def features_event(self):
+        """The EventOFPSwitchFeatures a real switch's connection would produce."""
+        msg = ofproto_v1_3_parser.OFPSwitchFeatures(self, datapath_id=self.id, n_buffers=self.n_buffers,
+                                                     n_tables=254, auxiliary_id=0, capabilities=0)
+        return ofp_event.EventOFPSwitchFeatures(msg)
+
+
+class SimulatedFlow:
+    """One flow entry in the simulated flow table, with what it matches, what it does, and how many packets hit it."""
+
+    def __init__(self, mod):
+        self.mod = mod
+        self.table_id = mod.table_id
+        self.priority = mod.priority
+        self.cookie = mod.cookie
+        self.match = dict(mod.match.items())
+        self.conditions = [_condition(field, value) for field, value in self.match.items()]
+        self.actions = []  # Applied immediately (apply-actions), in order
+        self.write_actions = []  # Added to the action set, applied once the packet leaves the pipeline
+        self.clear_actions = False
+        self.goto_table = None
+        self.meter_id = None
+        self.hits = 0
+
+        for instruction in mod.instructions:
+            if isinstance(instruction, ofproto_v1_3_parser.OFPInstructionGotoTable):
+                self.goto_table = instruction.table_id
+            elif isinstance(instruction, ofproto_v1_3_parser.OFPInstructionMeter):
+                self.meter_id = instruction.meter_id
+            elif isinstance(instruction, ofproto_v1_3_parser.OFPInstructionActions):
+                if instruction.type == ofproto_v1_3.OFPIT_APPLY_ACTIONS:
+                    self.actions.extend(instruction.actions)
+                elif instruction.type == ofproto_v1_3.OFPIT_WRITE_ACTIONS:
+                    self.write_actions.extend(instruction.actions)
+                else:
+                    self.clear_actions = True
+
+    def key(self):
+        """What identifies a flow entry in a switch: table, priority and match."""
+        return (self.table_id, self.priority, json.dumps(self.match, sort_keys=True, default=str))
+
+    def describe_match(self):
+        if not self.match:
+            return '*'
+        return ', '.join(f"{field}={value}" for field, value in self.match.items())
+
+    def describe(self):
+        """What this flow does, e.g. 'set_field:vlan_vid=4196, output:2' or 'goto_table:1'."""
+        steps = []
+        if self.meter_id is not None:
+            steps.append(f"meter:{self.meter_id}")
+        steps.extend(_describe_action(action) for action in self.actions)
+        if self.write_actions:
+            steps.append('write(' + ', '.join(_describe_action(a) for a in self.write_actions) + ')')
+        if self.goto_table is not None:
+            steps.append(f"goto_table:{self.goto_table}")
+        return ', '.join(steps) or 'drop'
+
+
+def _describe_action(action):
+    parser = ofproto_v1_3_parser
+    if isinstance(action, parser.OFPActionOutput):
+        return f"output:{_PORT_NAMES.get(action.port, action.port)}"
+    if isinstance(action, parser.OFPActionGroup):
+        return f"group:{action.group_id}"
+    if isinstance(action, parser.OFPActionSetQueue):
+        return f"set_queue:{action.queue_id}"
+    if isinstance(action, parser.OFPActionSetField):
+        return f"set_field:{action.key}={action.value}"
+    if isinstance(action, parser.OFPActionPushVlan):
+        return 'push_vlan'
+    if isinstance(action, parser.OFPActionPopVlan):
+        return 'pop_vlan'
+    return type(action).__name__.replace('OFPAction', '').lower()
+
+
+class SimulationResult:
+    """What happened to a PacketBatch: per-flow hit counts, and an outcome (a description of its actions) per packet."""
+
+    def __init__(self, dpid, flows, outcomes, packet_outcomes, seconds):
+        self.dpid = dpid
+        self.flows = flows  # SimulatedFlow objects, each with .hits for this batch
+        self.outcomes = outcomes  # Distinct outcome descriptions, e.g. ['output:2', 'output:CONTROLLER', 'drop (table miss)']
+        self.packet_outcomes = packet_outcomes  # Per packet, an index into outcomes
+        self.seconds = seconds
+
+    def outcome(self, index):
+        """The outcome of one packet of the batch."""
+        return self.outcomes[self.packet_outcomes[index]]
+
+    def outcome_counts(self):
+        """Dictionary of outcome -> number of packets, most common first."""
+        counts = np.bincount(self.packet_outcomes, minlength=len(self.outcomes))
+        order = np.argsort(-counts, kind='stable')
+        return {self.outcomes[i]: int(counts[i]) for i in order if counts[i]}
+
+    def print_report(self):
+        total = len(self.packet_outcomes)
+        rate = total / self.seconds if self.seconds else float('inf')
+        print(f"Switch {self.dpid}: {total} packets classified in {self.seconds * 1000:.1f} ms ({rate:,.0f} packets/s)")
+        print()
+        print(f"{'table':>5} {'priority':>8} {'hits':>10}  match -> actions")
+        for flow in self.flows:
+            print(f"{flow.table_id:>5} {flow.priority:>8} {flow.hits:>10}  {flow.describe_match()} -> {flow.describe()}")
+        print()
+        print(f"{'packets':>10} {'share':>7}  outcome")
+        for outcome, count in self.outcome_counts().items():
+            print(f"{count:>10} {100.0 * count / total:>6.1f}%  {outcome}")
+
+
+class FlowSimulator:
+    """
+    The flow tables an app installs on each switch when it connects, and a vectorised packet classifier for them.
+
+    Example usage:
+        simulator = FlowSimulator.from_file('/opt/workspace/ryu/my_app.py', dpids=[1, 2])
+        result = simulator.classify(2, synthetic_packets(1000000))
+        result.print_report()
+    """
+
+    def __init__(self, app, dpids):
+        """
+        app: An app instance. Its switch_features_handler is run once per DPID against a SimulatedDatapath.
+        dpids: The switches to simulate.
+        """
+        self.app = app
+        self.tables = {}  # dpid -> list of SimulatedFlow, in the order the switch would try them
+        self.messages = {}  # dpid -> every message the app sent that switch (FlowMods, groups, meters, config...)
+        for dpid in dpids:
+            self.capture(dpid)
+
+    @classmethod
+    def from_file(cls, path, dpids, class_name=None):
+        """Loads the Ryu app defined in a .py file (e.g. a template) and captures its flows for each DPID."""
+        return cls(load_app(path, class_name), dpids)
+
+    def capture(self, dpid):
+        datapath = SimulatedDatapath(dpid)
+        self.app.switch_features_handler(datapath.features_event())
+        self.messages[dpid] = datapath.sent
+
+        flows = {}
+        for msg in datapath.sent:
+            if isinstance(msg, ofproto_v1_3_parser.OFPFlowMod):
+                self._apply_flow_mod(flows, msg)
+        # Highest priority first, in each table. Between equal priorities a switch's choice is undefined, so keep it stable.
+        self.tables[dpid] = sorted(flows.values(), key=lambda flow: (flow.table_id, -flow.priority))
+        return self.tables[dpid]
+
+    @staticmethod
+    def _apply_flow_mod(flows, mod):
+        ofproto = ofproto_v1_3
+        if mod.command in (ofproto.OFPFC_ADD, ofproto.OFPFC_MODIFY, ofproto.OFPFC_MODIFY_STRICT):
+            flow = SimulatedFlow(mod)
+            flows[flow.key()] = flow  # An ADD with the same table, priority and match replaces the old entry
+            return
+
+        # Deletes: strict ones remove exactly one entry, the others every entry whose match includes theirs
+        delete = dict(mod.match.items())
+        for key, flow in list(flows.items()):
+            if mod.table_id not in (ofproto.OFPTT_ALL, flow.table_id):
+                continue
+            if mod.command == ofproto.OFPFC_DELETE_STRICT:
+                if flow.priority == mod.priority and flow.match == delete:
+                    del flows[key]
+            elif all(flow.match.get(field) == value for field, value in delete.items()):
+                del flows[key]
+
+    def classify(self, dpid, batch):
+        """Runs every packet in a PacketBatch through this switch's flow tables, and returns a SimulationResult."""
+        started = time.perf_counter()
+        flows = self.tables[dpid]
+        count = len(batch)
+        fields = {field: values.copy() for field, values in batch.fields.items()}  # Actions may change them
+
+        table = np.zeros(count, dtype=np.int64)  # Which table each packet is in (_DONE once it's finished)
+        steps = []  # Per table visited, the flow each packet matched there (-1 for none)
+        for flow in flows:
+            flow.hits = 0
+
+        table_ids = sorted({flow.table_id for flow in flows} | {0})
+        for table_id in table_ids:
+            # Every table gets a column (even one no packet reaches), so _describe_path can find a table by its position
+            matched = np.full(count, -1, dtype=np.int64)
+            steps.append(matched)
+            candidates = np.flatnonzero(table == table_id)
+            if not len(candidates):
+                continue
+
+            for index, flow in enumerate(flows):
+                if flow.table_id != table_id or not len(candidates):
+                    continue
+                hit = np.ones(len(candidates), dtype=bool)
+                for field, value, mask in flow.conditions:
+                    hit &= (fields[field][candidates] & mask) == value
+                packets = candidates[hit]
+                if not len(packets):
+                    continue
+                candidates = candidates[~hit]  # Each packet only matches its highest priority flow
+
+                matched[packets] = index
+                flow.hits += len(packets)
+                self._apply_field_changes(fields, packets, flow.actions)
+                table[packets] = flow.goto_table if flow.goto_table is not None else _DONE
+
+            table[candidates] = _DONE  # Table miss (there's no table-miss flow): dropped
+
+        # Packets that took the same flows got the same outcome, so describe each distinct path once
+        if count:
+            paths, packet_outcomes = np.unique(np.stack(steps, axis=1), axis=0, return_inverse=True)
+            packet_outcomes = packet_outcomes.reshape(-1)
+        else:
+            paths, packet_outcomes = np.full((1, len(table_ids)), -1), np.zeros(count, dtype=np.int64)
+        outcomes = [self._describe_path(flows, table_ids, path) for path in paths]
+
+        return SimulationResult(dpid, flows, outcomes, packet_outcomes, time.perf_counter() - started)
+
+    @staticmethod
+    def _apply_field_changes(fields, packets, actions):
+        """Applies set_field/push_vlan/pop_vlan to the given packets, so later tables match the changed headers."""
+        parser = ofproto_v1_3_parser
+        for action in actions:
+            if isinstance(action, parser.OFPActionSetField) and action.key in fields:
+                value = _field_int(action.key, action.value)
+                if action.key == 'vlan_vid':
+                    value |= ofproto_v1_3.OFPVID_PRESENT
+                fields[action.key][packets] = value
+            elif isinstance(action, parser.OFPActionPushVlan):
+                fields['vlan_vid'][packets] = ofproto_v1_3.OFPVID_PRESENT
+            elif isinstance(action, parser.OFPActionPopVlan):
+                fields['vlan_vid'][packets] = 0
+
+    @staticmethod
+    def _describe_path(flows, table_ids, path):
+        """Describes one path through the tables: path has, per table in table_ids, the flow matched there (or -1)."""
+        steps, action_set = [], []
+        table_id = 0
+        while True:
+            index = path[table_ids.index(table_id)] if table_id in table_ids else -1
+            if index < 0:
+                steps.append('drop (table miss)')
+                break
+            flow = flows[index]
+            if flow.clear_actions:
+                action_set = []
+            steps.extend(_describe_action(action) for action in flow.actions)
+            action_set.extend(flow.write_actions)
+            if flow.goto_table is None:
+                break
+            table_id = flow.goto_table
+
+        # The action set is applied when the packet leaves the pipeline
+        # (a flow without instructions, e.g. install_flow(datapath, priority, match) with no actions, adds no steps)
+        if not steps or not steps[-1].startswith('drop'):
+            steps.extend(_describe_action(action) for action in action_set)
+        if not any(step.startswith(('output', 'group', 'drop')) for step in steps):
+            steps.append('drop')
+        return ', '.join(steps)
+
+    def lookup(self, dpid, **fields):
+        """The outcome for a single packet, e.g. lookup(1, in_port=1, eth_type=0x0800, ipv4_dst='10.0.0.2')."""
+        return self.classify(dpid, PacketBatch.single(**fields)).outcome(0)
+
+
+def load_app(path, class_name=None):
+    """
+    Creates an instance of the Ryu app in a .py file, the way ryu-manager would (without starting it).
+
+    class_name: Which class, if the file defines more than one app.
+    """
+    path = os.path.realpath(path)
+    # Apps import the other utils directly (e.g. 'from ryu_maze import Maze'), which live next to this file
+    for directory in (os.path.dirname(os.path.abspath(__file__)), os.path.dirname(path)):
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    apps = [cls for _name, cls in inspect.getmembers(module, inspect.isclass)
+            if issubclass(cls, app_manager.RyuApp) and cls.__module__ == module.__name__
+            and (class_name is None or cls.__name__ == class_name)]
+    if len(apps) != 1:
+        found = ', '.join(cls.__name__ for cls in apps) or 'none'
+        raise ValueError(f"Expected one Ryu app in {path}, found {found} (pick one with class_name)")
+    return apps[0]()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify packets against the flows a Ryu app installs, without a network.")
+    parser.add_argument('app', help="The Ryu app's .py file")
+    parser.add_argument('--dpid', type=int, action='append', required=True, help="Switch to simulate (repeatable)")
+    parser.add_argument('--class-name', help="App class, if the file defines more than one")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--synthetic', type=int, default=100000, metavar='N', help="Make up N packets (default: 100000)")
+    source.add_argument('--pcap', help="Classify the packets in a .pcap file instead")
+    parser.add_argument('--hosts', default='10.0.0.1,10.0.0.2,10.0.0.3,10.0.0.4', help="Host IPs for made up packets")
+    parser.add_argument('--in-port', type=int, action='append', help="Port(s) packets arrive on (default: 1)")
+    parser.add_argument('--vlan', type=int, action='append', default=[], help="Tag half the made up IP packets with this VLAN")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="Show the app's own log messages")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    simulator = FlowSimulator.from_file(args.app, args.dpid, args.class_name)
+    in_ports = args.in_port or [1]
+
+    if args.pcap:
+        batch = pcap_packets(args.pcap, in_ports[0])
+    else:
+        started = time.perf_counter()
+        batch = synthetic_packets(args.synthetic, hosts=args.hosts.split(','), in_ports=in_ports,
+                                  vlans=args.vlan, seed=args.seed)
+        print(f"Made up {len(batch)} packets in {(time.perf_counter() - started) * 1000:.1f} ms")
+    print()
+
+    for dpid in args.dpid:
+        simulator.classify(dpid, batch).print_report()
+        print()
+
+
+if __name__ == '__main__':
+    main()
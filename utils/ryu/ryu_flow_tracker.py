@@ -0,0 +1,128 @@
+import time
+
+
+class FlowInstallHandle:
+    """
+    Tracks one FlowMod until the switch has definitely applied it (or rejected it).
+
+    Don't wait on it in a handler (the reply would never arrive, Ryu handles one event at a time);
+    give it a callback instead:
+
+        handle = self.install_flow(datapath, 1, match, actions, wait=True)
+        handle.add_done_callback(lambda handle: self.send_packet_out(ev, actions))
+    """
+
+    def __init__(self, datapath, mod):
+        self.datapath = datapath
+        self.mod = mod
+        self.sent_at = time.monotonic()
+        self.done = False
+        self.error = None  # The OFPErrorMsg the switch replied with (or a string, if it never replied)
+        self._callbacks = []
+
+    @property
+    def succeeded(self):
+        """True once the switch has applied the flow, False if it was rejected (None while still waiting)."""
+        if not self.done:
+            return None
+        return self.error is None
+
+    def add_done_callback(self, callback):
+        """Calls callback(handle) once the flow is active or has failed. Straight away, if that's already happened."""
+        if self.done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def _resolve(self, error=None):
+        if self.done:
+            return
+        self.done = True
+        self.error = error
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class FlowInstallTracker:
+    """
+    Sends FlowMods followed by a barrier, and tells you (through a FlowInstallHandle) when each one is active.
+
+    A switch handles messages in order, so once the barrier reply comes back every FlowMod sent before it has been
+    applied. If a FlowMod is rejected, the switch sends an error carrying that FlowMod's xid, which is matched back to
+    its handle (and logged) instead of being silently dropped.
+
+    Example usage (in __init__):
+        self.flow_tracker = FlowInstallTracker(self)
+    The app also needs to pass barrier replies and errors on to it:
+        @set_ev_cls(ofp_event.EventOFPBarrierReply, [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+        def barrier_reply_handler(self, ev):
+            self.flow_tracker.barrier_reply(ev)
+
+        @set_ev_cls(ofp_event.EventOFPErrorMsg, [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+        def error_msg_handler(self, ev):
+            self.flow_tracker.error(ev)
+    """
+
+    def __init__(self, app, timeout=5.0):
+        """
+        app: The Ryu app, used for its logger.
+        timeout: (seconds) after this long without a barrier reply, a flow counts as failed
+                 (only checked when more flows are installed, it never needs a thread of its own).
+        """
+        self.app = app
+        self.timeout = timeout
+        self._by_barrier = {}  # (dpid, barrier xid) -> handle
+        self._by_flow_mod = {}  # (dpid, FlowMod xid) -> (handle, barrier xid)
+
+    def install(self, datapath, mod):
+        """Sends a FlowMod plus a barrier, and returns the FlowInstallHandle for it."""
+        self._expire()
+        handle = FlowInstallHandle(datapath, mod)
+        parser = datapath.ofproto_parser
+
+        mod_xid = datapath.set_xid(mod)
+        datapath.send_msg(mod)
+
+        barrier = parser.OFPBarrierRequest(datapath)
+        barrier_xid = datapath.set_xid(barrier)
+        datapath.send_msg(barrier)
+
+        self._by_barrier[(datapath.id, barrier_xid)] = handle
+        self._by_flow_mod[(datapath.id, mod_xid)] = (handle, barrier_xid)
+        return handle
+
+    def barrier_reply(self, ev):
+        """Call from an EventOFPBarrierReply handler."""
+        msg = ev.msg
+        handle = self._by_barrier.pop((msg.datapath.id, msg.xid), None)
+        if handle is None:
+            return  # Someone else's barrier
+        self._by_flow_mod.pop((msg.datapath.id, handle.mod.xid), None)
+        handle._resolve()
+
+    def error(self, ev):
+        """Call from an EventOFPErrorMsg handler. Returns whether the error was about a tracked FlowMod."""
+        msg = ev.msg
+        entry = self._by_flow_mod.pop((msg.datapath.id, msg.xid), None)
+        if entry is None:
+            return False
+        handle, barrier_xid = entry
+        self._by_barrier.pop((msg.datapath.id, barrier_xid), None)
+        self.app.logger.warning("Switch %s rejected FlowMod (table %s, priority %s, %s): error type %s, code %s",
+                                msg.datapath.id, handle.mod.table_id, handle.mod.priority, handle.mod.match,
+                                msg.type, msg.code)
+        handle._resolve(msg)
+        return True
+
+    def pending(self, datapath=None):
+        """The handles still waiting for their switch (optionally just one switch's)."""
+        return [h for h in self._by_barrier.values() if datapath is None or h.datapath.id == datapath.id]
+
+    def _expire(self):
+        now = time.monotonic()
+        for key, handle in list(self._by_barrier.items()):
+            if now - handle.sent_at > self.timeout or not handle.datapath.is_active:
+                del self._by_barrier[key]
+                self._by_flow_mod.pop((key[0], handle.mod.xid), None)
+                handle._resolve("No barrier reply from switch %s (disconnected or timed out)" % key[0])
@@ -0,0 +1,242 @@
+import itertools
+
+from ryu_flow_cookies import APP_SHIFT, APP_BITS, content_hash
+
+
+class FlowTransaction:
+    """
+    A set of flow changes to one switch that take effect all at once. Made with FlowTransactions.begin(), see there.
+
+    While the 'with' block runs, nothing reaches the switch: install_flow() (and anything else that sends to this
+    datapath) is collected. Every flow tagged by install_flow() is re-tagged with the transaction's feature and a new
+    generation. When the block ends, the collected flows go in and the feature's previous generation is deleted.
+    If the block raises an exception, nothing is sent at all.
+    """
+
+    def __init__(self, manager, datapath, feature):
+        self.manager = manager
+        self.datapath = datapath
+        self.feature = feature
+        self.messages = []
+        self.xids = {}  # xid -> what it was ('open', 'add', 'commit', 'flow', 'make', 'break' or the final 'barrier')
+        self.mode = None  # 'bundle' or 'make-before-break', once committed
+        self.done = False
+        self.error = None
+        self._own_send_msg = None
+
+    def __enter__(self):
+        datapath = self.datapath
+        self._own_send_msg = vars(datapath).get('send_msg')  # In case something else already replaced it
+
+        def collecting_send_msg(msg, *args, **kwargs):
+            self.messages.append(msg)
+            return True
+
+        datapath.send_msg = collecting_send_msg
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._own_send_msg is None:
+            del self.datapath.send_msg  # Back to the class's own send_msg
+        else:
+            self.datapath.send_msg = self._own_send_msg
+        if exc_type is None:
+            self.manager._commit(self)
+        return False
+
+
+class FlowTransactions:
+    """
+    Swaps one set of flows on a switch for another without a moment where the switch has neither (or a mix of both).
+
+    Changing a policy normally means deleting the old flows and adding new ones, one message at a time. In between,
+    packets can match a mix of old and new rules, or nothing at all, and a table-miss sends them to the controller.
+    A transaction sends the change in one of two ways:
+    - OpenFlow bundles, on switches that support them (Open vSwitch does): all the changes are queued up on the
+      switch and applied atomically, so every packet sees either the old policy or the new one.
+    - Otherwise, make-before-break: the new flows are added first (tagged with a new cookie generation, see
+      ryu_flow_cookies.py), then after a barrier the old generation is deleted with one FlowMod. Packets can match old
+      or new flows for a moment, but never nothing.
+    Whether a switch supports bundles is found out from its first transaction (an unsupported bundle is rejected
+    before anything in it is applied, and the transaction is redone with make-before-break).
+
+    Example usage (in __init__):
+        self.flow_transactions = FlowTransactions(self)
+    Replacing every flow of a feature on a switch (e.g. from a packet-in, or a timer):
+        with self.flow_transactions.begin(datapath, 'vlan_lanes'):
+            self.install_flow(datapath, 1, match_100, actions_100)
+            self.install_flow(datapath, 1, match_200, actions_200)
+    The flows being replaced should have been installed with install_flow(..., feature='vlan_lanes').
+    Groups and meters sent inside the block go to the switch first, outside the bundle, so new flows can use them.
+    Don't use install_flow(..., wait=True) inside the block: the transaction itself waits for the switch.
+
+    The app needs a FlowCookies as self.flow_cookies, and has to pass barrier replies, errors and connects on:
+        self.flow_transactions.barrier_reply(ev)
+        self.flow_transactions.error(ev)
+        self.flow_transactions.switch_connected(ev.msg.datapath.id)  # (EventOFPSwitchFeatures)
+    A switch that (re)connects gets its flows from switch_features_handler again, tagged with the starting generation,
+    so what earlier transactions left behind on it is forgotten then.
+    TemplateBaseApp (ryu_template_base.py) does all of this for every template.
+    """
+
+    def __init__(self, app):
+        """
+        app: The Ryu app, used for its logger and its flow_cookies.
+        """
+        self.app = app
+        self.bundles = {}  # dpid -> whether the switch supports bundles (missing = not known yet)
+        self.generations = {}  # (dpid, feature) -> the generation of the feature's flows on that switch
+        self.pending = {}  # (dpid, xid) -> transaction
+        self._bundle_ids = itertools.count(1)
+
+    def begin(self, datapath, feature):
+        """A transaction that replaces every flow of 'feature' on this switch with the ones installed inside it."""
+        return FlowTransaction(self, datapath, feature)
+
+    def generation(self, dpid, feature):
+        return self.generations.get((dpid, feature), self.app.flow_cookies.generation)
+
+    def switch_connected(self, dpid):
+        """Call when a switch connects: its flows start over at the app's generation, and it may be a different switch."""
+        for key in [key for key in self.generations if key[0] == dpid]:
+            del self.generations[key]
+        self.bundles.pop(dpid, None)
+
+    def _commit(self, txn):
+        datapath = txn.datapath
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        cookies = self.app.flow_cookies
+        old_generation = self.generation(datapath.id, txn.feature)
+        txn.generation = (old_generation + 1) % 256
+
+        # Re-tag the flows install_flow() tagged (not ones with a cookie of the app's own choosing)
+        app_mask = ((1 << APP_BITS) - 1) << APP_SHIFT
+        for msg in txn.messages:
+            if (isinstance(msg, parser.OFPFlowMod) and msg.command == ofproto.OFPFC_ADD
+                    and msg.cookie & app_mask == cookies.app_id << APP_SHIFT):
+                msg.cookie = cookies.cookie(txn.feature, generation=txn.generation, content=content_hash(msg))
+
+        cookie, mask = cookies.select(txn.feature, old_generation)
+        txn.delete_old = parser.OFPFlowMod(
+            datapath=datapath, table_id=ofproto.OFPTT_ALL, command=ofproto.OFPFC_DELETE, cookie=cookie, cookie_mask=mask,
+            out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY, match=parser.OFPMatch())
+
+        # Groups, meters etc. go first and outside the bundle: the new flows may use them
+        txn.flow_mods = [msg for msg in txn.messages if isinstance(msg, parser.OFPFlowMod)]
+        for msg in txn.messages:
+            if not isinstance(msg, parser.OFPFlowMod):
+                datapath.send_msg(msg)
+
+        if self.bundles.get(datapath.id, True):
+            self._send_bundle(txn)
+        else:
+            self._send_make_before_break(txn)
+
+    def _track(self, txn, msg, what):
+        xid = txn.datapath.set_xid(msg)
+        txn.xids[xid] = what
+        self.pending[(txn.datapath.id, xid)] = txn
+        return xid
+
+    def _send_bundle(self, txn):
+        datapath = txn.datapath
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        txn.mode = 'bundle'
+
+        # OpenFlow 1.4+ has bundles built in; on OpenFlow 1.3 Open vSwitch supports the same thing as an ONF extension
+        if hasattr(parser, 'OFPBundleCtrlMsg'):
+            ctrl, add = parser.OFPBundleCtrlMsg, parser.OFPBundleAddMsg
+            open_type, commit_type = ofproto.OFPBCT_OPEN_REQUEST, ofproto.OFPBCT_COMMIT_REQUEST
+            flags = ofproto.OFPBF_ATOMIC | ofproto.OFPBF_ORDERED
+        else:
+            ctrl, add = parser.ONFBundleCtrlMsg, parser.ONFBundleAddMsg
+            open_type, commit_type = ofproto.ONF_BCT_OPEN_REQUEST, ofproto.ONF_BCT_COMMIT_REQUEST
+            flags = ofproto.ONF_BF_ATOMIC | ofproto.ONF_BF_ORDERED
+
+        bundle_id = next(self._bundle_ids) & 0xFFFFFFFF
+        messages = [(ctrl(datapath, bundle_id, open_type, flags, []), 'open')]
+        for msg in txn.flow_mods + [txn.delete_old]:
+            messages.append((add(datapath, bundle_id, flags, msg, []), 'add'))
+        messages.append((ctrl(datapath, bundle_id, commit_type, flags, []), 'commit'))
+        messages.append((parser.OFPBarrierRequest(datapath), 'barrier'))
+
+        for msg, what in messages:
+            xid = self._track(txn, msg, what)
+            if what == 'add':
+                msg.message.xid = xid  # The message inside a bundle has to carry the same xid as the bundle add
+            datapath.send_msg(msg)
+
+    def _send_make_before_break(self, txn):
+        datapath = txn.datapath
+        parser = datapath.ofproto_parser
+        txn.mode = 'make-before-break'
+
+        # The switch finishes everything before a barrier before it starts on anything after it, so the old flows are
+        # only deleted once every new one is in
+        messages = [(msg, 'flow') for msg in txn.flow_mods]
+        messages.append((parser.OFPBarrierRequest(datapath), 'make'))
+        messages.append((txn.delete_old, 'break'))
+        messages.append((parser.OFPBarrierRequest(datapath), 'barrier'))
+
+        for msg, what in messages:
+            msg.xid = None  # (they may have been sent inside a rejected bundle already)
+            self._track(txn, msg, what)
+            datapath.send_msg(msg)
+
+    def barrier_reply(self, ev):
+        """Call from an EventOFPBarrierReply handler."""
+        msg = ev.msg
+        txn = self.pending.get((msg.datapath.id, msg.xid))
+        if txn is None or txn.xids.get(msg.xid) != 'barrier':
+            return
+        self._finish(txn)
+
+    def error(self, ev):
+        """Call from an EventOFPErrorMsg handler. Returns whether the error was about a transaction's message."""
+        msg = ev.msg
+        txn = self.pending.get((msg.datapath.id, msg.xid))
+        if txn is None:
+            return False
+        if txn.done:
+            return True
+        what = txn.xids.get(msg.xid)
+
+        if txn.mode == 'bundle' and what == 'open' and msg.datapath.id not in self.bundles:
+            # The switch doesn't do bundles: it will reject the rest of this one too, so nothing was applied
+            self.app.logger.info("Switch %s doesn't support bundles, using make-before-break instead", msg.datapath.id)
+            self.bundles[msg.datapath.id] = False
+            self._forget(txn)
+            txn.xids = {}
+            self._send_make_before_break(txn)
+            return True
+
+        if txn.error is None:
+            txn.error = msg
+            self.app.logger.warning("Switch %s rejected part of the '%s' transaction (%s): error type %s, code %s%s",
+                                    msg.datapath.id, txn.feature, what, msg.type, msg.code,
+                                    ", nothing was changed" if txn.mode == 'bundle' else "")
+        return True
+
+    def _forget(self, txn):
+        for xid in txn.xids:
+            self.pending.pop((txn.datapath.id, xid), None)
+
+    def _finish(self, txn):
+        dpid = txn.datapath.id
+        self._forget(txn)
+        txn.done = True
+        if txn.mode == 'bundle' and txn.error is None:
+            self.bundles[dpid] = True
+        if txn.error is None or txn.mode != 'bundle':
+            # (make-before-break can't be undone halfway, so the new generation is what's on the switch either way)
+            self.generations[(dpid, txn.feature)] = txn.generation
+
+        # What switch_features_handler sent this switch is out of date now
+        flow_cache = getattr(self.app, 'flow_cache', None)
+        if flow_cache is not None:
+            flow_cache.invalidate(dpid)
+
+        self.app.logger.info("Switch %s: '%s' swapped to generation %s (%s, %d flow(s))%s", dpid, txn.feature,
+                             txn.generation, txn.mode, len(txn.flow_mods), " with errors" if txn.error else "")
@@ -0,0 +1,242 @@
+import copy
+import importlib.util
+import inspect
+import os
+import py_compile
+import sys
+import time
+import traceback
+
+from ryu.base import app_manager
+from ryu.controller import ofp_event
+from ryu.controller.handler import MAIN_DISPATCHER, CONFIG_DISPATCHER, DEAD_DISPATCHER, set_ev_cls
+from ryu.lib import hub
+
+from ryu_flow_reconcile import FlowReconciler
+
+# RyuApp's own machinery (event queue, threads, handlers...): never copied into the scratch app, see _scratch_app()
+_SHARED_ATTRIBUTES = ('name', 'event_handlers', 'observers', 'threads', 'main_thread', 'events', '_events_sem',
+                      'logger', 'CONF')
+
+
+class _RecordingDatapath(object):
+    """
+    Stands in for a real datapath while a switch_features_handler runs, so we can see which messages it
+    *would* send without sending any of them.
+    """
+
+    def __init__(self, datapath):
+        self._datapath = datapath
+        self.sent = []
+
+    def __getattr__(self, name):
+        return getattr(self._datapath, name)
+
+    def send_msg(self, msg, close_socket=False):
+        self.sent.append(msg)
+        return True
+
+
+def _scratch_app(app, cls):
+    """
+    A throwaway copy of a running app, as an instance of cls, to run a handler on without touching the real app:
+    every attribute is deep-copied (with references back to the app, e.g. in FastFailoverManager, pointing at the copy
+    instead). Anything that can't be copied (locks, sockets...) is shared.
+    """
+    scratch = cls.__new__(cls)
+    memo = {id(app): scratch}
+    for name, value in vars(app).items():
+        if name not in _SHARED_ATTRIBUTES:
+            try:
+                value = copy.deepcopy(value, memo)
+            except Exception:
+                pass
+        scratch.__dict__[name] = value
+    return scratch
+
+
+class HotReloadApp(app_manager.RyuApp):
+    """
+    Development helper: reloads workspace Ryu apps in place when their file changes, without dropping any switch.
+
+    Started by 'ryuctl --dev', which lists the selected scripts in RYU_HOT_RELOAD_FILES (separated by ':').
+    When one of them is saved:
+    1. The file is compiled and executed as a fresh module (a syntax error just gets logged, the old code keeps running).
+    2. The running app keeps its state (everything set in __init__), but its class and event handlers are swapped for the new ones.
+       If the new class defines on_hot_reload(self, old_class), it is called afterwards to migrate state.
+    3. The new switch_features_handler is run for every connected switch, on a throwaway copy of the app and without
+       sending anything. What it would send is then reconciled against what each switch actually has (a flow stats
+       snapshot, see ryu_flow_reconcile.py): missing or changed flows are added, groups/meters are modified in place,
+       and flows it no longer installs are deleted, but only from the features (cookie tags) the new handler still
+       sends flows for. Flows the app installed from packet-ins, flows added by hand and other apps' flows are left
+       alone. (If you remove a whole feature from the handler, its flows stay too: delete them in on_hot_reload with
+       self.flow_cookies.delete_flows(datapath, feature=...).)
+    Anything the new handler would set up in the app's state (e.g. FastFailoverManager's groups) isn't kept, because it
+    ran on a copy: do that in on_hot_reload if the new code needs it.
+    """
+
+    OFP_VERSIONS = None  # Works with whatever OpenFlow version the other apps use
+
+    def __init__(self, *args, **kwargs):
+        super(HotReloadApp, self).__init__(*args, **kwargs)
+        self.watch_files = [os.path.realpath(path)
+                            for path in os.environ.get('RYU_HOT_RELOAD_FILES', '').split(':') if path]
+        self.interval = float(os.environ.get('RYU_HOT_RELOAD_INTERVAL', '0.5'))
+        self.mtimes = {}
+        self.datapaths = {}  # dpid -> datapath, for every switch that is currently connected
+        self.features = {}   # dpid -> the switch's last EventOFPSwitchFeatures message
+
+        # Used for apps that don't have a flow_reconciler of their own (TemplateBaseApp gives every template one)
+        self.flow_reconciler = FlowReconciler(self)
+
+    def start(self):
+        thread = super(HotReloadApp, self).start()
+        for path in self.watch_files:
+            self.mtimes[path] = self._mtime(path)
+        self.threads.append(hub.spawn(self._watch_loop))
+        self.logger.info("Hot reload watching: %s", ', '.join(self.watch_files) or '(nothing)')
+        return thread
+
+    @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
+    def _remember_features(self, ev):
+        self.features[ev.msg.datapath.id] = ev.msg
+
+    @set_ev_cls(ofp_event.EventOFPStateChange, [MAIN_DISPATCHER, DEAD_DISPATCHER])
+    def _track_datapaths(self, ev):
+        datapath = ev.datapath
+        if ev.state == MAIN_DISPATCHER:
+            self.datapaths[datapath.id] = datapath
+        elif datapath.id in self.datapaths:
+            del self.datapaths[datapath.id]
+
+    @set_ev_cls([ofp_event.EventOFPFlowStatsReply, ofp_event.EventOFPGroupDescStatsReply,
+                 ofp_event.EventOFPMeterConfigStatsReply], MAIN_DISPATCHER)
+    def _reconcile_stats_reply(self, ev):
+        self.flow_reconciler.stats_reply(ev)
+
+    @set_ev_cls(ofp_event.EventOFPErrorMsg, MAIN_DISPATCHER)
+    def _reconcile_error(self, ev):
+        self.flow_reconciler.error(ev)
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _watch_loop(self):
+        while self.is_active:
+            hub.sleep(self.interval)
+            for path in self.watch_files:
+                mtime = self._mtime(path)
+                if mtime is not None and mtime != self.mtimes.get(path):
+                    self.mtimes[path] = mtime
+                    try:
+                        self.reload_file(path)
+                    except Exception:
+                        self.logger.error("Hot reload of %s failed, the old code is still running:\n%s",
+                                          path, traceback.format_exc())
+
+    def _apps_from_file(self, path):
+        """Every running app whose class was defined in this file."""
+        apps = []
+        for app in list(app_manager.SERVICE_BRICKS.values()):
+            module = sys.modules.get(type(app).__module__)
+            module_file = getattr(module, '__file__', None)
+            if module_file and os.path.realpath(module_file) == path:
+                apps.append(app)
+        return apps
+
+    def reload_file(self, path):
+        started = time.monotonic()
+        apps = self._apps_from_file(path)
+        if not apps:
+            self.logger.warning("%s changed, but no running app was loaded from it", path)
+            return
+
+        # Compile first: it's cheap, and a half-typed file shouldn't get any further than this
+        py_compile.compile(path, doraise=True)
+
+        module_name = type(apps[0]).__module__
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.path.insert(0, os.path.dirname(path))
+        try:
+            spec.loader.exec_module(module)
+        finally:
+            sys.path.remove(os.path.dirname(path))
+
+        for app in apps:
+            new_class = getattr(module, type(app).__name__, None)
+            if new_class is None:
+                self.logger.warning("%s no longer defines %s, leaving it as it was", path, type(app).__name__)
+                continue
+            self._reload_app(app, new_class)
+
+        sys.modules[module_name] = module
+        self.logger.info("Hot reloaded %s in %.0f ms", os.path.basename(path), (time.monotonic() - started) * 1000)
+
+    def _intended_messages(self, scratch, datapath):
+        """Runs the scratch app's switch_features_handler for this switch with nothing actually sent, and returns what it tried to send."""
+        handler = getattr(type(scratch), 'switch_features_handler', None)
+        # The handler itself, not the reconnect cache around it (see ryu_flow_cache.py): that would replay saved bytes
+        # straight to the real switch instead of showing us what the handler sends now
+        handler = getattr(handler, '__wrapped__', handler)
+        features = self.features.get(datapath.id)
+        if handler is None or features is None:
+            return []
+        recorder = _RecordingDatapath(datapath)
+        msg = copy.copy(features)
+        msg.datapath = recorder
+        handler(scratch, ofp_event.EventOFPSwitchFeatures(msg))
+        for sent in recorder.sent:
+            sent.datapath = datapath  # They go to the real switch from here on
+            sent.xid = None
+        return recorder.sent
+
+    def _reload_app(self, app, new_class):
+        old_class = type(app)
+
+        # Work out the new rules before touching anything, so a crash in the new handler changes nothing.
+        # The handler runs on a copy of the app, so its side effects (e.g. registering groups) don't happen twice.
+        scratch = _scratch_app(app, new_class)
+        new_sent = {}
+        for dpid, datapath in list(self.datapaths.items()):
+            new_sent[dpid] = self._intended_messages(scratch, datapath)
+
+        self._swap_class(app, new_class)
+        flow_cache = getattr(app, 'flow_cache', None)
+        if flow_cache is not None:
+            flow_cache.invalidate()  # Saved messages are for the old code (the cache also notices the class change)
+        if hasattr(app, 'on_hot_reload'):
+            app.on_hot_reload(old_class)
+
+        # The app's own reconciler if it has one (it tags flows the same way the app's first connect did). It only
+        # deletes flows of the features these messages belong to, so the app's packet-in flows survive every save.
+        reconciler = getattr(app, 'flow_reconciler', None) or self.flow_reconciler
+        for dpid, datapath in list(self.datapaths.items()):
+            self.logger.info("%s on switch %s: reconciling %d message(s) with the switch's flows",
+                             app.name, dpid, len(new_sent[dpid]))
+            reconciler.apply(datapath, new_sent[dpid])
+
+    def _swap_class(self, app, new_class):
+        # Fresh lists rather than editing the old ones in place, in case the app's event loop is part way through one
+        for ev_cls, handlers in list(app.event_handlers.items()):
+            remaining = [h for h in handlers if getattr(h, '__self__', None) is not app]
+            if remaining:
+                app.event_handlers[ev_cls] = remaining
+            else:
+                del app.event_handlers[ev_cls]
+
+        app.__class__ = new_class
+        app_manager.register_instance(app)
+
+        # Make sure the app also receives any event types the new code handles that the old code didn't
+        for _name, method in inspect.getmembers(app, inspect.ismethod):
+            for ev_cls, caller in getattr(method, 'callers', {}).items():
+                if not caller.ev_source:
+                    continue
+                brick = app_manager.lookup_service_brick(caller.ev_source.split('.')[-1])
+                if brick:
+                    brick.register_observer(ev_cls, app.name, caller.dispatchers)
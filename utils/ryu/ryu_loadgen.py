@@ -0,0 +1,469 @@
+import argparse
+import asyncio
+import json
+import random
+import struct
+import time
+
+from ryu_maze import PING_MAP
+
+# ╔══════════════════════════════════════════════╗
+# ║        SYNTHETIC OPENFLOW SWITCH LOAD        ║
+# ╚══════════════════════════════════════════════╝
+# Pretends to be hundreds or thousands of OpenFlow 1.3 switches connected to ryu-manager, without Mininet or Open vSwitch:
+# 1. Every pretend switch connects to the controller (port 6633) and does the usual handshake: HELLO, FEATURES,
+#    port descriptions, and answers echo/barrier/stats requests like a real switch would.
+# 2. Each one then sends packet-ins at a set rate, with a mix of ARP requests, pings to the maze IPs (1.1.1.1 - 4.4.4.4)
+#    and TCP connections to the 10.0.0.100 VIP.
+# 3. It measures how long the controller takes to answer a packet-in with a FlowMod or a PacketOut, and how many
+#    packet-ins per second it keeps up with.
+#
+# It only needs Python 3 (no Ryu), so it can run on another machine than the controller:
+#   ryu-manager week_13_lecture_controller.py
+#   python3 ryu_loadgen.py --switches 1000 --rate 5 --mix arp=1,icmp=2,vip=1 --duration 30
+#
+# The pretend switches have no flow tables: a FlowMod is only counted, so the same packet-ins keep coming.
+# Each packet-in gets its own buffer_id, so an answer that refers to it is matched exactly. Answers without a buffer_id
+# (OFP_NO_BUFFER) are matched to the oldest unanswered packet-in of that switch.
+# Thousands of connections need as many open files: the soft limit is raised to the hard one (see 'ulimit -n').
+
+OFP_VERSION = 0x04  # OpenFlow 1.3
+OFP_NO_BUFFER = 0xFFFFFFFF
+
+# Message types (OpenFlow 1.3 spec, section 7.1)
+OFPT_HELLO = 0
+OFPT_ERROR = 1
+OFPT_ECHO_REQUEST = 2
+OFPT_ECHO_REPLY = 3
+OFPT_EXPERIMENTER = 4
+OFPT_FEATURES_REQUEST = 5
+OFPT_FEATURES_REPLY = 6
+OFPT_GET_CONFIG_REQUEST = 7
+OFPT_GET_CONFIG_REPLY = 8
+OFPT_PACKET_IN = 10
+OFPT_PACKET_OUT = 13
+OFPT_FLOW_MOD = 14
+OFPT_MULTIPART_REQUEST = 18
+OFPT_MULTIPART_REPLY = 19
+OFPT_BARRIER_REQUEST = 20
+OFPT_BARRIER_REPLY = 21
+OFPT_QUEUE_GET_CONFIG_REQUEST = 22
+OFPT_QUEUE_GET_CONFIG_REPLY = 23
+OFPT_ROLE_REQUEST = 24
+OFPT_ROLE_REPLY = 25
+OFPT_GET_ASYNC_REQUEST = 26
+OFPT_GET_ASYNC_REPLY = 27
+
+OFPMP_DESC = 0
+OFPMP_PORT_DESC = 13
+
+OFPET_BAD_REQUEST = 1
+OFPBRC_BAD_EXPERIMENTER = 3
+
+HEADER = struct.Struct('!BBHI')  # version, type, length, xid
+
+DEFAULT_MIX = 'arp=1,icmp=2,vip=1'
+VIP = '10.0.0.100'
+
+
+# ─── Packets ───────────────────────────────────────────────────────────────────
+
+def mac_bytes(n):
+    return bytes([0x00, 0x00, 0x00, 0x00, (n >> 8) & 0xFF, n & 0xFF])
+
+
+def ip_bytes(ip):
+    return bytes(int(part) for part in ip.split('.'))
+
+
+def checksum(data):
+    """The Internet checksum (IPv4, ICMP and TCP headers all use it)."""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def ipv4_packet(src, dst, proto, payload, ident=0):
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(payload), ident, 0, 64, proto, 0, ip_bytes(src), ip_bytes(dst))
+    return header[:10] + struct.pack('!H', checksum(header)) + header[12:] + payload
+
+
+def arp_frame(src_mac, src_ip, dst_ip):
+    """An ARP request: who has dst_ip?"""
+    arp = struct.pack('!HHBBH6s4s6s4s', 1, 0x0800, 6, 4, 1, src_mac, ip_bytes(src_ip), b'\x00' * 6, ip_bytes(dst_ip))
+    return b'\xff' * 6 + src_mac + struct.pack('!H', 0x0806) + arp
+
+
+def icmp_frame(src_mac, dst_mac, src_ip, dst_ip, seq):
+    """A ping (ICMP echo request) with 32 bytes of data."""
+    body = struct.pack('!HH', 0x1234, seq & 0xFFFF) + bytes(range(32))
+    icmp = struct.pack('!BBH', 8, 0, 0) + body
+    icmp = icmp[:2] + struct.pack('!H', checksum(icmp)) + icmp[4:]
+    return dst_mac + src_mac + struct.pack('!H', 0x0800) + ipv4_packet(src_ip, dst_ip, 1, icmp, seq)
+
+
+def tcp_syn_frame(src_mac, dst_mac, src_ip, dst_ip, src_port, dst_port=80):
+    """The first packet of a TCP connection (SYN)."""
+    tcp = struct.pack('!HHIIBBHHH', src_port, dst_port, random.getrandbits(32), 0, 5 << 4, 0x02, 64240, 0, 0)
+    pseudo = ip_bytes(src_ip) + ip_bytes(dst_ip) + struct.pack('!BBH', 0, 6, len(tcp))
+    tcp = tcp[:16] + struct.pack('!H', checksum(pseudo + tcp)) + tcp[18:]
+    return dst_mac + src_mac + struct.pack('!H', 0x0800) + ipv4_packet(src_ip, dst_ip, 6, tcp)
+
+
+def make_frames(kind, hosts, count=64):
+    """A pool of different packets of one kind, made once and reused (building them per packet-in would be the bottleneck)."""
+    frames = []
+    gateway_mac = mac_bytes(0xFFFE)
+    for i in range(count):
+        host_index = i % len(hosts)
+        src_ip, src_mac = hosts[host_index], mac_bytes(host_index + 1)
+        if kind == 'arp':
+            others = [ip for ip in hosts if ip != src_ip] or [VIP]
+            frames.append(arp_frame(src_mac, src_ip, others[i % len(others)]))
+        elif kind == 'icmp':
+            maze_ips = sorted(PING_MAP)
+            frames.append(icmp_frame(src_mac, gateway_mac, src_ip, maze_ips[i % len(maze_ips)], i))
+        elif kind == 'vip':
+            frames.append(tcp_syn_frame(src_mac, gateway_mac, src_ip, VIP, 40000 + i))
+        else:
+            raise ValueError(f"Unknown packet kind '{kind}' (use arp, icmp or vip)")
+    return frames
+
+
+def parse_mix(text):
+    """'arp=1,icmp=2,vip=1' -> {'arp': 1.0, 'icmp': 2.0, 'vip': 1.0}"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+# ─── Results ───────────────────────────────────────────────────────────────────
+
+def percentile(values, pct):
+    """Linear-interpolated percentile (0-100) of a list of numbers."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarise(values):
+    """Count, mean and p50/p90/p99/max of a list of samples (in ms)."""
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p90': percentile(values, 90),
+        'p99': percentile(values, 99),
+        'max': max(values),
+    }
+
+
+class LoadStats:
+    """Everything the pretend switches measured, added up over all of them."""
+
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.handshake_ms = []
+        self.packet_ins = 0
+        self.flow_mods = 0
+        self.packet_outs = 0
+        self.other_flow_mods = 0  # FlowMods that weren't answering a packet-in (e.g. installed on connect)
+        self.latency_ms = {'flow_mod': [], 'packet_out': []}
+        self.unanswered = 0
+        self.started = None
+        self.stopped = None
+        self.stop_at = None
+        # Set once every switch has been started: only then do they send packet-ins, so everything counted (and every
+        # latency sample) falls between started and stop_at, the window the rates are worked out over
+        self.go = asyncio.Event()
+
+    def report(self):
+        seconds = max((self.stopped or time.perf_counter()) - (self.started or time.perf_counter()), 1e-9)
+        return {
+            'switches': {'connected': self.connected, 'failed': self.failed},
+            'handshake_ms': summarise(self.handshake_ms),
+            'seconds': seconds,
+            'packet_ins': self.packet_ins,
+            'packet_ins_per_second': self.packet_ins / seconds,
+            'flow_mods': self.flow_mods,
+            'flow_mods_per_second': self.flow_mods / seconds,
+            'packet_outs': self.packet_outs,
+            'packet_outs_per_second': self.packet_outs / seconds,
+            'other_flow_mods': self.other_flow_mods,
+            'unanswered': self.unanswered,
+            'latency_ms': {kind: summarise(values) for kind, values in self.latency_ms.items()},
+        }
+
+
+def print_report(report):
+    switches = report['switches']
+    handshake = report['handshake_ms']
+    print(f"Switches: {switches['connected']} connected, {switches['failed']} failed", end='')
+    if handshake['count']:
+        print(f" (handshake p50 {handshake['p50']:.1f} ms, p99 {handshake['p99']:.1f} ms)")
+    else:
+        print()
+    print(f"Over {report['seconds']:.1f} s:")
+    print(f"  packet-ins sent    {report['packet_ins']:>10}  ({report['packet_ins_per_second']:.0f}/s)")
+    print(f"  FlowMods received  {report['flow_mods']:>10}  ({report['flow_mods_per_second']:.0f}/s)"
+          f", plus {report['other_flow_mods']} not answering a packet-in")
+    print(f"  PacketOuts received{report['packet_outs']:>10}  ({report['packet_outs_per_second']:.0f}/s)")
+    print(f"  unanswered         {report['unanswered']:>10}")
+    print()
+    print(f"  {'Response latency (ms)':<26}{'count':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for kind, label in (('flow_mod', 'packet-in -> FlowMod'), ('packet_out', 'packet-in -> PacketOut')):
+        stats = report['latency_ms'][kind]
+        if not stats['count']:
+            print(f"  {label:<26}{0:>8}")
+            continue
+        print(f"  {label:<26}{stats['count']:>8}" + ''.join(f"{stats[key]:>9.2f}" for key in ('mean', 'p50', 'p90', 'p99', 'max')))
+
+
+# ─── Pretend switch ────────────────────────────────────────────────────────────
+
+class PretendSwitch:
+    """One OpenFlow 1.3 connection to the controller, behaving just enough like a switch for Ryu to use it."""
+
+    def __init__(self, dpid, args, frames, weights, stats):
+        self.dpid = dpid
+        self.args = args
+        self.frames = frames
+        self.weights = weights
+        self.stats = stats
+        self.writer = None
+        self.xid = 0
+        self.next_buffer_id = 0
+        self.outstanding = {}  # buffer_id -> time the packet-in was sent (insertion order = oldest first)
+        self.flow_mod_seen = set()  # buffer_ids already answered with a FlowMod (a PacketOut may still follow)
+        self.ready = asyncio.Event()
+        self.random = random.Random(dpid)
+
+    def send(self, msg_type, body=b'', xid=None):
+        if xid is None:
+            self.xid = (self.xid + 1) & 0xFFFFFFFF
+            xid = self.xid
+        self.writer.write(HEADER.pack(OFP_VERSION, msg_type, HEADER.size + len(body), xid) + body)
+
+    async def run(self, host, port):
+        connect_started = time.perf_counter()
+        try:
+            reader, self.writer = await asyncio.wait_for(asyncio.open_connection(host, port), self.args.timeout)
+        except (OSError, asyncio.TimeoutError):
+            self.stats.failed += 1
+            return
+        self.stats.connected += 1
+        self.send(OFPT_HELLO)
+
+        sender = asyncio.ensure_future(self.send_packet_ins())
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                _version, msg_type, length, xid = HEADER.unpack(header)
+                body = await reader.readexactly(length - HEADER.size)
+                self.handle(msg_type, xid, header + body, connect_started)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            sender.cancel()
+            self.stats.unanswered += len(self.outstanding)
+            self.outstanding.clear()
+            self.writer.close()
+
+    def handle(self, msg_type, xid, msg, connect_started):
+        if msg_type == OFPT_PACKET_OUT:
+            buffer_id, = struct.unpack_from('!I', msg, 8)
+            self.answered(buffer_id, 'packet_out', done=True)
+        elif msg_type == OFPT_FLOW_MOD:
+            buffer_id, = struct.unpack_from('!I', msg, 32)
+            # A FlowMod with the buffer_id also sends the packet on, so nothing else will follow for it
+            self.answered(buffer_id, 'flow_mod', done=buffer_id != OFP_NO_BUFFER)
+        elif msg_type == OFPT_ECHO_REQUEST:
+            self.send(OFPT_ECHO_REPLY, msg[HEADER.size:], xid)
+        elif msg_type == OFPT_FEATURES_REQUEST:
+            self.send(OFPT_FEATURES_REPLY, struct.pack('!QIBB2xII', self.dpid, self.args.buffers, 254, 0, 0x4F, 0), xid)
+            self.stats.handshake_ms.append((time.perf_counter() - connect_started) * 1000)
+        elif msg_type == OFPT_MULTIPART_REQUEST:
+            self.send(OFPT_MULTIPART_REPLY, self.multipart_reply(msg), xid)
+        elif msg_type == OFPT_BARRIER_REQUEST:
+            self.send(OFPT_BARRIER_REPLY, b'', xid)
+        elif msg_type == OFPT_GET_CONFIG_REQUEST:
+            self.send(OFPT_GET_CONFIG_REPLY, struct.pack('!HH', 0, 128), xid)
+        elif msg_type == OFPT_ROLE_REQUEST:
+            self.send(OFPT_ROLE_REPLY, msg[HEADER.size:], xid)
+        elif msg_type == OFPT_GET_ASYNC_REQUEST:
+            self.send(OFPT_GET_ASYNC_REPLY, b'\x00' * 24, xid)
+        elif msg_type == OFPT_QUEUE_GET_CONFIG_REQUEST:
+            self.send(OFPT_QUEUE_GET_CONFIG_REPLY, msg[HEADER.size:HEADER.size + 4] + b'\x00' * 4, xid)
+        elif msg_type == OFPT_EXPERIMENTER:
+            # No extensions here (e.g. bundles): say so, like a switch without them would
+            self.send(OFPT_ERROR, struct.pack('!HH', OFPET_BAD_REQUEST, OFPBRC_BAD_EXPERIMENTER) + msg[:64], xid)
+        # Everything else (SET_CONFIG, GROUP_MOD, METER_MOD, PORT_MOD...) needs no answer
+
+    def multipart_reply(self, msg):
+        mp_type, = struct.unpack_from('!H', msg, HEADER.size)
+        body = b''
+        if mp_type == OFPMP_DESC:
+            body = struct.pack('!256s256s256s32s256s', b'sdn-env-scripts', b'ryu_loadgen pretend switch', b'1.0',
+                               b'%d' % self.dpid, b'')
+        elif mp_type == OFPMP_PORT_DESC:
+            for port_no in range(1, self.args.ports + 1):
+                body += struct.pack('!I4x6s2x16sIIIIIIII', port_no, mac_bytes((self.dpid << 4 | port_no) & 0xFFFF),
+                                    b's%d-eth%d' % (self.dpid, port_no), 0, 4, 0x840, 0, 0, 0, 10000000, 10000000)
+            # Ryu moves a switch to MAIN_DISPATCHER (where packet-in handlers run) once it has the port descriptions
+            self.ready.set()
+        # Anything else (flow/group/meter stats...): an empty table
+        return struct.pack('!HH4x', mp_type, 0) + body
+
+    def answered(self, buffer_id, kind, done):
+        if buffer_id == OFP_NO_BUFFER:
+            # Doesn't say which packet-in it's for: take the oldest one that hasn't had this kind of answer yet
+            buffer_id = next((b for b in self.outstanding if kind != 'flow_mod' or b not in self.flow_mod_seen), None)
+        sent = self.outstanding.get(buffer_id)
+        if sent is None:
+            if kind == 'flow_mod':
+                self.stats.other_flow_mods += 1
+            return
+        if kind == 'flow_mod':
+            self.stats.flow_mods += 1
+            if buffer_id in self.flow_mod_seen:
+                return
+            self.flow_mod_seen.add(buffer_id)
+        else:
+            self.stats.packet_outs += 1
+        self.stats.latency_ms[kind].append((time.perf_counter() - sent) * 1000)
+        if done:
+            del self.outstanding[buffer_id]
+            self.flow_mod_seen.discard(buffer_id)
+
+    def packet_in(self, frame, in_port):
+        if self.args.no_buffer:
+            buffer_id = OFP_NO_BUFFER
+            key = self.next_buffer_id = (self.next_buffer_id + 1) & 0x7FFFFFFF
+        else:
+            buffer_id = key = self.next_buffer_id = (self.next_buffer_id + 1) & 0x7FFFFFFF
+        # Match: OXM type, length 12, one field (in_port), padded to 8 bytes; then 2 bytes of padding before the packet
+        match = struct.pack('!HHII4x', 1, 12, 0x80000004, in_port)
+        body = struct.pack('!IHBBQ', buffer_id, len(frame), 0, 0, 0) + match + b'\x00\x00' + frame
+        self.send(OFPT_PACKET_IN, body)
+        self.outstanding[key] = time.perf_counter()
+        self.stats.packet_ins += 1
+
+    async def send_packet_ins(self):
+        try:
+            await asyncio.wait_for(self.ready.wait(), self.args.timeout)
+        except asyncio.TimeoutError:
+            pass  # Never asked for port descriptions: send anyway
+        await self.stats.go.wait()
+        stop_at = self.stats.stop_at
+
+        rate = self.args.rate
+        kinds = list(self.weights)
+        weights = [self.weights[kind] for kind in kinds]
+        # Start each switch at a random point in its interval, so they don't all send at the same moment
+        next_at = time.perf_counter() + self.random.random() / rate
+        while next_at < stop_at:
+            now = time.perf_counter()
+            if next_at > now:
+                await asyncio.sleep(next_at - now)
+            # If we fell behind (e.g. a slow event loop), catch up rather than silently lowering the rate
+            while next_at <= time.perf_counter() and next_at < stop_at:
+                kind = self.random.choices(kinds, weights)[0]
+                self.packet_in(self.random.choice(self.frames[kind]), self.random.randint(1, self.args.ports))
+                next_at += 1.0 / rate
+            self.expire()
+            await self.writer.drain()
+
+    def expire(self):
+        """Gives up on packet-ins that have waited longer than the timeout."""
+        limit = time.perf_counter() - self.args.timeout
+        while self.outstanding:
+            buffer_id = next(iter(self.outstanding))
+            if self.outstanding[buffer_id] > limit:
+                break
+            del self.outstanding[buffer_id]
+            self.flow_mod_seen.discard(buffer_id)
+            self.stats.unanswered += 1
+
+
+def raise_file_limit(needed):
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard == resource.RLIM_INFINITY else min(hard, needed), hard))
+
+
+async def run_load(args):
+    weights = {kind: weight for kind, weight in parse_mix(args.mix).items() if weight > 0}
+    hosts = args.hosts.split(',')
+    frames = {kind: make_frames(kind, hosts) for kind in weights}
+    stats = LoadStats()
+
+    # Connect gradually: thousands of connections at once would overflow ryu-manager's listen backlog
+    sessions = []
+    for i in range(args.switches):
+        switch = PretendSwitch(args.first_dpid + i, args, frames, weights, stats)
+        sessions.append(asyncio.ensure_future(switch.run(args.controller, args.port)))
+        await asyncio.sleep(1.0 / args.connect_rate)
+
+    # Switches that connected early wait here, so the load (and the measuring) starts for all of them at once
+    stats.started = time.perf_counter()
+    stats.stop_at = stats.started + args.duration
+    stats.go.set()
+
+    await asyncio.sleep(max(0.0, stats.stop_at - time.perf_counter()))
+    # Give the last answers a moment to arrive, then hang up
+    await asyncio.sleep(min(args.timeout, 1.0))
+    stats.stopped = stats.stop_at
+    for session in sessions:
+        session.cancel()
+    await asyncio.gather(*sessions, return_exceptions=True)
+    return stats.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a Ryu controller with pretend OpenFlow 1.3 switches.")
+    parser.add_argument('--controller', default='127.0.0.1', help="Address ryu-manager listens on")
+    parser.add_argument('--port', type=int, default=6633)
+    parser.add_argument('--switches', type=int, default=100, help="How many switches to pretend to be (default: 100)")
+    parser.add_argument('--first-dpid', type=int, default=1)
+    parser.add_argument('--ports', type=int, default=4, help="Ports per switch (packet-ins come in on a random one)")
+    parser.add_argument('--rate', type=float, default=10, help="Packet-ins per second, per switch (default: 10)")
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"Weights of each kind of packet: arp, icmp (to the maze IPs), vip (TCP to {VIP}) "
+                             f"(default: {DEFAULT_MIX})")
+    parser.add_argument('--hosts', default='10.0.0.1,10.0.0.2,10.0.0.3,10.0.0.4', help="Source IPs of the packets")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of load, once every switch has connected")
+    parser.add_argument('--connect-rate', type=float, default=200, help="New connections per second (default: 200)")
+    parser.add_argument('--buffers', type=int, default=256, help="n_buffers the switches report (default: 256)")
+    parser.add_argument('--no-buffer', action='store_true', help="Send packet-ins without a buffer_id (the whole packet)")
+    parser.add_argument('--timeout', type=float, default=5, help="Seconds before a packet-in counts as unanswered")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    raise_file_limit(args.switches + 64)
+    report = asyncio.run(run_load(args))
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
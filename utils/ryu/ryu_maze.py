@@ -1,4 +1,3 @@
-import os
 import time
 import threading
 import queue
@@ -42,6 +41,10 @@ PING_MAP = {
     "4.4.4.4": "↓",
 }
 
+def clear_screen():
+    # Same as the 'clear' command, but without starting a process for it: under Ryu that would pause the whole controller
+    print("\033[H\033[2J", end='', flush=True)
+
 class Maze:
     def __init__(self):
         self.maze = [list(row) for row in MAZE]
@@ -108,7 +111,7 @@ class Maze:
             print(line)
 
     def draw(self):
-        os.system('clear')
+        clear_screen()
         self._print_maze()
         print(f"Pings: {self.pings}  Bumps: {self.bumps}")
         print("Recent Moves (last 5):")
@@ -150,14 +153,14 @@ class Maze:
         for _ in range(2):
             self.draw()
             time.sleep(0.1)
-            os.system('clear')
+            clear_screen()
             self._print_maze(highlight={(bx, by): 'X'})
             time.sleep(0.1)
         self.draw()
 
     def animate_cat_blink(self):
         for f in ('x', ' '):
-            os.system('clear')
+            clear_screen()
             highlights = {
                 (self.cat_x + i, self.cat_y): f
                 for i in range(FACE_WIDTH)
@@ -169,14 +172,14 @@ class Maze:
         self.game_over = True
         self.animate_cat_blink()
         time.sleep(0.2)
-        os.system('clear')
+        clear_screen()
         alive = [" /\\_/\\ ", "( ^.^ )", " > ^ < "]
         dead  = [" /\\_/\\ ", "( x.x )", " >   < "]
         for frame in (alive, dead):
             for line in frame:
                 print(line)
             time.sleep(0.5)
-            os.system('clear')
+            clear_screen()
         for line in dead:
             print(line)
         cp, cb = self.pings, self.bumps
@@ -0,0 +1,214 @@
+import collections
+import json
+import time
+
+from ryu.app.wsgi import ControllerBase, Response, WSGIApplication, route, websocket
+from ryu.base import app_manager
+from ryu.controller import ofp_event
+from ryu.controller.controller import Datapath
+from ryu.controller.handler import MAIN_DISPATCHER, DEAD_DISPATCHER, set_ev_cls
+from ryu.lib import hub
+
+METRICS_APP_NAME = 'metrics_app'
+
+# How often the snapshot is rebuilt (and pushed to the dashboard), and how often switches are asked for flow counts
+SNAPSHOT_INTERVAL = 1.0
+FLOW_COUNT_INTERVAL = 2.0
+
+# Counts every message any app sends, by datapath and message type. Installed once, the first time MetricsApp starts.
+_sent_counts = collections.Counter()
+_original_send_msg = None
+
+
+def _counting_send_msg(self, msg, *args, **kwargs):
+    _sent_counts[(self.id, getattr(msg, 'cls_msg_type', None))] += 1
+    return _original_send_msg(self, msg, *args, **kwargs)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class MetricsApp(app_manager.RyuApp):
+    """
+    Live controller metrics for the dashboard (www/index.html), served by Ryu's own web server (port 8080).
+
+    Add it alongside your own app with 'ryuctl --metrics', or: ryu-manager /opt/utils/ryu/ryu_metrics.py your_app.py
+
+    Once a second it works out, for every connected switch: packet-ins, FlowMods and PacketOuts per second, plus the
+    number of flows installed (asked of the switch every couple of seconds). It also times every packet-in handler of
+    the other running apps, and watches how many events are queued up for each app (if that keeps growing,
+    the controller can't keep up).
+
+    The result is kept as one ready-made snapshot, so however many browsers are watching, the controller does
+    the same small amount of work:
+    - GET /sdnmetrics/stats returns the latest snapshot as JSON
+    - /sdnmetrics/ws is a websocket that receives each new snapshot as it's made
+    """
+
+    _CONTEXTS = {'wsgi': WSGIApplication}
+
+    def __init__(self, *args, **kwargs):
+        super(MetricsApp, self).__init__(*args, **kwargs)
+        self.datapaths = {}
+        self.flow_counts = {}  # dpid -> flow count from the last aggregate stats reply
+        self.packet_ins = collections.Counter()  # dpid -> packet-ins seen
+        self.latencies = collections.defaultdict(list)  # 'App.handler' -> durations (seconds) since the last snapshot
+        self.websockets = []
+        self.snapshot = {'timestamp': time.time(), 'switches': {}, 'handlers': {}, 'queues': {}}
+
+        kwargs['wsgi'].register(MetricsController, {METRICS_APP_NAME: self})
+
+    def start(self):
+        global _original_send_msg
+        thread = super(MetricsApp, self).start()
+        if _original_send_msg is None:
+            _original_send_msg = Datapath.send_msg
+            Datapath.send_msg = _counting_send_msg
+        self.threads.append(hub.spawn(self._snapshot_loop))
+        self.threads.append(hub.spawn(self._flow_count_loop))
+        return thread
+
+    @set_ev_cls(ofp_event.EventOFPStateChange, [MAIN_DISPATCHER, DEAD_DISPATCHER])
+    def _state_change_handler(self, ev):
+        datapath = ev.datapath
+        if ev.state == MAIN_DISPATCHER:
+            self.datapaths[datapath.id] = datapath
+        elif datapath.id in self.datapaths:
+            del self.datapaths[datapath.id]
+            self.flow_counts.pop(datapath.id, None)
+
+    @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    def _packet_in_handler(self, ev):
+        self.packet_ins[ev.msg.datapath.id] += 1
+
+    @set_ev_cls(ofp_event.EventOFPAggregateStatsReply, MAIN_DISPATCHER)
+    def _aggregate_stats_reply_handler(self, ev):
+        self.flow_counts[ev.msg.datapath.id] = ev.msg.body.flow_count
+
+    def _flow_count_loop(self):
+        while self.is_active:
+            for datapath in list(self.datapaths.values()):
+                ofproto = datapath.ofproto
+                parser = datapath.ofproto_parser
+                if ofproto.OFP_VERSION < 0x04:
+                    continue  # The aggregate request below is the OpenFlow 1.3+ one
+                datapath.send_msg(parser.OFPAggregateStatsRequest(
+                    datapath, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY, 0, 0, parser.OFPMatch()))
+            hub.sleep(FLOW_COUNT_INTERVAL)
+
+    def _timed_handler(self, app, handler):
+        key = '%s.%s' % (app.name, handler.__name__)
+        latencies = self.latencies
+
+        def timed_handler(ev):
+            start = time.perf_counter()
+            try:
+                return handler(ev)
+            finally:
+                latencies[key].append(time.perf_counter() - start)
+
+        # Ryu checks 'callers' to decide which dispatcher states a handler runs in, and ryu_hot_reload checks
+        # '__self__' to find an app's handlers, so the wrapper has to look like the method it wraps
+        timed_handler.callers = getattr(handler, 'callers', {})
+        timed_handler.__self__ = app
+        timed_handler.__name__ = handler.__name__
+        timed_handler.metrics_timed = True
+        return timed_handler
+
+    def _wrap_packet_in_handlers(self):
+        """Times the packet-in handlers of every other app. Runs every snapshot, so handlers added later
+        (e.g. by a hot reload) get picked up too."""
+        for app in list(app_manager.SERVICE_BRICKS.values()):
+            if app is self:
+                continue
+            handlers = app.event_handlers.get(ofp_event.EventOFPPacketIn)
+            if handlers and not all(getattr(h, 'metrics_timed', False) for h in handlers):
+                # A new list rather than editing in place, in case the app's event loop is part way through the old one
+                app.event_handlers[ofp_event.EventOFPPacketIn] = [
+                    h if getattr(h, 'metrics_timed', False) else self._timed_handler(app, h) for h in handlers]
+
+    def _snapshot_loop(self):
+        last_time = time.monotonic()
+        last_sent = collections.Counter()
+        last_packet_ins = collections.Counter()
+
+        while self.is_active:
+            hub.sleep(SNAPSHOT_INTERVAL)
+            self._wrap_packet_in_handlers()
+
+            now = time.monotonic()
+            elapsed = max(now - last_time, 1e-6)
+            sent = collections.Counter(_sent_counts)
+            packet_ins = collections.Counter(self.packet_ins)
+
+            switches = {}
+            for dpid, datapath in list(self.datapaths.items()):
+                ofproto = datapath.ofproto
+                flow_mods = sent[(dpid, ofproto.OFPT_FLOW_MOD)] - last_sent[(dpid, ofproto.OFPT_FLOW_MOD)]
+                packet_outs = sent[(dpid, ofproto.OFPT_PACKET_OUT)] - last_sent[(dpid, ofproto.OFPT_PACKET_OUT)]
+                switches[str(dpid)] = {
+                    'packet_in_rate': round((packet_ins[dpid] - last_packet_ins[dpid]) / elapsed, 1),
+                    'flow_mod_rate': round(flow_mods / elapsed, 1),
+                    'packet_out_rate': round(packet_outs / elapsed, 1),
+                    'flow_count': self.flow_counts.get(dpid),
+                }
+
+            handlers = {}
+            latencies, self.latencies = self.latencies, collections.defaultdict(list)
+            for key, durations in latencies.items():
+                durations.sort()
+                handlers[key] = {
+                    'calls_per_second': round(len(durations) / elapsed, 1),
+                    'mean_ms': round(sum(durations) / len(durations) * 1000, 3),
+                    'p99_ms': round(_percentile(durations, 0.99) * 1000, 3),
+                    'max_ms': round(durations[-1] * 1000, 3),
+                }
+
+            self.snapshot = {
+                'timestamp': time.time(),
+                'packet_in_rate': round(sum(s['packet_in_rate'] for s in switches.values()), 1),
+                'flow_mod_rate': round(sum(s['flow_mod_rate'] for s in switches.values()), 1),
+                'packet_out_rate': round(sum(s['packet_out_rate'] for s in switches.values()), 1),
+                'switches': switches,
+                'handlers': handlers,
+                # Events waiting to be handled by each app: a number that keeps growing means it can't keep up
+                'queues': {app.name: app.events.qsize() for app in list(app_manager.SERVICE_BRICKS.values())},
+            }
+            last_time, last_sent, last_packet_ins = now, sent, packet_ins
+            self._push_snapshot()
+
+    def _push_snapshot(self):
+        message = json.dumps(self.snapshot)
+        for ws in list(self.websockets):
+            try:
+                ws.send(message)
+            except Exception:
+                self.websockets.remove(ws)
+
+
+class MetricsController(ControllerBase):
+    """The /sdnmetrics endpoints. Both only ever hand out the snapshot MetricsApp already made."""
+
+    def __init__(self, req, link, data, **config):
+        super(MetricsController, self).__init__(req, link, data, **config)
+        self.metrics_app = data[METRICS_APP_NAME]
+
+    @route('sdnmetrics', '/sdnmetrics/stats', methods=['GET'])
+    def stats(self, req, **kwargs):
+        return Response(content_type='application/json', body=json.dumps(self.metrics_app.snapshot))
+
+    @websocket('sdnmetrics', '/sdnmetrics/ws')
+    def stream(self, ws):
+        app = self.metrics_app
+        app.websockets.append(ws)
+        try:
+            ws.send(json.dumps(app.snapshot))
+            # Nothing is expected from the browser, this just waits until it disconnects
+            while ws.wait() is not None:
+                pass
+        finally:
+            if ws in app.websockets:
+                app.websockets.remove(ws)
@@ -0,0 +1,119 @@
+import collections
+import concurrent.futures
+
+from eventlet import tpool
+from ryu.lib import hub
+
+
+def packet_in_key(msg):
+    """
+    A cheap "which flow is this" key for a packet-in: the switch, in_port and Ethernet addresses, read straight from the
+    raw bytes (no parsing). Packets with the same key are always handled in the order they arrived.
+    """
+    return (msg.datapath.id, msg.match['in_port'], bytes(msg.data[:12]))
+
+
+class PacketInOffloader:
+    """
+    Moves slow packet-in work (parsing, heavy logging, game updates...) off Ryu's event loop.
+
+    Ryu handles every event for every switch one at a time on the same loop, so a handler that takes 50 ms holds up
+    everything else for 50 ms: echo replies, other switches' packet-ins, barrier replies. With this, the handler only
+    queues the work and returns straight away:
+    - work(*args) runs in a worker thread (or process). At most 'workers' run at once.
+    - done(result) is then called back on the event loop, where it is safe to send FlowMods/PacketOuts.
+      If there's no done, work can return a list of messages (e.g. OFPFlowMod, OFPPacketOut) and they are sent for you.
+    - Work with the same key (see packet_in_key) runs in order, one at a time, so a flow's packets are never reordered.
+
+    Don't touch datapaths, self.logger or anything else shared inside work: it isn't running on the event loop.
+    Give it the data it needs (e.g. msg.data) and do the rest in done.
+
+    If more than max_pending pieces of work are queued, new ones are dropped (and counted in self.dropped), the same
+    as a switch dropping packets when it can't keep up, rather than letting the backlog grow forever.
+
+    Example usage (in __init__):
+        self.offload = PacketInOffloader(self, workers=4)
+    In packet_in_handler:
+        msg = ev.msg
+        self.offload.submit(packet_in_key(msg), parse_ipv4, msg.data,
+                            done=lambda ip_pkt: self.handle_ipv4(msg, ip_pkt))
+    """
+
+    def __init__(self, app, workers=4, max_pending=1000, processes=False):
+        """
+        app: The Ryu app, used for its logger.
+        workers: How many pieces of work can run at once.
+        max_pending: How many can be queued (including running ones) before new ones are dropped.
+        processes: Use worker processes instead of threads. Only worth it for pure-Python number crunching (threads take
+                   turns running Python code); work, its arguments and its result must then be picklable, so work has to
+                   be a plain function defined at the top of a file (not a method or lambda).
+        """
+        self.app = app
+        self.max_pending = max_pending
+        self.slots = hub.BoundedSemaphore(workers)
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if processes else None
+        self.queues = {}  # key -> deque of (work, args, done) waiting to run for that key
+        self.pending = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, key, work, *args, done=None):
+        """Queues work(*args) behind any earlier work with the same key. Returns False if it was dropped."""
+        if self.pending >= self.max_pending:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                self.app.logger.warning("Packet-in workers can't keep up, %d piece(s) of work dropped so far", self.dropped)
+            return False
+
+        self.pending += 1
+        queue = self.queues.get(key)
+        if queue is None:
+            # Nothing is running for this key: start a green thread that works through its queue
+            queue = self.queues[key] = collections.deque()
+            queue.append((work, args, done))
+            hub.spawn(self._drain, key, queue)
+        else:
+            queue.append((work, args, done))
+        return True
+
+    def _drain(self, key, queue):
+        while queue:
+            work, args, done = queue[0]
+            try:
+                with self.slots:
+                    result = self._run(work, args)
+            except Exception:
+                self.failed += 1
+                self.app.logger.exception("Offloaded packet-in work %s failed", getattr(work, '__name__', work))
+            else:
+                self._finish(result, done)
+            finally:
+                queue.popleft()
+                self.pending -= 1
+        # Only green threads touch self.queues, and there's no switch between the empty check and this
+        del self.queues[key]
+
+    def _run(self, work, args):
+        if self.executor is None:
+            # A real OS thread: the event loop carries on while it runs
+            return tpool.execute(work, *args)
+
+        future = self.executor.submit(work, *args)
+        # Wait for the process in a tpool thread: the future's own callbacks run on one of the executor's OS threads,
+        # which can't wake a green thread (ryu-manager doesn't patch threading)
+        return tpool.execute(future.result)
+
+    def _finish(self, result, done):
+        try:
+            if done is not None:
+                done(result)
+            else:
+                for msg in result or []:
+                    msg.datapath.send_msg(msg)
+        except Exception:
+            self.failed += 1
+            self.app.logger.exception("Handling the result of offloaded packet-in work failed")
+
+    def stats(self):
+        """Counters for the metrics panel or logs: queued/running work, active keys, drops and failures."""
+        return {'pending': self.pending, 'keys': len(self.queues), 'dropped': self.dropped, 'failed': self.failed}
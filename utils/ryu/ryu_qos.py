@@ -0,0 +1,62 @@
+class QosManager:
+    """
+    Puts traffic classes into switch queues (and optionally rate limits them with meters) using proactive flows.
+
+    Because the flows are installed when the switch connects, no packet ever has to visit the controller to be
+    prioritised. The queues themselves are created on the Mininet side (see mininet_qos.py in utils/mininet);
+    a flow just says which queue a packet joins on its way out.
+
+    Example usage (in __init__):
+        self.qos = QosManager(self)
+    In switch_features_handler (meters before the flows that use them):
+        self.qos.install_meter(datapath, 1, rate_kbps=8000)  # Meter 1: drop anything over 8 Mbit/s
+        match = parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst='10.0.0.2')
+        self.qos.install_class_flow(datapath, 1, match, queue_id=1, actions=[parser.OFPActionOutput(2)])
+    """
+
+    def __init__(self, app):
+        """
+        app: The Ryu app, used for its logger.
+        """
+        self.app = app
+
+    def install_meter(self, datapath, meter_id, rate_kbps, burst_kb=0):
+        """
+        Installs (or replaces) a meter that drops packets above rate_kbps. Flows use it with meter_id in
+        install_class_flow(). Deleting a meter also deletes the flows using it, so install meters first.
+        """
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+
+        flags = ofproto.OFPMF_KBPS
+        if burst_kb:
+            flags |= ofproto.OFPMF_BURST
+        bands = [parser.OFPMeterBandDrop(rate=rate_kbps, burst_size=burst_kb)]
+
+        # Delete first, so a switch that reconnects (and still has the meter from last time) doesn't reject the ADD
+        datapath.send_msg(parser.OFPMeterMod(datapath, ofproto.OFPMC_DELETE, 0, meter_id))
+        datapath.send_msg(parser.OFPMeterMod(datapath, ofproto.OFPMC_ADD, flags, meter_id, bands))
+
+    def install_class_flow(self, datapath, priority, match, queue_id, actions, meter_id=None, table_id=0):
+        """
+        Installs a flow that puts matching packets in a queue before its actions (which should include the output).
+
+        queue_id: Which of the output port's queues to use (as configured with configureQueues() in mininet_qos.py)
+        meter_id: Optionally, a meter from install_meter() to rate limit this class first
+        """
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+
+        instructions = []
+        if meter_id is not None:
+            instructions.append(parser.OFPInstructionMeter(meter_id, ofproto.OFPIT_METER))
+        instructions.append(parser.OFPInstructionActions(
+            ofproto.OFPIT_APPLY_ACTIONS, [parser.OFPActionSetQueue(queue_id)] + list(actions)))
+
+        datapath.send_msg(parser.OFPFlowMod(
+            datapath=datapath,
+            table_id=table_id,
+            priority=priority,
+            match=match,
+            instructions=instructions
+        ))
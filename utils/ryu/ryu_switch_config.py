@@ -0,0 +1,82 @@
+class SwitchBufferConfig:
+    """
+    Decides how much of each packet a switch sends to the controller, and how the packet gets sent back out.
+
+    By default every packet-in carries the whole packet (up to ~64KB) and every PacketOut sends it all back again.
+    Most handlers only look at the headers, so this sends just the first miss_send_len bytes instead:
+    - If the switch can buffer packets (n_buffers > 0 in its features reply), it keeps the full packet and gives us
+      a buffer_id; the PacketOut then only needs that id, not the data.
+    - If it can't (Open vSwitch reports 0 buffers), packets are sent to the controller in full, since otherwise we
+      couldn't send them back out. The exception is headers_only=True, for apps that never send packets back out
+      (e.g. ones that only log them): they get truncated packet-ins regardless.
+
+    Example usage (in __init__):
+        self.switch_config = SwitchBufferConfig()
+    In switch_features_handler:
+        self.switch_config.configure(ev.msg)
+        actions = [self.switch_config.controller_action(datapath)]  # Instead of OFPActionOutput(OFPP_CONTROLLER, ...)
+    And when sending a packet back out from a packet-in:
+        out = self.switch_config.packet_out(ev.msg, actions)
+        if out:
+            datapath.send_msg(out)
+    """
+
+    def __init__(self, miss_send_len=128, headers_only=False):
+        """
+        miss_send_len: How many bytes of each packet to send to the controller. 128 covers Ethernet + VLAN + IPv4/IPv6 +
+                       TCP/UDP headers with room to spare.
+        headers_only: Truncate packet-ins even on switches without buffers. Only for apps that never do a PacketOut.
+        """
+        self.miss_send_len = miss_send_len
+        self.headers_only = headers_only
+        self.n_buffers = {}  # dpid -> how many packets the switch can buffer
+
+    def configure(self, features_msg):
+        """Call from switch_features_handler with ev.msg. Remembers the switch's buffers and sends it an OFPSetConfig."""
+        datapath = features_msg.datapath
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+
+        self.n_buffers[datapath.id] = features_msg.n_buffers
+        datapath.send_msg(parser.OFPSetConfig(datapath, ofproto.OFPC_FRAG_NORMAL, self.max_len(datapath)))
+
+    def uses_buffers(self, datapath):
+        return self.n_buffers.get(datapath.id, 0) > 0
+
+    def max_len(self, datapath):
+        """How many bytes of a packet this switch should send us."""
+        if self.uses_buffers(datapath) or self.headers_only:
+            return self.miss_send_len
+        return datapath.ofproto.OFPCML_NO_BUFFER
+
+    def controller_action(self, datapath):
+        """An OUTPUT -> CONTROLLER action with the right max_len for this switch.
+
+        In OpenFlow 1.3 it's the max_len on this action (not the switch config) that decides how much of a table-miss
+        packet is sent, so use this in your table-miss flow.
+        """
+        return datapath.ofproto_parser.OFPActionOutput(datapath.ofproto.OFPP_CONTROLLER, self.max_len(datapath))
+
+    def packet_out(self, msg, actions):
+        """
+        Builds the PacketOut for a packet-in message: by buffer_id when the switch buffered the packet, otherwise with
+        the packet data. Returns None if the packet can't be sent back out (it was truncated and not buffered).
+        """
+        datapath = msg.datapath
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+
+        if msg.buffer_id != ofproto.OFP_NO_BUFFER:
+            data = None  # The switch still has the whole packet, just tell it which one
+        elif msg.total_len > len(msg.data):
+            return None  # We only have the first few bytes, sending those would put a broken packet on the wire
+        else:
+            data = msg.data
+
+        return parser.OFPPacketOut(
+            datapath=datapath,
+            buffer_id=msg.buffer_id,
+            in_port=msg.match['in_port'],
+            actions=actions,
+            data=data
+        )
@@ -0,0 +1,258 @@
+import sys
+
+from ryu.base import app_manager
+from ryu.controller import ofp_event
+from ryu.controller.handler import MAIN_DISPATCHER, CONFIG_DISPATCHER, set_ev_cls
+from ryu.ofproto import ofproto_v1_3
+
+from ryu_flow_cache import FlowModCache, cached_switch_features
+from ryu_flow_cookies import FlowCookies
+from ryu_flow_reconcile import FlowReconciler
+from ryu_flow_tracker import FlowInstallTracker
+from ryu_flow_transaction import FlowTransactions
+from ryu_switch_config import SwitchBufferConfig
+
+
+class _SwitchHandles:
+    """The parser/ofproto of one switch, plus the match/action objects every app keeps rebuilding for it."""
+
+    def __init__(self, datapath):
+        self.parser = datapath.ofproto_parser
+        self.ofproto = datapath.ofproto
+        self.match_all = self.parser.OFPMatch()
+        self.normal_actions = [self.parser.OFPActionOutput(self.ofproto.OFPP_NORMAL)]
+        self.controller_actions = {}  # max_len -> [OUTPUT -> CONTROLLER]
+        # id(actions list) -> its apply-actions instruction, only for the lists above (which live as long as this object,
+        # so their ids can't be reused by other lists)
+        self.instructions = {id(self.normal_actions): self.apply_actions(self.normal_actions)}
+
+    def apply_actions(self, actions):
+        return self.parser.OFPInstructionActions(self.ofproto.OFPIT_APPLY_ACTIONS, actions)
+
+    def controller(self, max_len):
+        actions = self.controller_actions.get(max_len)
+        if actions is None:
+            actions = self.controller_actions[max_len] = [self.parser.OFPActionOutput(self.ofproto.OFPP_CONTROLLER, max_len)]
+            self.instructions[id(actions)] = self.apply_actions(actions)
+        return actions
+
+
+class TemplateBaseApp(app_manager.RyuApp):
+    """
+    What every template controller has in common, so each one only contains its own logic.
+
+    - install_flow() and send_packet_out(), the same in every template.
+    - self.flow_tracker (install_flow(..., wait=True)) and self.switch_config (buffer-aware packet-ins/PacketOuts),
+      with the barrier reply and error handlers they need already registered.
+    - Each switch's parser/ofproto, and the objects nearly every app uses (match everything, OUTPUT -> NORMAL,
+      OUTPUT -> CONTROLLER), created once per switch and reused: see match_all(), normal_actions() and controller_actions().
+    - self.flow_cache: when a switch reconnects, what switch_features_handler sent it last time is reused (and reconciled
+      like on a first connect), without running the handler. Call self.flow_cache.invalidate() after changing anything
+      the handler reads.
+      See ryu_flow_cache.py.
+    - self.flow_cookies: install_flow() tags every flow with a cookie saying which app and which method installed it,
+      so self.flow_cookies.delete_flows(datapath, feature='my_method') removes them all in one message.
+      See ryu_flow_cookies.py.
+    - self.flow_reconciler: on a first connect (e.g. after restarting ryu-manager), the switch is asked which flows it
+      still has, and only the missing ones are added and the stale ones removed. See ryu_flow_reconcile.py.
+    - self.transaction(datapath, feature): replaces every flow of a feature on a switch in one go (an OpenFlow bundle,
+      or make-before-break on switches without bundles). See ryu_flow_transaction.py.
+
+    Example usage (in a template):
+        from ryu_template_base import TemplateBaseApp
+
+        class TemplateRyuApp(TemplateBaseApp):
+            @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
+            def switch_features_handler(self, ev):
+                datapath = ev.msg.datapath
+                self.install_table_miss(datapath)
+    """
+    OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]  # Use OpenFlow 1.3
+
+    def __init_subclass__(cls, **kwargs):
+        # Every template's own switch_features_handler gets the reconnect cache, without the template having to ask
+        super().__init_subclass__(**kwargs)
+        handler = cls.__dict__.get('switch_features_handler')
+        if handler is not None and not getattr(handler, 'flow_cache_wrapped', False):
+            cls.switch_features_handler = cached_switch_features(handler)
+
+    def __init__(self, *args, **kwargs):
+        super(TemplateBaseApp, self).__init__(*args, **kwargs)
+
+        # Keeps track of flows installed with install_flow(..., wait=True), so we know when the switch has applied them
+        self.flow_tracker = FlowInstallTracker(self)
+
+        # Knows whether each switch buffers packets, so send_packet_out() doesn't send back data the switch already has.
+        # Templates can replace it in their own __init__ (e.g. SwitchBufferConfig(headers_only=True)).
+        self.switch_config = SwitchBufferConfig()
+
+        # Structured cookies for every flow install_flow() sends, to find/delete/modify them by feature or generation later
+        self.flow_cookies = FlowCookies(self.name)
+
+        # Replays the switch_features_handler's saved messages when a switch reconnects
+        self.flow_cache = FlowModCache(self)
+
+        # Compares what switch_features_handler sends with what a switch already has, and only sends the difference
+        self.flow_reconciler = FlowReconciler(self)
+
+        # Swaps a feature's flows for new ones atomically (see transaction())
+        self.flow_transactions = FlowTransactions(self)
+
+        self._handles = {}  # dpid -> _SwitchHandles
+
+    def handles(self, datapath):
+        """The cached parser/ofproto and common objects for a switch (created the first time it's asked for)."""
+        handles = self._handles.get(datapath.id)
+        if handles is None or handles.parser is not datapath.ofproto_parser:
+            handles = self._handles[datapath.id] = _SwitchHandles(datapath)
+        return handles
+
+    def match_all(self, datapath):
+        """An OFPMatch that matches every packet (e.g. for a table-miss flow). Shared, so don't modify it."""
+        return self.handles(datapath).match_all
+
+    def normal_actions(self, datapath):
+        """[OUTPUT -> NORMAL]: let the switch forward the packet like an ordinary switch. Shared, so don't modify it."""
+        return self.handles(datapath).normal_actions
+
+    def controller_actions(self, datapath):
+        """[OUTPUT -> CONTROLLER], sending as much of the packet as self.switch_config says. Shared, so don't modify it."""
+        return self.handles(datapath).controller(self.switch_config.max_len(datapath))
+
+    def install_flow(self, datapath, priority, match, actions=[], table_id=0, goto_table=None, idle_timeout=0, hard_timeout=0,
+                     cookie=0, flags=0, wait=False, feature=None):
+        """
+        Use to install a flow on a switch.
+
+        datapath: The datapath of the switch
+        priority: Higher priority will appear higher on flow table, and more likely to be matched.
+        match: The OFPMatch object that will be used.
+        actions: A list of match options
+        table_id: The table id that will be used, only necessary if you have multiple tables.
+        goto_table: If you want to continue processing after finishing your actions, you can go to another table. This will specify the table id.
+        idle_timeout: (seconds) how long until the network device deletes the flow
+        hard_timeout: (seconds) how long period until the flow is deleted, regardless of how long it is being used.
+        cookie: A number of your choice stored with the flow, handy for recognising it later (e.g. in a FlowRemoved event).
+                If left at 0, the flow gets a cookie from self.flow_cookies instead (see feature).
+        flags: Extra options, e.g. ofproto.OFPFF_SEND_FLOW_REM to be told when the flow is removed
+        wait: If True, a barrier is sent after the flow and a handle is returned that tells you when the flow is active
+              (or why it failed). See ryu_flow_tracker.py in utils/ryu.
+        feature: The name the flow's cookie is tagged with, for self.flow_cookies.delete_flows(datapath, feature=...).
+                 Defaults to the name of the method calling install_flow (e.g. 'tutorial_packet_manipulation_flow').
+
+        Note: For the most part, you will only need to worry about providing the datapath, priority, match (most important) and actions (most important). Only modify the others if need be.
+        """
+        handles = self.handles(datapath)
+        parser = handles.parser
+
+        # Create a list of instructions
+        instructions = []
+
+        # If actions are found (i.e., the actions list is not blank), wrap them as instructions
+        # This creates a list of instructions that effectively says to 'apply' the action
+        # (the shared action lists from normal_actions()/controller_actions() reuse an instruction made earlier)
+        if actions:
+            instruction = handles.instructions.get(id(actions))
+            instructions.append(instruction if instruction is not None else handles.apply_actions(actions))
+
+        # If the goto_table variable set, apply the Goto Table
+        if goto_table is not None:
+            instructions.append(parser.OFPInstructionGotoTable(goto_table))
+
+        # Create the flow mod message
+        mod = parser.OFPFlowMod(
+            datapath=datapath,
+            priority=priority,
+            match=match,
+            instructions=instructions,
+            table_id=table_id,
+            idle_timeout=idle_timeout,
+            hard_timeout=hard_timeout,
+            cookie=cookie,
+            flags=flags
+        )
+
+        if not cookie:
+            if feature is None:
+                feature = sys._getframe(1).f_code.co_name  # The method that called install_flow
+            # (without the content hash: the flow reconciler adds that to the flows it compares, see ryu_flow_cookies.py)
+            mod.cookie = self.flow_cookies.cookie(feature)
+
+        if wait:
+            return self.flow_tracker.install(datapath, mod)
+
+        # Send the flow mod message to the switch
+        datapath.send_msg(mod)
+
+    def transaction(self, datapath, feature):
+        """
+        Use to replace every flow of a feature on a switch without packets ever seeing half the old and half the new flows.
+
+        with self.transaction(datapath, 'vlan_lanes'):
+            self.install_flow(datapath, 1, match, actions)
+            ...
+
+        Nothing is sent until the 'with' block ends. Then the flows installed inside it replace all the flows that were
+        installed with feature='vlan_lanes' before. See ryu_flow_transaction.py in utils/ryu.
+        """
+        return self.flow_transactions.begin(datapath, feature)
+
+    def install_table_miss(self, datapath, priority=0, table_id=0):
+        """Installs the usual table-miss flow: anything no other flow matches goes to the controller."""
+        self.install_flow(datapath, priority, self.match_all(datapath), self.controller_actions(datapath), table_id=table_id,
+                          feature='table_miss')
+
+    def send_packet_out(self, ev, actions):
+        """
+        Sends a packet out. Used when you have modified a packet for during a PacketIn event.
+        """
+        datapath = ev.msg.datapath
+
+        # If the switch buffered the packet, this only sends its buffer_id back instead of the whole packet
+        out = self.switch_config.packet_out(ev.msg, actions)
+        if out is None:
+            self.logger.info("Packet-in was truncated and not buffered, so it can't be sent back out")
+            return
+
+        datapath.send_msg(out)
+
+    @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
+    def transaction_switch_connected(self, ev):
+        """
+        A switch (re)connected: switch_features_handler installs its flows with the starting generation again, so
+        transactions from before the reconnect mustn't be counted from.
+        """
+        self.flow_transactions.switch_connected(ev.msg.datapath.id)
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+    def barrier_reply_handler(self, ev):
+        """
+        A switch sends a barrier reply once it has finished everything we sent before the barrier request.
+        The flow tracker uses this to know a flow installed with wait=True is now active, and transactions to know the
+        switch has finished swapping flows.
+        """
+        self.flow_tracker.barrier_reply(ev)
+        self.flow_transactions.barrier_reply(ev)
+
+    @set_ev_cls(ofp_event.EventOFPErrorMsg, [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+    def error_msg_handler(self, ev):
+        """
+        A switch sends an error when it can't do something we asked (e.g. a flow with an invalid match).
+        Without this handler those errors would go unnoticed!
+        Errors about something the flow tracker, reconciler or a transaction sent are handled (and logged) by them;
+        everything else, e.g. a plain install_flow() the switch rejected, is logged here.
+        """
+        # (each one is always called: a list, not any(), which would stop at the first that claims the error)
+        claimed = [self.flow_tracker.error(ev), self.flow_reconciler.error(ev), self.flow_transactions.error(ev)]
+        if not any(claimed):
+            msg = ev.msg
+            self.logger.warning("Switch %s rejected a message (xid %s): error type %s, code %s, data %s",
+                                msg.datapath.id, msg.xid, msg.type, msg.code, bytes(msg.data[:64]).hex())
+
+    @set_ev_cls([ofp_event.EventOFPFlowStatsReply, ofp_event.EventOFPGroupDescStatsReply,
+                 ofp_event.EventOFPMeterConfigStatsReply], [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+    def reconcile_stats_reply_handler(self, ev):
+        """
+        A switch's answer to the flow reconciler's questions: which flows, groups and meters it already has.
+        """
+        self.flow_reconciler.stats_reply(ev)
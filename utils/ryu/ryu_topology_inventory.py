@@ -0,0 +1,72 @@
+import os
+import sys
+
+from ryu.lib.packet import ether_types
+
+# The topology file format (and its cache) lives with the Mininet utils, so both sides always agree on port numbers.
+# update-env installs utils/ryu and utils/mininet next to each other, so the sibling folder is always there.
+_MININET_UTILS = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'mininet')
+if _MININET_UTILS not in sys.path:
+    sys.path.append(_MININET_UTILS)
+
+from mininet_topology_loader import buildInventory, loadTopology
+
+
+class TopologyInventory:
+    """
+    The hosts, switches and ports of a topology file (the same one Mininet was launched with), from the controller's side.
+
+    Because every host's IP, MAC and switch port is known up front, routes can be installed as soon as a switch connects,
+    instead of waiting for the first packet-in.
+
+    Example usage (in __init__):
+        self.inventory = TopologyInventory('/opt/workspace/mininet/my_topology.json')
+    Then in switch_features_handler:
+        self.inventory.install_routes(self, datapath)
+    """
+
+    def __init__(self, path=None):
+        """
+        path: The topology file. Defaults to the SDN_TOPOLOGY_FILE environment variable.
+        """
+        path = path or os.environ.get('SDN_TOPOLOGY_FILE')
+        if not path:
+            raise ValueError("No topology file given (pass a path or set SDN_TOPOLOGY_FILE)")
+        self.path = path
+        self.topology = loadTopology(path)
+        inventory = buildInventory(self.topology)
+        self.switches = inventory['switches']
+        self.hosts = inventory['hosts']
+        self.routes = inventory['routes']
+
+    def switch_name(self, dpid):
+        """The name the switch was given in the topology file (e.g. 'leaf1'), or None if the DPID isn't in it."""
+        switch = self.switches.get(dpid)
+        return switch['name'] if switch else None
+
+    def host_by_ip(self, ip):
+        """The inventory entry ({'ip', 'mac', 'dpid', 'port'}) for a host IP, or None."""
+        for host in self.hosts.values():
+            if host['ip'] == ip:
+                return host
+        return None
+
+    def next_hops(self, dpid):
+        """Dictionary of host IP -> output port on this switch, along the shortest path to each host."""
+        return self.routes.get(dpid, {})
+
+    def install_routes(self, app, datapath, priority=1, **flow_kwargs):
+        """
+        Installs an IPv4 and an ARP flow per host on this switch, sending each out of the port towards that host.
+
+        app: The Ryu app, used for its install_flow() method.
+        Any extra keyword arguments (e.g. idle_timeout) are passed through to install_flow().
+        """
+        parser = datapath.ofproto_parser
+
+        for ip, port in self.next_hops(datapath.id).items():
+            actions = [parser.OFPActionOutput(port)]
+            app.install_flow(datapath, priority, parser.OFPMatch(eth_type=ether_types.ETH_TYPE_IP, ipv4_dst=ip),
+                             actions, **flow_kwargs)
+            app.install_flow(datapath, priority, parser.OFPMatch(eth_type=ether_types.ETH_TYPE_ARP, arp_tpa=ip),
+                             actions, **flow_kwargs)